@@ -1,11 +1,12 @@
 """
 API Router v1 - Main router for version 1 of the API
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from ...core.database import get_db
+from ...core.database import get_async_db, get_db
 from ...core.security import get_current_user, require_active_user
 from ...models import User
 from ...models.service import Service
@@ -19,8 +20,17 @@ from ...services import (
     get_departments,
     get_department,
     create_ticket,
-    get_ticket
+    get_ticket,
+    allocate_ticket_number_async
 )
+from ...services.queue_engine import queue_engine
+from ...services.queue_index import queue_index
+from ...services.queue_events import ticket_enqueued_async
+from ...services.wait_estimator import wait_estimator
+from ...services.queue_versions import (
+    queue_versions, department_scope, scope_department, not_modified, set_etag, CATALOG
+)
+from ...services.ticket_transitions import cancel_ticket, ticket_status
 
 # Import routers
 # from .services import router as services_router
@@ -31,6 +41,7 @@ from .roles.manager import router as manager_router
 from .schedule import router as schedule_router
 from .ai_helper import router as ai_helper_router
 from .auth import router as auth_router
+from .display import router as display_router
 
 
 # Create main API v1 router
@@ -43,6 +54,7 @@ api_router.include_router(feedback_router)  # No prefix since it already has /fe
 api_router.include_router(manager_router, prefix="/manager", tags=["Manager"])
 api_router.include_router(schedule_router, prefix="/schedule", tags=["Schedule"])
 api_router.include_router(ai_helper_router, prefix="/ai-helper", tags=["AI Helper"])
+api_router.include_router(display_router, prefix="/display", tags=["Display"])
 # api_router.include_router(services_router, prefix="/services", tags=["Services"])
 # api_router.include_router(tickets_router, prefix="/tickets", tags=["Tickets"])
 
@@ -70,77 +82,49 @@ def get_department_details(department_id: int, db: Session = Depends(get_db)):
 @api_router.post("/tickets/register")
 async def register_ticket(
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Simple ticket registration endpoint"""
+    # Parse JSON body manually; bad input is a 400, not a failed insert
     try:
-        # Parse JSON body manually
         body = await request.json()
-        print(f"Received ticket data: {body}")  # Debug log
-        
+    except ValueError:
+        body = None
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=400, detail="Request body must be a JSON object")
+    print(f"Received ticket data: {body}")  # Debug log
+    
+    # Extract required fields
+    customer_name = body.get("customer_name")
+    service_id = body.get("service_id") 
+    department_id = body.get("department_id")
+    
+    if not all([customer_name, service_id, department_id]):
+        raise HTTPException(status_code=400, detail="Missing required fields: customer_name, service_id, department_id")
+    # asyncpg does not cast "3" to an integer parameter
+    try:
+        service_id, department_id = int(service_id), int(department_id)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="service_id and department_id must be integers")
+    
+    try:
         # Create ticket directly without complex services
         from ...models.ticket import QueueTicket, TicketStatus
         from datetime import datetime
         
-        # Extract required fields
-        customer_name = body.get("customer_name")
-        service_id = body.get("service_id") 
-        department_id = body.get("department_id")
-        
-        if not all([customer_name, service_id, department_id]):
-            raise HTTPException(status_code=400, detail="Missing required fields: customer_name, service_id, department_id")
-        
         # Generate department-based ticket number (bank counter style)
         # Get department name for prefix mapping
         from ...models.department import Department
-        department = db.query(Department).filter(Department.id == department_id).first()
+        department = await db.get(Department, department_id)
         if not department:
             raise HTTPException(status_code=404, detail="Department not found")
         
-        # Department prefix mapping - Bank style A,B,C,D based on department ID
-        dept_prefixes = {
-            1: "A",  # Phòng Kế hoạch Tổng hợp
-            2: "B",  # Phòng Tài chính Kế toán  
-            3: "C",  # Phòng Hành chính Quản trị
-            4: "D",  # Phòng Công nghệ Thông tin
-        }
-        
-        # Get prefix based on department ID
-        dept_prefix = dept_prefixes.get(department_id, "X")  # X as fallback
-        
-        # Generate ticket number with uniqueness check
-        # Get highest number from all tickets across all departments 
-        from sqlalchemy import func, text
-        
-        # Find the highest number from any ticket (across all time, not just today)
-        highest_query = text("""
-            SELECT MAX(CAST(SUBSTRING(ticket_number FROM 2) AS INTEGER)) as max_num
-            FROM queue_tickets 
-            WHERE ticket_number ~ '^[A-Z][0-9]{3}$'
-        """)
-        result = db.execute(highest_query)
-        max_counter = result.scalar() or 0
-        
-        # Generate unique ticket number with safety check
-        counter = max_counter + 1
-        max_attempts = 50  # Prevent infinite loop
-        
-        for attempt in range(max_attempts):
-            ticket_number = f"{dept_prefix}{counter:03d}"
-            
-            # Check if this ticket number already exists
-            existing_check = text("SELECT 1 FROM queue_tickets WHERE ticket_number = :ticket_number")
-            existing = db.execute(existing_check, {'ticket_number': ticket_number}).scalar()
-            
-            if not existing:
-                break  # Found unique number
-                
-            counter += 1  # Try next number
-            
-        else:
-            raise HTTPException(status_code=500, detail="Could not generate unique ticket number")
+        # Reserve the next number for this department (single row-locked UPDATE)
+        ticket_number = await allocate_ticket_number_async(db, department_id)
         
         # Auto-assign staff based on workload (least busy staff in the department)
+        from sqlalchemy import text
+        
         staff_assignment_query = text("""
             SELECT u.id, u.full_name,
                    COUNT(qt.id) as current_workload
@@ -155,11 +139,14 @@ async def register_ticket(
             LIMIT 1
         """)
         
-        staff_result = db.execute(staff_assignment_query, {'dept_id': department_id})
+        staff_result = await db.execute(staff_assignment_query, {'dept_id': department_id})
         assigned_staff = staff_result.fetchone()
         
         assigned_staff_id = assigned_staff.id if assigned_staff else None
         
+        # Everyone waiting now is ahead of the new ticket (same count the status endpoint ranks in)
+        waiting = await queue_index.waiting_count_async(db, department_id)
+        
         # Create ticket using raw SQL to avoid enum issues
         from sqlalchemy import text
         
@@ -170,10 +157,10 @@ async def register_ticket(
             VALUES 
             (:ticket_number, :customer_name, :customer_phone, :customer_email,
              :service_id, :department_id, :staff_id, :notes, :estimated_wait_time, 'waiting', NOW())
-            RETURNING id, ticket_number, customer_name, status, created_at
+            RETURNING id, ticket_number, customer_name, status, priority, created_at
         """)
         
-        result = db.execute(insert_query, {
+        result = await db.execute(insert_query, {
             'ticket_number': ticket_number,
             'customer_name': customer_name,
             'customer_phone': body.get("customer_phone"),
@@ -182,11 +169,16 @@ async def register_ticket(
             'department_id': department_id,
             'staff_id': assigned_staff_id,
             'notes': body.get("notes"),
-            'estimated_wait_time': 30
+            'estimated_wait_time': wait_estimator.estimate(department_id, waiting, service_id).minutes
         })
         
         ticket_row = result.fetchone()
-        db.commit()
+        await db.commit()
+        queue_engine.add(ticket_row.id, department_id, ticket_row.priority, ticket_row.created_at)
+        await ticket_enqueued_async(
+            ticket_row.id, department_id, ticket_row.ticket_number,
+            ticket_row.priority, ticket_row.created_at
+        )
         
         return {
             "success": True,
@@ -199,8 +191,11 @@ async def register_ticket(
             }
         }
         
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error creating ticket: {str(e)}")
 
 @api_router.post("/tickets")
@@ -241,37 +236,56 @@ def create_new_ticket(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail="Internal server error")
 
+def _ticket_status_resource(ticket_id: int, department_id) -> str:
+    # Estimates drift without a queue change (e.g. staff expiring), so the tag tracks the model too
+    return f"t{ticket_id}.w{wait_estimator.revision(department_id)}"
+
 @api_router.get("/tickets/{ticket_id}/status")
-def get_ticket_status_public(
+async def get_ticket_status_public(
     ticket_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Public endpoint for customers to check ticket status"""
+    # Unchanged department queue and wait model since the client's last poll: 304 without a query
+    versions = await queue_versions.snapshot_async()
+    cached = queue_versions.resource_not_modified(
+        request, lambda scope: _ticket_status_resource(ticket_id, scope_department(scope)), versions
+    )
+    if cached:
+        return cached
+    
     try:
-        from ...models.ticket import QueueTicket
+        from sqlalchemy import text
         
-        ticket = db.query(QueueTicket).filter(QueueTicket.id == ticket_id).first()
+        # Ticket and its service duration in one query
+        ticket = (await db.execute(text("""
+            SELECT qt.id, qt.ticket_number, qt.customer_name, qt.status,
+                   qt.department_id, qt.service_id, qt.created_at, qt.called_at,
+                   s.estimated_duration
+            FROM queue_tickets qt
+            LEFT JOIN services s ON s.id = qt.service_id
+            WHERE qt.id = :ticket_id
+        """), {"ticket_id": ticket_id})).fetchone()
         if not ticket:
             raise HTTPException(status_code=404, detail="Ticket not found")
         
-        # Calculate people ahead (waiting tickets created before this ticket)
+        # People ahead = rank in the department's Redis queue index
         people_ahead = 0
-        estimated_wait = 0
         
         if ticket.status == "waiting":
-            people_ahead = db.query(QueueTicket).filter(
-                QueueTicket.department_id == ticket.department_id,
-                QueueTicket.status == "waiting",
-                QueueTicket.created_at < ticket.created_at
-            ).count()
-            
-            # Get service estimated time for wait calculation
-            from ...models.service import Service
-            service = db.query(Service).filter(Service.id == ticket.service_id).first()
-            service_time = service.estimated_duration if service else 15  # default 15 min
-            
-            estimated_wait = people_ahead * service_time
+            people_ahead = await queue_index.people_ahead_async(db, ticket.id, ticket.department_id)
+        # Learned service times over the counters currently serving
+        estimate = wait_estimator.estimate(
+            ticket.department_id, people_ahead, ticket.service_id, ticket.estimated_duration
+        )
         
+        set_etag(response, queue_versions.etag(
+            department_scope(ticket.department_id),
+            _ticket_status_resource(ticket.id, ticket.department_id),
+            versions
+        ))
         return {
             "success": True,
             "ticket_id": ticket.id,
@@ -280,7 +294,8 @@ def get_ticket_status_public(
             "status": ticket.status,
             "queue_position": people_ahead + 1 if ticket.status == "waiting" else 0,
             "people_ahead": people_ahead,
-            "estimated_wait": estimated_wait,
+            "estimated_wait": estimate.minutes,
+            "estimated_wait_range": estimate.as_range(),
             "created_at": ticket.created_at.isoformat() if ticket.created_at else None,
             "called_at": ticket.called_at.isoformat() if ticket.called_at else None
         }
@@ -294,21 +309,13 @@ def cancel_ticket_public(
 ):
     """Public endpoint for customers to cancel their ticket"""
     try:
-        from ...models.ticket import QueueTicket
-        
-        ticket = db.query(QueueTicket).filter(QueueTicket.id == ticket_id).first()
+        # Update ticket status to no_show (waiting -> no_show only)
+        ticket = cancel_ticket(db, ticket_id, waiting_only=True)
         if not ticket:
-            raise HTTPException(status_code=404, detail="Ticket not found")
-        
-        if ticket.status != "waiting":
+            if ticket_status(db, ticket_id) is None:
+                raise HTTPException(status_code=404, detail="Ticket not found")
             raise HTTPException(status_code=400, detail="Only waiting tickets can be cancelled")
         
-        # Update ticket status to no_show
-        ticket.status = "no_show"
-        ticket.completed_at = datetime.now()
-        
-        db.commit()
-        
         return {
             "success": True,
             "message": "Ticket cancelled successfully",
@@ -336,8 +343,18 @@ async def health_check():
 
 # Services endpoint - Working version with department filtering
 @api_router.get("/services")
-def list_services(department_id: int = None, db: Session = Depends(get_db)):
+def list_services(
+    request: Request,
+    response: Response,
+    department_id: int = None,
+    db: Session = Depends(get_db)
+):
     """Get all services, optionally filtered by department"""
+    etag = queue_versions.etag(CATALOG, versions=queue_versions.snapshot())
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
     try:
         # Use raw SQL since ORM has issues
         from sqlalchemy import text
@@ -371,6 +388,7 @@ def list_services(department_id: int = None, db: Session = Depends(get_db)):
             })
         
         print(f"Returning {len(services_list)} services")
+        set_etag(response, etag)
         
         # Return format expected by frontend
         return {
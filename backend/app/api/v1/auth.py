@@ -7,7 +7,7 @@ from typing import List
 from datetime import datetime, timedelta
 
 from ...core.database import get_db
-from ...core.security import get_current_user, require_active_user
+from ...core.security import decode_token, get_current_user, require_active_user, revoke_token, security
 from ...models.user import User
 from ...schemas.auth import (
     UserLogin, 
@@ -44,7 +44,7 @@ def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
             )
             
         # Create access token
-        access_token = create_access_token(data={"sub": user.email})
+        access_token = create_access_token(data={"sub": user.email}, user=user)
         
         # Prepare response matching Token schema
         response = {
@@ -105,14 +105,17 @@ def update_user_me(
         )
 
 @router.post("/logout")
-def logout(current_user: User = Depends(get_current_user)):
+def logout(token = Depends(security), current_user: User = Depends(get_current_user)):
+    # The token is refused from now on, by every worker (see core/revocation.py)
+    if not revoke_token(decode_token(token.credentials)):
+        print(f"Logout of {current_user.email} with a token without jti, it stays valid until it expires")
     return {"message": "Successfully logged out"}
 
 @router.post("/refresh")
 def refresh_token(current_user: User = Depends(get_current_user)):
     access_token_expires = timedelta(minutes=30)
     access_token = create_access_token(
-        data={"sub": current_user.username}, expires_delta=access_token_expires
+        data={"sub": current_user.email}, expires_delta=access_token_expires, user=current_user
     )
     
     return {
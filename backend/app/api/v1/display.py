@@ -0,0 +1,63 @@
+"""
+Public display board - Server-Sent Events feed of "now serving / next up"
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Request, Header
+from fastapi.responses import StreamingResponse
+
+from ...services.now_serving import now_serving
+
+router = APIRouter()
+
+# Comment line sent when nothing changed, keeps proxies from closing the stream
+KEEPALIVE_SECONDS = 15
+
+
+def _event_id(sequence: int) -> str:
+    return f"{now_serving.epoch}-{sequence}"
+
+
+def _resume_sequence(last_event_id: Optional[str]) -> int:
+    """Sequence the client already has; 0 (full snapshot) after a restart"""
+    if not last_event_id:
+        return 0
+    epoch, _, sequence = last_event_id.partition("-")
+    if epoch != now_serving.epoch or not sequence.isdigit():
+        return 0
+    return int(sequence)
+
+
+@router.get("/stream")
+async def display_stream(
+    request: Request,
+    department_id: Optional[int] = None,
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID")
+):
+    """Stream department snapshots; one ``snapshot`` event per changed department"""
+
+    async def events():
+        sequence = _resume_sequence(last_event_id)
+        yield "retry: 3000\n\n"
+        if department_id is not None and sequence == 0 and not now_serving.changed_since(0, department_id):
+            yield f"id: {_event_id(0)}\nevent: snapshot\ndata: {now_serving.empty_payload(department_id)}\n\n"
+        while True:
+            # Board-wide sequence as of this read (``sequence`` only follows the filtered
+            # department), so a change published during the awaits below is not missed
+            seen = now_serving.sequence
+            boards = now_serving.changed_since(sequence, department_id)
+            if boards:
+                for board in boards:
+                    yield f"id: {_event_id(board.sequence)}\nevent: snapshot\ndata: {board.payload}\n\n"
+                    sequence = max(sequence, board.sequence)
+                continue
+            if await request.is_disconnected():
+                break
+            if not await now_serving.wait_for_change(seen, KEEPALIVE_SECONDS):
+                yield ": keepalive\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,27 +1,51 @@
 # FastAPI Backend Router - Staff APIs
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import text, and_, desc, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text, and_, desc, func, select
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta, date
-from ....core.database import get_db
-from ....core.security import get_current_user_sync
+from ....core.database import get_async_db, get_db
+from ....core.principal_cache import principal_cache
+from ....core.principal import Principal
+from ....core.security import get_current_principal, get_current_user_sync
 from ....models import User, QueueTicket, Department, Service, TicketStatus
+from ....services.queue_engine import queue_engine
+from ....services.queue_versions import queue_versions, department_scope, not_modified, set_etag
+from ....services.ticket_claim import StaffBusy
+from ....services.ticket_transitions import (
+    call_ticket as call_ticket_transition,
+    complete_ticket_async as complete_ticket_transition_async,
+    cancel_ticket as cancel_ticket_transition
+)
 
 router = APIRouter()
 
 @router.get("/queue")
-def get_staff_queue(
-    current_user: User = Depends(get_current_user_sync),
-    db: Session = Depends(get_db)
+async def get_staff_queue(
+    request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get tickets in queue for staff's department"""
     if current_user.role not in ["staff", "manager", "admin"]:
         raise HTTPException(status_code=403, detail="Staff access required")
     
+    # wait_time is in whole minutes, so the tag also rolls over every minute
+    etag = queue_versions.etag(
+        department_scope(current_user.department_id),
+        datetime.now().strftime("m%H%M"),
+        await queue_versions.snapshot_async()
+    )
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    set_etag(response, etag)
+    
     # Get tickets that can be called (waiting or called)
-    tickets = db.query(
+    tickets = (await db.execute(select(
         QueueTicket.id,
         QueueTicket.ticket_number,
         QueueTicket.customer_name,
@@ -35,7 +59,7 @@ def get_staff_queue(
             QueueTicket.department_id == current_user.department_id,
             QueueTicket.status.in_(['waiting', 'called'])
         )
-    ).order_by(QueueTicket.created_at).all()
+    ).order_by(QueueTicket.created_at))).all()
     
     return [
         {
@@ -53,91 +77,57 @@ def get_staff_queue(
     ]
 
 @router.post("/queue/call-next")
-def call_next_ticket(
-    current_user: User = Depends(get_current_user_sync),
-    db: Session = Depends(get_db)
+async def call_next_ticket(
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Call the next waiting ticket - only if no tickets are currently in 'called' status"""
     if current_user.role not in ["staff", "manager", "admin"]:
         raise HTTPException(status_code=403, detail="Staff access required")
     
-    # Check if staff already has a called ticket
-    current_ticket = db.query(QueueTicket).filter(
-        and_(
-            QueueTicket.staff_id == current_user.id,
-            QueueTicket.status == 'called'
+    # Claim the highest-priority waiting ticket in one statement; nothing is
+    # claimed while this staff member still has a called ticket
+    try:
+        next_ticket = await queue_engine.call_next_async(
+            db, current_user.department_id, current_user.id, require_idle=True
         )
-    ).first()
-    
-    if current_ticket:
+    except StaffBusy:
         raise HTTPException(status_code=400, detail="Please complete serving current ticket before calling next")
     
-    # Find next waiting ticket only
-    next_ticket = db.query(QueueTicket).filter(
-        and_(
-            QueueTicket.department_id == current_user.department_id,
-            QueueTicket.status == 'waiting'
-        )
-    ).order_by(QueueTicket.queue_position).first()
-    
     if not next_ticket:
         raise HTTPException(status_code=404, detail="No waiting tickets in queue")
     
-    # Update ticket status to called
-    next_ticket.status = 'called'
-    next_ticket.called_at = datetime.now()
-    next_ticket.staff_id = current_user.id
-    
-    db.commit()
-    db.refresh(next_ticket)
-    
     return {
         "id": next_ticket.id,
         "ticket_number": next_ticket.ticket_number,
         "customer_name": next_ticket.customer_name,
-        "service_name": next_ticket.service.name if next_ticket.service else None,
+        "service_name": next_ticket.service_name,
         "status": next_ticket.status
     }
 
 @router.put("/tickets/{ticket_id}/complete")
-def complete_ticket(  # Đổi từ async thành sync
+async def complete_ticket(
     ticket_id: int,
     completion_data: dict = None,
-    current_user: User = Depends(get_current_user_sync),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Complete a ticket - only allowed when ticket is in 'called' status"""
     if current_user.role not in ["staff", "manager", "admin"]:
         raise HTTPException(status_code=403, detail="Staff access required")
 
-    ticket = db.query(QueueTicket).filter(
-        and_(
-            QueueTicket.id == ticket_id,
-            QueueTicket.status == 'called',
-            QueueTicket.department_id == current_user.department_id
-        )
-    ).first()
+    # called -> completed, recording who served it and any notes
+    ticket = await complete_ticket_transition_async(
+        db,
+        ticket_id,
+        staff_id=current_user.id,
+        department_id=current_user.department_id,
+        notes=completion_data.get('notes') if completion_data else None
+    )
 
     if not ticket:
         raise HTTPException(status_code=404, detail="Ticket not found or is not in 'called' status")
 
-    # Update ticket status to completed
-    ticket.status = 'completed'
-    ticket.completed_at = datetime.now()
-
-    # Set staff and served time
-    ticket.staff_id = current_user.id
-    ticket.served_at = datetime.now()
-    if not ticket.called_at:
-        ticket.called_at = datetime.now()
-
-    # Add notes if provided
-    if completion_data and completion_data.get('notes'):
-        ticket.notes = completion_data['notes']
-
-    db.commit()
-    db.refresh(ticket)
-
     return {
         "message": "Ticket completed successfully",
         "ticket_id": ticket.id,
@@ -147,34 +137,21 @@ def complete_ticket(  # Đổi từ async thành sync
 @router.put("/tickets/{ticket_id}/call")
 def call_specific_ticket(  # Đổi từ async thành sync
     ticket_id: int,
-    current_user: User = Depends(get_current_user_sync),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Call a specific ticket"""
     if current_user.role not in ["staff", "manager", "admin"]:
         raise HTTPException(status_code=403, detail="Staff access required")
     
-    ticket = db.query(QueueTicket).filter(
-        and_(
-            QueueTicket.id == ticket_id,
-            QueueTicket.status.in_(['waiting', 'called']),
-            QueueTicket.department_id == current_user.department_id
-        )
-    ).first()
+    # waiting -> called
+    ticket = call_ticket_transition(
+        db, ticket_id, current_user.id, department_id=current_user.department_id
+    )
     
     if not ticket:
         raise HTTPException(status_code=404, detail="Ticket not found or cannot be called")
     
-    # Update ticket to called status if it was waiting
-    if ticket.status == 'waiting':
-        ticket.status = 'called'
-        ticket.called_at = datetime.now()
-    
-    ticket.staff_id = current_user.id
-    
-    db.commit()
-    db.refresh(ticket)
-    
     return {"message": "Ticket called", "ticket_id": ticket.id, "status": ticket.status}
 
 
@@ -182,32 +159,24 @@ def call_specific_ticket(  # Đổi từ async thành sync
 def cancel_ticket(  # Đổi từ async thành sync function
     ticket_id: int,
     cancel_data: dict = None,
-    current_user: User = Depends(get_current_user_sync),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Cancel a ticket - set status to 'cancelled'"""
     if current_user.role not in ["staff", "manager", "admin"]:
         raise HTTPException(status_code=403, detail="Staff access required")
 
-    ticket = db.query(QueueTicket).filter(
-        and_(
-            QueueTicket.id == ticket_id,
-            QueueTicket.department_id == current_user.department_id,
-            QueueTicket.status.in_(['waiting', 'called'])
-        )
-    ).first()
+    # waiting/called -> no_show
+    ticket = cancel_ticket_transition(
+        db,
+        ticket_id,
+        department_id=current_user.department_id,
+        notes=cancel_data.get('notes') if cancel_data else None
+    )
 
     if not ticket:
         raise HTTPException(status_code=404, detail="Ticket not found or cannot be cancelled")
 
-    ticket.status = 'no_show'  # Use valid enum value instead of 'cancelled'
-    ticket.cancelled_at = datetime.now()
-    if cancel_data and cancel_data.get('notes'):
-        ticket.notes = cancel_data.get('notes')
-
-    db.commit()
-    db.refresh(ticket)
-
     return {"message": "Ticket cancelled successfully", "ticket_id": ticket.id}
 
 @router.put("/tickets/{ticket_id}/review")
@@ -245,7 +214,7 @@ async def submit_ticket_review(
 
 @router.get("/current-ticket")
 def get_current_ticket(
-    current_user: User = Depends(get_current_user_sync),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Get staff's current ticket being served"""
@@ -276,69 +245,39 @@ def get_current_ticket(
     }
 
 @router.post("/queue/complete/{ticket_id}")
-def complete_ticket(
+async def complete_ticket(
     ticket_id: int,
-    current_user: User = Depends(get_current_user_sync),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Complete a ticket service"""
     if current_user.role not in ["staff", "manager", "admin"]:
         raise HTTPException(status_code=403, detail="Staff access required")
     
-    # Get the ticket
-    ticket = db.query(QueueTicket).filter(
-        and_(
-            QueueTicket.id == ticket_id,
-            QueueTicket.staff_id == current_user.id,
-            QueueTicket.status == 'called'
-        )
-    ).first()
+    # called -> completed, only for the staff member holding the ticket
+    ticket = await complete_ticket_transition_async(db, ticket_id, owner_id=current_user.id)
     
     if not ticket:
         raise HTTPException(status_code=404, detail="Ticket not found or not assigned to you")
     
-    # Update ticket status to completed
-    ticket.status = 'completed'
-    ticket.completed_at = datetime.now()
-    
-    db.commit()
-    
     return {"message": "Ticket completed successfully", "ticket_id": ticket_id}
 
 @router.post("/queue/cancel/{ticket_id}")
 def cancel_ticket(
     ticket_id: int,
-    current_user: User = Depends(get_current_user_sync),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Cancel a ticket (no show)"""
     if current_user.role not in ["staff", "manager", "admin"]:
         raise HTTPException(status_code=403, detail="Staff access required")
     
-    # Get the ticket
-    ticket = db.query(QueueTicket).filter(
-        and_(
-            QueueTicket.id == ticket_id,
-            or_(
-                QueueTicket.staff_id == current_user.id,
-                QueueTicket.department_id == current_user.department_id
-            )
-        )
-    ).first()
+    # Update ticket status to no_show (waiting or called tickets only)
+    ticket = cancel_ticket_transition(db, ticket_id, department_id=current_user.department_id)
     
     if not ticket:
         raise HTTPException(status_code=404, detail="Ticket not found")
     
-    # Update ticket status to cancelled (no_show)
-    ticket.status = 'cancelled'
-    ticket.cancelled_at = datetime.now()
-    
-    # If it was called ticket, clear staff assignment
-    if ticket.status == 'called':
-        ticket.staff_id = None
-    
-    db.commit()
-    
     return {"message": "Ticket cancelled successfully", "ticket_id": ticket_id}
     ticket = db.query(QueueTicket).filter(QueueTicket.id == ticket_id).first()
     
@@ -472,6 +411,7 @@ def set_staff_online(
             WHERE id = :user_id
         """), {"user_id": current_user.id})
         db.commit()
+        principal_cache.invalidate(current_user.id)
         
         print(f"👤 Staff {current_user.full_name} ({current_user.id}) is now ONLINE")
         return {"status": "online", "user_id": current_user.id}
@@ -504,7 +444,7 @@ def set_staff_offline(
 @router.get("/notifications")
 def get_staff_notifications(
     limit: int = 10,
-    current_user: User = Depends(get_current_user_sync),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Get staff notifications - TEMPORARILY DISABLED"""
@@ -571,7 +511,7 @@ async def submit_complaint(
 
 @router.get("/performance/today")  
 def get_staff_performance_today(
-    current_user: User = Depends(get_current_user_sync),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Get staff performance metrics for today"""
@@ -644,7 +584,7 @@ def get_staff_performance_today(
 @router.get("/performance/history")
 async def get_staff_performance_history(
     days: int = Query(default=7, ge=1, le=30),
-    current_user: User = Depends(get_current_user_sync),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Get staff performance history"""
@@ -684,8 +624,8 @@ async def get_staff_performance_history(
 @router.get("/queue/{department_id}")
 async def get_department_queue(
     department_id: int,
-    current_user: User = Depends(get_current_user_sync),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get current queue for a specific department"""
     if current_user.role not in ["staff", "manager", "admin"]:
@@ -696,7 +636,7 @@ async def get_department_queue(
         raise HTTPException(status_code=403, detail="Access to this department denied")
     
     # Get waiting and serving tickets for the department
-    query = db.execute(text("""
+    query = await db.execute(text("""
         SELECT 
             qt.id,
             qt.ticket_number,
@@ -741,7 +681,7 @@ async def get_department_queue(
 
 @router.get("/performance/weekly")
 def get_staff_weekly_performance(
-    current_user: User = Depends(get_current_user_sync),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Get staff performance data for the last 7 days with real database queries"""
@@ -856,7 +796,7 @@ def get_staff_weekly_performance(
 
 @router.get("/performance/ratings-distribution")
 def get_staff_ratings_distribution(
-    current_user: User = Depends(get_current_user_sync),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Get staff ratings distribution (1-5 stars) from actual database"""
@@ -902,7 +842,7 @@ def get_staff_ratings_distribution(
 @router.get("/performance/{staff_id}")
 async def get_staff_performance(
     staff_id: int,
-    current_user: User = Depends(get_current_user_sync),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Get performance data for a staff member"""
@@ -988,7 +928,7 @@ async def get_staff_performance(
 @router.get("/settings/{staff_id}")
 async def get_staff_settings(
     staff_id: int,
-    current_user: User = Depends(get_current_user_sync),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Get settings for a staff member"""
@@ -1024,8 +964,8 @@ async def get_staff_settings(
 @router.post("/call-next")
 async def call_next_ticket(
     request_data: Dict[str, Any],
-    current_user: User = Depends(get_current_user_sync),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Call the next QueueTicket in queue for staff member"""
     if current_user.role not in ["staff", "manager", "admin"]:
@@ -1038,48 +978,22 @@ async def call_next_ticket(
     if current_user.role == "staff" and current_user.id != staff_id:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    # Check if staff is already serving someone
-    current_serving = db.execute(text("""
-        SELECT id FROM queue_tickets 
-        WHERE staff_id = :staff_id AND status = 'serving'
-    """), {"staff_id": staff_id}).fetchone()
-    
-    if current_serving:
+    # Claim next QueueTicket in queue (priority class, then first in first out)
+    try:
+        next_ticket = await queue_engine.call_next_async(db, department_id, staff_id, require_idle=True)
+    except StaffBusy:
         raise HTTPException(status_code=400, detail="Staff is already serving a customer")
-    
-    # Get next QueueTicket in queue (FIFO - First In, First Out)
-    next_ticket_query = db.execute(text("""
-        SELECT id, ticket_number, customer_name, customer_phone, service_id
-        FROM queue_tickets 
-        WHERE department_id = :dept_id 
-        AND status = 'waiting' 
-        ORDER BY created_at ASC 
-        LIMIT 1
-    """), {"dept_id": department_id})
-    
-    next_ticket = next_ticket_query.fetchone()
     if not next_ticket:
         return {"QueueTicket": None, "message": "No customers waiting"}
     
-    # Update QueueTicket status to called
-    db.execute(text("""
-        UPDATE queue_tickets 
-        SET status = 'called', 
-            staff_id = :staff_id, 
-            called_at = NOW()
-        WHERE id = :ticket_id
-    """), {"staff_id": staff_id, "ticket_id": next_ticket.id})
-    
-    db.commit()
-    
     return {"message": "Ticket cancelled successfully"}
 
 @router.post("/complete-QueueTicket/{ticket_id}")
 async def complete_ticket(
     ticket_id: int,
     request_data: Dict[str, Any],
-    current_user: User = Depends(get_current_user_sync),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Mark a QueueTicket as completed"""
     if current_user.role not in ["staff", "manager", "admin"]:
@@ -1091,32 +1005,27 @@ async def complete_ticket(
     if current_user.role == "staff" and current_user.id != staff_id:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    # Update QueueTicket status
-    db.execute(text("""
-        UPDATE queue_tickets 
-        SET status = 'completed',
-            completed_at = NOW()
-        WHERE id = :ticket_id AND staff_id = :staff_id
-    """), {"ticket_id": ticket_id, "staff_id": staff_id})
-    
-    db.commit()
+    # Update QueueTicket status (called -> completed, held by this staff)
+    ticket = await complete_ticket_transition_async(db, ticket_id, owner_id=staff_id)
+    if not ticket:
+        raise HTTPException(status_code=404, detail="QueueTicket not found or not assigned to this staff")
     
     # Update staff performance for today
-    db.execute(text("""
+    await db.execute(text("""
         INSERT INTO staff_performance (user_id, department_id, date, tickets_served)
         VALUES (:staff_id, (SELECT department_id FROM users WHERE id = :staff_id), CURRENT_DATE, 1)
         ON CONFLICT (user_id, date) 
         DO UPDATE SET tickets_served = staff_performance.tickets_served + 1
     """), {"staff_id": staff_id})
     
-    db.commit()
+    await db.commit()
     
     return {"message": "QueueTicket completed successfully"}
 
 
 @router.get("/department")
 def get_staff_department(
-    current_user: User = Depends(get_current_user_sync),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Get current staff's department information"""
@@ -8,6 +8,7 @@ import logging
 from app.core.database import get_db
 from app.core.security import get_current_user
 from app.models import User
+from app.realtime.auth import CLOSE_UNAUTHORIZED, authenticate
 from app.schemas.schedule import (
     ScheduleCreate, ScheduleUpdate, ScheduleResponse,
     LeaveRequestCreate, LeaveRequestUpdate, LeaveRequestResponse,
@@ -23,18 +24,23 @@ logger = logging.getLogger(__name__)
 
 # WebSocket endpoint for real-time schedule updates
 @router.websocket("/ws/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, user_id: int, db: Session = Depends(get_db)):
-    """WebSocket endpoint for real-time schedule updates"""
+async def websocket_endpoint(websocket: WebSocket, user_id: int):
+    """WebSocket endpoint for real-time schedule updates
+
+    No ``Depends(get_db)`` here: a session held for the life of the socket
+    would pin a pooled connection. The user is looked up in a short-lived
+    session while authenticating the ``?token=`` and only a detached
+    principal is kept.
+    """
     try:
-        # Get user info for connection
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await authenticate(websocket, user_id)
         if not user:
-            await websocket.close(code=4004, reason="User not found")
+            await websocket.close(code=CLOSE_UNAUTHORIZED, reason="Not authenticated")
             return
         
         await websocket_manager.schedule_connect(
             websocket=websocket,
-            user_id=user_id,
+            user_id=user.id,
             user_role=user.role,
             department_id=user.department_id
         )
@@ -45,6 +51,8 @@ async def websocket_endpoint(websocket: WebSocket, user_id: int, db: Session = D
         while True:
             try:
                 data = await websocket.receive_text()
+                # Any message (including replies to server_ping) keeps the socket from idle eviction
+                websocket_manager.touch_schedule(user_id)
                 # Handle incoming messages if needed
                 logger.info(f"Received WebSocket message from user {user_id}: {data}")
                 
@@ -65,7 +73,7 @@ async def websocket_endpoint(websocket: WebSocket, user_id: int, db: Session = D
 logger = logging.getLogger(__name__)
 
 @router.get("/shifts", response_model=List[ShiftResponse])
-async def get_shifts(
+def get_shifts(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -82,7 +90,7 @@ async def get_shifts(
         )
 
 @router.get("/week", response_model=List[ScheduleResponse])
-async def get_weekly_schedule(
+def get_weekly_schedule(
     start_date: date,
     staff_id: Optional[int] = None,
     db: Session = Depends(get_db),
@@ -191,7 +199,7 @@ async def update_schedule(
         )
 
 @router.delete("/{schedule_id}")
-async def delete_schedule(
+def delete_schedule(
     schedule_id: UUID,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -271,7 +279,7 @@ async def bulk_create_schedules(
 
 # Leave Request Endpoints
 @router.get("/leave-requests", response_model=List[LeaveRequestResponse])
-async def get_leave_requests(
+def get_leave_requests(
     status_filter: Optional[str] = None,
     staff_id: Optional[UUID] = None,
     db: Session = Depends(get_db),
@@ -366,7 +374,7 @@ async def update_leave_request(
 
 # Check-in Endpoints
 @router.get("/checkins", response_model=List[CheckinResponse])
-async def get_checkins(
+def get_checkins(
     status_filter: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -390,7 +398,7 @@ async def get_checkins(
         )
 
 @router.post("/checkins", response_model=CheckinResponse)
-async def create_checkin(
+def create_checkin(
     checkin_data: CheckinCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -413,7 +421,7 @@ async def create_checkin(
         )
 
 @router.put("/checkins/{checkin_id}/approve")
-async def approve_checkin(
+def approve_checkin(
     checkin_id: UUID,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -442,7 +450,7 @@ async def approve_checkin(
         )
 
 @router.put("/checkins/{checkin_id}/reject")
-async def reject_checkin(
+def reject_checkin(
     checkin_id: UUID,
     reason: str,
     db: Session = Depends(get_db),
@@ -473,7 +481,7 @@ async def reject_checkin(
 
 # Statistics Endpoints
 @router.get("/staff-statistics/{staff_id}")
-async def get_staff_statistics(
+def get_staff_statistics(
     staff_id: int,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
@@ -500,7 +508,7 @@ async def get_staff_statistics(
         )
 
 @router.get("/department-statistics")
-async def get_department_statistics(
+def get_department_statistics(
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     db: Session = Depends(get_db),
@@ -12,6 +12,15 @@ from datetime import datetime
 from ...core.database import get_db
 from ...core.security import get_current_user, require_active_user
 from ...models import User, QueueTicket, Service, Department
+from ...services.ticket_numbers import allocate_ticket_number_async
+from ...services.queue_engine import queue_engine
+from ...services.queue_events import ticket_enqueued
+from ...services.wait_estimator import wait_estimator
+from ...services.ticket_transitions import (
+    call_ticket as call_ticket_transition,
+    complete_ticket as complete_ticket_transition,
+    ticket_status
+)
 from ...schemas.ticket import (
     TicketCreate,
     TicketResponse,
@@ -23,6 +32,25 @@ from ...schemas.ticket import (
 
 router = APIRouter()
 
+def _ticket_response(ticket) -> TicketResponse:
+    """Build a TicketResponse from a ticket row returned by a transition"""
+    return TicketResponse(
+        id=ticket.id,
+        ticket_number=ticket.ticket_number,
+        customer_name=ticket.customer_name,
+        customer_phone=ticket.customer_phone or "",
+        service_id=ticket.service_id,
+        service_name=ticket.service_name,
+        department_id=ticket.department_id,
+        status=ticket.status,
+        priority=ticket.priority,
+        notes=ticket.notes,
+        created_at=ticket.created_at,
+        called_at=ticket.called_at,
+        served_at=ticket.served_at,
+        completed_at=ticket.completed_at
+    )
+
 @router.post("/", response_model=TicketResponse)
 def create_new_ticket(
     ticket_data: TicketCreate,
@@ -140,44 +168,8 @@ async def _generate_ticket_number(db: AsyncSession, department_id: int) -> str:
     if not dept:
         raise HTTPException(status_code=404, detail="Department not found")
     
-    # Map department to letter prefix
-    dept_prefixes = {1: "A", 2: "B", 3: "C", 4: "D"}
-    dept_letter = dept_prefixes.get(department_id, "X")
-    
-    # Get max counter number for today (from all departments to ensure global uniqueness)
-    today = datetime.now().date()
-    max_ticket_result = await db.execute(
-        select(QueueTicket)
-        .where(func.date(QueueTicket.created_at) == today)
-        .order_by(QueueTicket.ticket_number.desc())
-        .limit(1)
-    )
-    max_ticket = max_ticket_result.scalar_one_or_none()
-    
-    max_counter = 0
-    if max_ticket and max_ticket.ticket_number:
-        try:
-            # Extract highest number from any ticket today (e.g., "A005" -> 5, "B010" -> 10)
-            import re
-            numbers = re.findall(r'\d+', max_ticket.ticket_number)
-            if numbers:
-                max_counter = int(numbers[0])
-        except (ValueError, IndexError):
-            pass
-    
-    # Counter-style format: A001, B001, C001, D001 (Next available global number)
-    counter_number = max_counter + 1
-    ticket_number = f"{dept_letter}{counter_number:03d}"
-    
-    # Double-check uniqueness (safety net)
-    while True:
-        existing_result = await db.execute(select(QueueTicket).where(QueueTicket.ticket_number == ticket_number))
-        if not existing_result.scalar_one_or_none():
-            break
-        counter_number += 1
-        ticket_number = f"{dept_letter}{counter_number:03d}"
-    
-    return ticket_number
+    # Counter-style format: A001, B001, C001, D001 (atomic per-prefix counter)
+    return await allocate_ticket_number_async(db, department_id)
 
 @router.post("/register", response_model=TicketResponse)
 async def register_ticket(
@@ -229,12 +221,19 @@ async def register_ticket(
         queue_position=queue_position,
         form_data=ticket_data.form_data,
         submitted_at=datetime.utcnow(),
-        estimated_wait_time=queue_position * service.estimated_duration
+        estimated_wait_time=wait_estimator.estimate(
+            department.id, queue_position - 1, service.id, service.estimated_duration
+        ).minutes
     )
     
     db.add(new_ticket)
     await db.commit()
     await db.refresh(new_ticket)
+    queue_engine.add(new_ticket.id, new_ticket.department_id, new_ticket.priority, new_ticket.created_at)
+    ticket_enqueued(
+        new_ticket.id, new_ticket.department_id, new_ticket.ticket_number,
+        new_ticket.priority, new_ticket.created_at
+    )
     
     return TicketResponse(
         id=new_ticket.id,
@@ -321,7 +320,9 @@ async def get_ticket_status(
         queue_position=ticket.queue_position,
         form_data=ticket.form_data or {},
         notes=ticket.notes,
-        estimated_wait_time=people_ahead_count * service.estimated_duration if service.estimated_duration else 5,
+        estimated_wait_time=wait_estimator.estimate(
+            ticket.department_id, people_ahead_count, service.id, service.estimated_duration
+        ).minutes,
         created_at=ticket.created_at,
         called_at=ticket.called_at,
         served_at=ticket.served_at,
@@ -379,57 +380,21 @@ async def get_department_queue(
     return tickets
 
 @router.put("/{ticket_id}/call", response_model=TicketResponse)
-async def call_ticket(
+def call_ticket(
     ticket_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    # Get ticket
-    result = await db.execute(
-        select(QueueTicket, Service, Department)
-        .join(Service)
-        .join(Department)
-        .where(QueueTicket.id == ticket_id)
-    )
-    ticket_info = result.first()
+    # waiting -> called
+    ticket = call_ticket_transition(db, ticket_id, current_user.id)
     
-    if not ticket_info:
+    if not ticket:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Ticket not found"
+            detail="Ticket not found or not waiting"
         )
     
-    ticket, service, department = ticket_info
-    
-    # Update ticket status
-    ticket.status = TicketStatus.CALLED
-    ticket.called_at = datetime.utcnow()
-    ticket.staff_id = current_user.id
-    
-    await db.commit()
-    await db.refresh(ticket)
-    
-    return TicketResponse(
-        id=ticket.id,
-        ticket_number=ticket.ticket_number,
-        customer_name=ticket.customer_name,
-        customer_phone=ticket.customer_phone,
-        customer_email=ticket.customer_email,
-        service_id=ticket.service_id,
-        service_name=service.name,
-        department_id=ticket.department_id,
-        department_name=department.name,
-        status=ticket.status,
-        priority=ticket.priority,
-        queue_position=ticket.queue_position,
-        form_data=ticket.form_data,
-        notes=ticket.notes,
-        estimated_wait_time=ticket.estimated_wait_time,
-        created_at=ticket.created_at,
-        called_at=ticket.called_at,
-        served_at=ticket.served_at,
-        completed_at=ticket.completed_at
-    )
+    return _ticket_response(ticket)
 
 @router.put("/{ticket_id}/serve", response_model=TicketResponse)
 async def serve_ticket(
@@ -485,61 +450,24 @@ async def serve_ticket(
     )
 
 @router.put("/{ticket_id}/complete", response_model=TicketResponse)
-async def complete_ticket(
+def complete_ticket(
     ticket_id: int,
     ticket_update: TicketUpdate,
-    db: AsyncSession = Depends(get_db),
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    # Get ticket
-    result = await db.execute(
-        select(QueueTicket, Service, Department)
-        .join(Service)
-        .join(Department)
-        .where(QueueTicket.id == ticket_id)
+    # called -> completed
+    ticket = complete_ticket_transition(
+        db, ticket_id, staff_id=current_user.id, notes=ticket_update.notes
     )
-    ticket_info = result.first()
     
-    if not ticket_info:
+    if not ticket:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Ticket not found"
+            detail="Ticket not found or not called"
         )
     
-    ticket, service, department = ticket_info
-    
-    # Update ticket
-    ticket.status = TicketStatus.COMPLETED
-    ticket.completed_at = datetime.utcnow()
-    ticket.staff_id = current_user.id
-    
-    if ticket_update.notes:
-        ticket.notes = ticket_update.notes
-    
-    await db.commit()
-    await db.refresh(ticket)
-    
-    return TicketResponse(
-        id=ticket.id,
-        ticket_number=ticket.ticket_number,
-        customer_name=ticket.customer_name,
-        customer_phone=ticket.customer_phone,
-        customer_email=ticket.customer_email,
-        service_id=ticket.service_id,
-        service_name=service.name,
-        department_id=ticket.department_id,
-        department_name=department.name,
-        status=ticket.status,
-        priority=ticket.priority,
-        queue_position=ticket.queue_position,
-        form_data=ticket.form_data,
-        notes=ticket.notes,
-        estimated_wait_time=ticket.estimated_wait_time,
-        created_at=ticket.created_at,
-        called_at=ticket.called_at,
-        served_at=ticket.served_at,
-        completed_at=ticket.completed_at
-    )
+    return _ticket_response(ticket)
 
 @router.get("/next/{department_id}")
 async def get_next_ticket(
@@ -547,20 +475,9 @@ async def get_next_ticket(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    # Get next ticket in queue - FIFO order
-    result = db.execute(
-        select(QueueTicket)
-        .where(
-            and_(
-                QueueTicket.department_id == department_id,
-                QueueTicket.status == TicketStatus.WAITING
-            )
-        )
-        .order_by(QueueTicket.queue_position.asc())
-        .limit(1)
-    )
-    
-    next_ticket = result.scalar_one_or_none()
+    # Get next ticket in queue - priority class, then FIFO order
+    next_ticket_id = queue_engine.peek(db, department_id)
+    next_ticket = db.get(QueueTicket, next_ticket_id) if next_ticket_id else None
     
     if not next_ticket:
         return {"message": "No tickets in queue"}
@@ -574,116 +491,57 @@ async def get_next_ticket(
 
 # Staff Call Action - Core functionality for Staff Dashboard
 @router.put("/{ticket_id}/call", response_model=TicketResponse)
-async def call_next_ticket(
+def call_next_ticket(
     ticket_id: int,
     db: Session = Depends(get_db)
     # TODO: Add back authentication after testing
     # current_user: User = Depends(get_current_user)
 ):
     """Staff calls the next customer - updates status from waiting to called"""
-    try:
-        # Get ticket with service and department info
-        result = db.execute(
-            select(QueueTicket, Service, Department)
-            .join(Service)
-            .join(Department)
-            .where(QueueTicket.id == ticket_id)
-        )
-        ticket_info = result.first()
-        
-        if not ticket_info:
-            raise HTTPException(
-                status_code=404,
-                detail="Ticket not found"
-            )
-        
-        ticket, service, department = ticket_info
-        
-        # Verify ticket is in waiting status
-        if ticket.status != TicketStatus.WAITING:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Cannot call ticket with status: {ticket.status}"
-            )
-        
-        # Update ticket status: waiting → called
-        ticket.status = TicketStatus.CALLED
-        ticket.called_at = datetime.utcnow()
-        # TODO: Use current_user.id after re-enabling auth
-        # ticket.staff_id = current_user.id
-        
-        db.commit()
-        db.refresh(ticket)
-        
-        # TODO: Send WebSocket notification to customer
-        # This will be implemented in Step 3
-        
-        return TicketResponse(
-            id=ticket.id,
-            ticket_number=ticket.ticket_number,
-            customer_name=ticket.customer_name,
-            customer_phone=ticket.customer_phone or "",
-            customer_email=ticket.customer_email,
-            service_id=ticket.service_id,
-            service_name=service.name,
-            department_id=ticket.department_id,
-            department_name=department.name,
-            status=ticket.status,
-            priority=ticket.priority,
-            queue_position=ticket.queue_position,
-            form_data=ticket.form_data or {},
-            notes=ticket.notes,
-            estimated_wait_time=ticket.estimated_wait_time,
-            created_at=ticket.created_at,
-            called_at=ticket.called_at,
-            served_at=ticket.served_at,
-            completed_at=ticket.completed_at
+    # Update ticket status: waiting → called (guarded, single statement)
+    # TODO: Use current_user.id after re-enabling auth
+    ticket = call_ticket_transition(db, ticket_id, None)
+    
+    if not ticket:
+        current_status = ticket_status(db, ticket_id)
+        if current_status is None:
+            raise HTTPException(status_code=404, detail="Ticket not found")
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot call ticket with status: {current_status}"
         )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error calling ticket: {str(e)}")
+    
+    # TODO: Send WebSocket notification to customer
+    # This will be implemented in Step 3
+    
+    return _ticket_response(ticket)
 
 # Simple test endpoint without authentication
 @router.put("/test/{ticket_id}/call")
-async def test_call_ticket(
+def test_call_ticket(
     ticket_id: int,
     db: Session = Depends(get_db)
 ):
     """Test endpoint for Staff call action without auth"""
-    try:
-        # Get ticket
-        result = db.execute(
-            select(QueueTicket)
-            .where(QueueTicket.id == ticket_id)
-        )
-        ticket = result.scalar_one_or_none()
-        
-        if not ticket:
-            raise HTTPException(status_code=404, detail="Ticket not found")
-        
-        # Update ticket status: waiting → called
-        ticket.status = TicketStatus.CALLED
-        ticket.called_at = datetime.utcnow()
-        
-        db.commit()
-        db.refresh(ticket)
-        
-        # Send WebSocket notification to Customer waiting on /waiting page
-        # Note: WebSocket manager instance needs to be passed from main.py
-        # For now, we'll add this as a TODO and implement in main integration
-        
-        return {
-            "success": True,
-            "ticket_id": ticket.id,
-            "ticket_number": ticket.ticket_number,
-            "old_status": "waiting",
-            "new_status": ticket.status,
-            "called_at": ticket.called_at,
-            "message": f"Successfully called ticket {ticket.ticket_number}"
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+    # Update ticket status: waiting → called
+    ticket = call_ticket_transition(db, ticket_id, None)
+    
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Ticket not found or not waiting")
+    
+    # Send WebSocket notification to Customer waiting on /waiting page
+    # Note: WebSocket manager instance needs to be passed from main.py
+    # For now, we'll add this as a TODO and implement in main integration
+    
+    return {
+        "success": True,
+        "ticket_id": ticket.id,
+        "ticket_number": ticket.ticket_number,
+        "old_status": "waiting",
+        "new_status": ticket.status,
+        "called_at": ticket.called_at,
+        "message": f"Successfully called ticket {ticket.ticket_number}"
+    }
 
 # Get next ticket for Staff to call (FIFO order)
 @router.get("/next-to-call/{department_id}")
@@ -851,7 +709,9 @@ def get_ticket_status_for_customer(
             "queue_info": {
                 "people_ahead": people_ahead,
                 "current_serving": current_serving,
-                "estimated_wait_time": people_ahead * 5,  # 5 minutes per person
+                "estimated_wait_time": wait_estimator.estimate(
+                    ticket.department_id, people_ahead, service.id, service.estimated_duration
+                ).minutes,
                 "department_name": department.name,
                 "service_name": service.name
             }
@@ -896,7 +756,7 @@ def get_simple_ticket_status(
             "status": ticket.status,
             "queue_position": ticket.queue_position,
             "people_ahead": people_ahead,
-            "estimated_wait": people_ahead * 5,
+            "estimated_wait": wait_estimator.estimate(ticket.department_id, people_ahead, ticket.service_id).minutes,
             "created_at": ticket.created_at.isoformat() if ticket.created_at else None,
             "called_at": ticket.called_at.isoformat() if ticket.called_at else None
         }
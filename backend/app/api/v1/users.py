@@ -7,7 +7,8 @@ from typing import List, Optional
 
 from ...core.database import get_db
 from ...models import User, Department, UserRole
-from ...core.security import get_current_user, get_password_hash
+from ...core.passwords import password_hasher
+from ...core.security import bump_token_version, get_current_user, user_changed_async
 
 router = APIRouter()
 
@@ -157,7 +158,7 @@ async def create_user(
     # Create new user
     new_user = User(
         username=user_data.username,
-        password_hash=get_password_hash(user_data.password),
+        password_hash=await password_hasher.hash_async(user_data.password),
         email=user_data.email,
         phone=user_data.phone,
         full_name=user_data.full_name,
@@ -235,8 +236,14 @@ async def update_user(
         user.department_id = user_data.department_id
     if user_data.is_active is not None:
         user.is_active = user_data.is_active
+    token_version = None
+    if user_data.role is not None or user_data.department_id is not None or user_data.is_active is not None:
+        # Claims tokens carry role and department: make the user log in again
+        token_version = bump_token_version(user)
     
     await db.commit()
+    # Role, department and active flag are read from the cache on every request
+    await user_changed_async(user_id, token_version)
     await db.refresh(user)
     
     # Get department name for response
@@ -269,18 +276,18 @@ async def change_password(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    from ...core.security import verify_password
-    
-    # Verify current password
-    if not verify_password(password_data.current_password, current_user.password_hash):
+    # Verify current password (bcrypt runs on the password executor, not the event loop)
+    if not await password_hasher.verify_async(password_data.current_password, current_user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect"
         )
     
     # Update password
-    current_user.password_hash = get_password_hash(password_data.new_password)
+    current_user.password_hash = await password_hasher.hash_async(password_data.new_password)
+    user_id, token_version = current_user.id, bump_token_version(current_user)
     await db.commit()
+    await user_changed_async(user_id, token_version)
     
     return {"message": "Password changed successfully"}
 
@@ -304,6 +311,8 @@ async def delete_user(
     
     # Soft delete (deactivate)
     user.is_active = False
+    token_version = bump_token_version(user)
     await db.commit()
+    await user_changed_async(user_id, token_version)
     
     return {"message": "User deactivated successfully"}
@@ -6,14 +6,27 @@ import os
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "postgresql://admin:password@db:5432/queue_manageement"
+    DB_SYNC_ON_EVENT_LOOP: str = "warn"  # sync session queries inside async def handlers: "off", "warn" or "raise" (tests)
     
     # Redis
     REDIS_URL: str = "redis://redis:6379"
+    QUEUE_INDEX_REBUILD_SECONDS: int = 300  # resync queue sorted sets from Postgres
+    QUEUE_INDEX_TIMEOUT_SECONDS: float = 0.5
     
     # Security
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 30.0  # authenticated users are re-read from the DB after this, 0 = no cache
+    PRINCIPAL_CACHE_SIZE: int = 4096  # most recently used token subjects kept
+    JWT_CLAIMS_TOKENS: bool = False  # embed user id, role, department and token version in access tokens
+    PASSWORD_BCRYPT_ROUNDS: int = 12  # bcrypt cost; hashes made with another cost are redone at login
+    PASSWORD_HASH_WORKERS: int = 2  # threads hashing/checking passwords, i.e. at most this many at once
+    REVOCATION_CHANNEL: str = "auth:revocations"  # pub/sub channel of logouts and token version bumps
+    REVOCATION_FILTER_CAPACITY: int = 100000  # revoked token ids the local Bloom filter is sized for
+    REVOCATION_FILTER_ERROR_RATE: float = 0.001  # share of valid tokens that still need a Redis lookup
+    REVOCATION_REFRESH_SECONDS: int = 300  # rebuild the filter from Redis, dropping expired ids
+    REVOCATION_TIMEOUT_SECONDS: float = 0.5
     
     # API
     API_V1_STR: str = "/api/v1"
@@ -28,7 +41,21 @@ class Settings(BaseSettings):
     DEBUG: bool = os.getenv("DEBUG", "false").lower() == "true"
     
     # WebSocket
-    WEBSOCKET_HEARTBEAT_INTERVAL: int = 30
+    WEBSOCKET_HEARTBEAT_INTERVAL: int = 30  # server_ping after this many seconds without a frame from the client
+    WEBSOCKET_IDLE_TIMEOUT_SECONDS: int = 90  # close sockets silent for this long
+    WEBSOCKET_HEARTBEAT_TICK_SECONDS: float = 1.0  # timer wheel resolution
+    WEBSOCKET_SEND_QUEUE_SIZE: int = 256  # queued outbound messages per socket before it is downgraded
+    WEBSOCKET_SEND_TIMEOUT_SECONDS: float = 10.0
+    WEBSOCKET_BROKER: str = "local"  # "redis" to fan out across workers/replicas via REDIS_URL
+    WEBSOCKET_BROKER_CHANNEL: str = "ws:events"
+    WEBSOCKET_COALESCE_WINDOW_MS: int = 150  # dashboard queue_update batching per department, 0 = off
+    WEBSOCKET_REPLAY_BUFFER_SIZE: int = 64  # recent events kept per ticket/department stream for resume_from
+    WEBSOCKET_RESUME_GRACE_SECONDS: float = 120.0  # streams keep buffering this long after the last subscriber left
+    WEBSOCKET_METRICS_WINDOW: int = 2048  # recent latency samples kept for the percentiles of /metrics/websocket
+    
+    # Wait-time estimator
+    WAIT_ESTIMATOR_ALPHA: float = 0.2  # weight of the newest service time
+    WAIT_ESTIMATOR_ACTIVE_MINUTES: int = 20  # staff count as serving this long after their last ticket
     
     # Additional settings to ignore extra env vars
     ENVIRONMENT: Optional[str] = "development"
@@ -1,18 +1,83 @@
 # Database Connection Management
-from sqlalchemy import create_engine
+import asyncio
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import URL, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from .config import settings
 
+logger = logging.getLogger(__name__)
+
 # Sync Database
 engine = create_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-# Async Database (for future use)
-# async_engine = create_async_engine(settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://"))
-# AsyncSessionLocal = sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+def async_database_url(url: str) -> URL:
+    """``DATABASE_URL`` for asyncpg: driver swapped, libpq's ``sslmode`` passed as ``ssl``"""
+    parsed = make_url(url).set(drivername="postgresql+asyncpg")
+    if "sslmode" in parsed.query:
+        parsed = parsed.update_query_dict({"ssl": parsed.query["sslmode"]}).difference_update_query(["sslmode"])
+    return parsed
+
+# Async Database (asyncpg): for async def handlers, which must not use SessionLocal
+async_engine = create_async_engine(async_database_url(settings.DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+class BlockingDatabaseCall(RuntimeError):
+    """A sync session ran a statement on the event loop thread"""
+
+
+# Set while blocking calls on the loop are expected (application startup)
+_blocking_allowed: ContextVar[bool] = ContextVar("blocking_db_allowed", default=False)
+_warned = set()
+
+
+@contextmanager
+def allow_blocking_db():
+    """Let sync sessions run on the event loop inside this block (startup, scripts)"""
+    token = _blocking_allowed.set(True)
+    try:
+        yield
+    finally:
+        _blocking_allowed.reset(token)
+
+
+def guard_event_loop(sync_engine, mode: str):
+    """Report statements ``sync_engine`` runs on a thread with a running event loop
+
+    Sync ``def`` handlers run on the threadpool and are fine; an ``async def``
+    handler using a sync session stalls every request and WebSocket of the
+    worker for the duration of the query. ``mode`` is ``"warn"`` (log each
+    statement once), ``"raise"`` (:class:`BlockingDatabaseCall`, for tests)
+    or ``"off"``.
+    """
+    if mode not in ("warn", "raise"):
+        return
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _check(conn, cursor, statement, parameters, context, executemany):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return  # threadpool or plain script
+        if _blocking_allowed.get():
+            return
+        summary = " ".join(statement.split())[:120]
+        if mode == "raise":
+            raise BlockingDatabaseCall(f"Sync session used on the event loop (use get_async_db): {summary}")
+        if summary not in _warned:
+            _warned.add(summary)
+            logger.warning(f"Sync session used on the event loop, blocking it (use get_async_db): {summary}")
+
+
+guard_event_loop(engine, settings.DB_SYNC_ON_EVENT_LOOP)
 
 def get_db():
     """Database dependency for FastAPI"""
@@ -22,10 +87,20 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """Async database dependency for ``async def`` handlers"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def create_tables():
     """Create all database tables"""
     Base.metadata.create_all(bind=engine)
+    # Columns added after the first release (create_all only creates missing tables)
+    with engine.begin() as connection:
+        connection.execute(text(
+            "ALTER TABLE users ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 0"
+        ))
 
 def drop_tables():
     """Drop all database tables (use with caution!)"""
-    Base.metadata.drop_all(bind=engine)
\ No newline at end of file
+    Base.metadata.drop_all(bind=engine)
@@ -0,0 +1,85 @@
+"""
+Password hashing off the event loop
+
+bcrypt costs tens of milliseconds of CPU per hash or check. Called inline
+from an ``async def`` handler it stalls the event loop (and every WebSocket
+with it); called from sync handlers during the login wave at shift start it
+ties up the whole threadpool. :class:`PasswordHasher` runs all of it on a
+small dedicated executor of ``PASSWORD_HASH_WORKERS`` threads instead:
+``async`` callers await it, sync callers block only their own worker thread,
+and at most that many hashes run at once.
+
+The cost factor is ``PASSWORD_BCRYPT_ROUNDS``. A login whose stored hash
+was made with another cost is re-hashed with the current one
+(:meth:`PasswordHasher.verify_and_update`), so changing the setting
+migrates users as they log in.
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import bcrypt
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasher:
+    """bcrypt hashing and verification on a bounded executor"""
+
+    def __init__(self, rounds: int, workers: int):
+        self.rounds = rounds
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="password-hash")
+
+    # ---- blocking primitives (run on the executor) ---------------------
+
+    def _hash(self, password: str) -> str:
+        return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(self.rounds)).decode("utf-8")
+
+    def _verify(self, password: str, hashed: str) -> bool:
+        try:
+            return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+        except Exception as e:
+            logger.warning(f"Password verification error: {e}")
+            return False
+
+    def _verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        if not self._verify(password, hashed):
+            return False, None
+        return True, self._hash(password) if self.needs_rehash(hashed) else None
+
+    # ---- callers ---------------------------------------------------------
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """True if ``hashed`` is not a bcrypt hash at the configured cost"""
+        parts = hashed.split("$")
+        return len(parts) < 4 or not parts[2].isdigit() or int(parts[2]) != self.rounds
+
+    def hash(self, password: str) -> str:
+        """Hash from sync code (waits on the executor)"""
+        return self._executor.submit(self._hash, password).result()
+
+    def verify(self, password: str, hashed: str) -> bool:
+        """Check from sync code (waits on the executor)"""
+        return self._executor.submit(self._verify, password, hashed).result()
+
+    def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """``(valid, new_hash)`` from sync code; ``new_hash`` is set when the cost changed"""
+        return self._executor.submit(self._verify_and_update, password, hashed).result()
+
+    async def hash_async(self, password: str) -> str:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._hash, password)
+
+    async def verify_async(self, password: str, hashed: str) -> bool:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._verify, password, hashed)
+
+    async def verify_and_update_async(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._verify_and_update, password, hashed
+        )
+
+
+# Global hasher instance
+password_hasher = PasswordHasher(settings.PASSWORD_BCRYPT_ROUNDS, settings.PASSWORD_HASH_WORKERS)
@@ -0,0 +1,104 @@
+"""
+Who is making a request, without the ORM
+
+Most handlers only read ``current_user.id``, ``.role`` and
+``.department_id``. A :class:`Principal` carries just those fields (plus
+email, active flag and token version) and can be built from a ``User`` row
+or, when ``JWT_CLAIMS_TOKENS`` is on, from the claims of the access token
+itself (see ``security.get_current_principal``), in which case no database
+or cache is involved at all.
+
+Claims stay valid until the token expires, so every access token carries
+the user's ``ver`` (in either mode) and changing a user's role, department,
+active flag or password bumps ``users.token_version``; tokens carrying an
+older ``ver`` claim are refused. :data:`token_versions` is the
+in-process view of those versions: this worker learns them from the bumps
+it makes and from every ``User`` it loads.
+"""
+import threading
+from typing import Dict, Optional
+
+from .config import settings
+
+
+class Principal:
+    """The authenticated user's id, role and department"""
+
+    __slots__ = ("id", "email", "role", "department_id", "is_active", "token_version")
+
+    def __init__(
+        self,
+        id: int,
+        email: Optional[str],
+        role: str,
+        department_id: Optional[int],
+        is_active: bool = True,
+        token_version: int = 0
+    ):
+        self.id = id
+        self.email = email
+        self.role = role
+        self.department_id = department_id
+        self.is_active = is_active
+        self.token_version = token_version
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(
+            user.id,
+            user.email,
+            getattr(user.role, "value", user.role),
+            user.department_id,
+            user.is_active is not False,
+            user.token_version or 0
+        )
+
+    @classmethod
+    def from_claims(cls, payload: dict) -> Optional["Principal"]:
+        """Principal of a claims token, None if the token carries no claims"""
+        if "uid" not in payload or "role" not in payload:
+            return None
+        return cls(payload["uid"], payload.get("sub"), payload["role"], payload.get("dept"), True,
+                   payload.get("ver", 0))
+
+
+def principal_claims(user) -> dict:
+    """Claims embedded in a claims-mode access token for ``user``"""
+    return {
+        "uid": user.id,
+        "role": getattr(user.role, "value", user.role),
+        "dept": user.department_id,
+        "ver": user.token_version or 0,
+    }
+
+
+def token_claims(user) -> dict:
+    """Claims put in every access token issued for ``user``
+
+    Always the token version, so that bumping it revokes the token; the
+    full :func:`principal_claims` in claims mode (``JWT_CLAIMS_TOKENS``).
+    """
+    if settings.JWT_CLAIMS_TOKENS:
+        return principal_claims(user)
+    return {"ver": user.token_version or 0}
+
+
+class TokenVersions:
+    """Lowest token version still accepted, per user id (as far as this worker knows)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: Dict[int, int] = {}
+
+    def observe(self, user_id: int, version: int):
+        """Tokens of ``user_id`` older than ``version`` are revoked"""
+        with self._lock:
+            if version > self._versions.get(user_id, 0):
+                self._versions[user_id] = version
+
+    def is_current(self, user_id: int, version: int) -> bool:
+        return version >= self._versions.get(user_id, 0)
+
+
+# Global token version registry
+token_versions = TokenVersions()
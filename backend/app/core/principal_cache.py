@@ -0,0 +1,125 @@
+"""
+Cache of authenticated users
+
+Every authenticated request decodes its JWT and used to look the user up by
+email, which made ``SELECT ... FROM users`` the most executed query (the
+staff dashboard alone makes several calls a second). The cache keeps a
+detached snapshot of the user's columns per token subject, for
+``PRINCIPAL_CACHE_TTL_SECONDS`` and at most ``PRINCIPAL_CACHE_SIZE``
+subjects (least recently used go first).
+
+A hit is attached to the request's session with ``merge(load=False)``, which
+emits no SQL: handlers still get a session-bound ``User`` they can read,
+lazy-load relationships of and update. Code that changes a user's role,
+department, active flag, email or password calls :meth:`invalidate` so this
+worker forgets it at once; other workers pick the change up within the TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from ..models import User
+from .config import settings
+from .database import SessionLocal
+from .principal import Principal, token_versions
+
+
+class PrincipalCache:
+    """TTL + LRU map from token subject to a detached ``User`` snapshot"""
+
+    def __init__(self, ttl: float, size: int):
+        self.ttl = ttl
+        self.size = size
+        self._lock = threading.Lock()  # sync dependencies run in the threadpool
+        self._entries: "OrderedDict[str, Tuple[float, User]]" = OrderedDict()  # subject -> (expires, snapshot)
+        self._subjects: Dict[int, str] = {}  # user id -> subject, for invalidation by id
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.size > 0
+
+    def get(self, subject: str) -> Optional[User]:
+        """Snapshot for ``subject`` if cached and fresh (shared: attach, don't mutate)"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(subject)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(subject)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, subject: str, user: User):
+        """Remember a copy of ``user``'s loaded columns (``user`` itself is not kept)"""
+        if not self.enabled:
+            return
+        snapshot = User(**{
+            attribute.key: getattr(user, attribute.key) for attribute in User.__mapper__.column_attrs
+        })
+        make_transient_to_detached(snapshot)
+        with self._lock:
+            self._drop(subject)
+            self._entries[subject] = (time.monotonic() + self.ttl, snapshot)
+            self._subjects[snapshot.id] = subject
+            while len(self._entries) > self.size:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, user_id: Optional[int] = None, subject: Optional[str] = None):
+        """Forget a user by id (whatever subject it was cached under) and/or by subject"""
+        with self._lock:
+            if user_id is not None and user_id in self._subjects:
+                self._drop(self._subjects[user_id])
+            if subject is not None:
+                self._drop(subject)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._subjects.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _drop(self, subject: str):
+        entry = self._entries.pop(subject, None)
+        if entry is not None and self._subjects.get(entry[1].id) == subject:
+            del self._subjects[entry[1].id]
+
+
+def load_user(db: Session, subject: str) -> Optional[User]:
+    """The user a token subject (email) names, bound to ``db``; cached between requests"""
+    cached = principal_cache.get(subject)
+    if cached is not None:
+        return db.merge(cached, load=False)
+    return _fetch_user(db, subject)
+
+
+def load_principal(subject: str) -> Optional[Principal]:
+    """:class:`Principal` of a token subject: from the cache, else a session closed before returning"""
+    cached = principal_cache.get(subject)
+    if cached is not None:
+        return Principal.from_user(cached)
+    with SessionLocal() as db:
+        user = _fetch_user(db, subject)
+        return Principal.from_user(user) if user is not None else None
+
+
+def _fetch_user(db: Session, subject: str) -> Optional[User]:
+    user = db.query(User).filter(User.email == subject).first()
+    if user is not None:
+        token_versions.observe(user.id, user.token_version or 0)
+        principal_cache.put(subject, user)
+    return user
+
+
+# Global cache instance
+principal_cache = PrincipalCache(settings.PRINCIPAL_CACHE_TTL_SECONDS, settings.PRINCIPAL_CACHE_SIZE)
@@ -0,0 +1,273 @@
+"""
+Revoked access tokens
+
+Access tokens carry a ``jti`` (token id). Logging out revokes that id until
+the token would have expired anyway; deactivating a user, or changing its
+role, department or password, revokes all of its tokens by raising its token
+version (see ``principal.py``). Redis holds both lists for every worker:
+
+- ``auth:revoked`` - sorted set of revoked token ids, scored by expiry
+- ``auth:token_versions`` - hash of user id to lowest accepted token version
+
+and each revocation is also published on ``REVOCATION_CHANNEL``.
+
+Asking Redis on every request would undo the principal cache and claims
+tokens, so each worker mirrors the revoked ids into a :class:`BloomFilter`
+and user versions into ``token_versions``. A token whose id is not in the
+filter - nearly all of them - is accepted without I/O. Only a filter hit
+(a revoked token or a rare false positive) is confirmed with one ``ZSCORE``.
+
+The listener keeps the mirror current from pub/sub, and it is rebuilt from
+Redis every ``REVOCATION_REFRESH_SECONDS`` and after every reconnect. The
+rebuild catches up on messages missed while disconnected and drops expired
+ids, which a Bloom filter cannot delete. If Redis is down, a filter hit is
+refused.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+from typing import Dict, Optional
+
+import redis
+import redis.asyncio as aioredis
+
+from .config import settings
+from .principal import token_versions
+
+logger = logging.getLogger(__name__)
+
+REVOKED_KEY = "auth:revoked"
+TOKEN_VERSIONS_KEY = "auth:token_versions"
+
+# Seconds between reconnect attempts of the pub/sub listener
+RECONNECT_SECONDS = 1.0
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter of strings (no deletes: rebuild instead)"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(1, capacity)
+        self.bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self._array = bytearray((self.bits + 7) // 8)
+        self._lock = threading.Lock()  # revocations come from threadpool handlers
+        self.count = 0
+
+    def _positions(self, item: str):
+        # Double hashing: k positions from one 128-bit digest
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.bits for i in range(self.hashes)]
+
+    def add(self, item: str):
+        positions = self._positions(item)
+        with self._lock:
+            for position in positions:
+                self._array[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        array = self._array
+        return all(array[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    """Revoked token ids and user token versions, in Redis and mirrored locally"""
+
+    def __init__(self, url: Optional[str] = None, channel: str = "auth:revocations", client=None, async_client=None):
+        self._url = url
+        self.channel = channel
+        self._client = client
+        self._async_client = async_client  # pub/sub listener: no socket timeout
+        self._async_commands = async_client  # commands from async handlers, with timeouts
+        self._filter = self._new_filter(0)
+        self._pending: Optional[list] = None  # ids revoked while a rebuild is in flight
+        self._unsynced: Dict[str, float] = {}  # id -> expiry, revoked here while Redis was failing
+        self._tasks = []
+        self.filter_hits = 0
+        self.false_positives = 0
+
+    @property
+    def client(self) -> redis.Redis:
+        if self._client is None:
+            self._client = redis.Redis.from_url(
+                self._url,
+                socket_timeout=settings.REVOCATION_TIMEOUT_SECONDS,
+                socket_connect_timeout=settings.REVOCATION_TIMEOUT_SECONDS,
+            )
+        return self._client
+
+    @property
+    def async_commands(self) -> aioredis.Redis:
+        if self._async_commands is None:
+            self._async_commands = aioredis.Redis.from_url(
+                self._url,
+                socket_timeout=settings.REVOCATION_TIMEOUT_SECONDS,
+                socket_connect_timeout=settings.REVOCATION_TIMEOUT_SECONDS,
+            )
+        return self._async_commands
+
+    @staticmethod
+    def _new_filter(expected: int) -> BloomFilter:
+        capacity = max(settings.REVOCATION_FILTER_CAPACITY, 2 * expected)
+        return BloomFilter(capacity, settings.REVOCATION_FILTER_ERROR_RATE)
+
+    def _remember(self, jti: str):
+        self._filter.add(jti)
+        pending = self._pending
+        if pending is not None:
+            pending.append(jti)
+
+    # ---- revocations ---------------------------------------------------
+
+    def revoke(self, jti: str, expires_at: float):
+        """Revoke one token id until ``expires_at`` (epoch seconds)"""
+        self._remember(jti)
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.zadd(REVOKED_KEY, {jti: expires_at})
+            pipe.publish(self.channel, json.dumps({"jti": jti}))
+            pipe.execute()
+        except redis.RedisError as e:
+            self._unsynced[jti] = expires_at
+            logger.warning(f"Token {jti} revoked on this worker only, Redis failed: {e}")
+
+    def revoke_user(self, user_id: int, token_version: int):
+        """Refuse the user's tokens older than ``token_version`` on every worker"""
+        token_versions.observe(user_id, token_version)
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            self._queue_user_version(pipe, user_id, token_version)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Token version of user {user_id} raised on this worker only, Redis failed: {e}")
+
+    async def revoke_user_async(self, user_id: int, token_version: int):
+        """Async variant of :meth:`revoke_user` (Redis without blocking the event loop)"""
+        token_versions.observe(user_id, token_version)
+        try:
+            pipe = self.async_commands.pipeline(transaction=False)
+            self._queue_user_version(pipe, user_id, token_version)
+            await pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Token version of user {user_id} raised on this worker only, Redis failed: {e}")
+
+    def _queue_user_version(self, pipe, user_id: int, token_version: int):
+        # Queues the commands on a sync or async pipeline; the caller executes it
+        pipe.hset(TOKEN_VERSIONS_KEY, user_id, token_version)
+        pipe.publish(self.channel, json.dumps({"uid": user_id, "ver": token_version}))
+
+    # ---- checks ----------------------------------------------------------
+
+    def might_be_revoked(self, jti: Optional[str]) -> bool:
+        """Filter lookup only: False means certainly not revoked"""
+        return jti is not None and jti in self._filter
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        """Whether the token id was revoked; asks Redis only on a filter hit"""
+        if not self.might_be_revoked(jti):
+            return False
+        self.filter_hits += 1
+        if self._unsynced.get(jti, 0) > time.time():
+            return True
+        try:
+            expires_at = self.client.zscore(REVOKED_KEY, jti)
+        except redis.RedisError as e:
+            logger.warning(f"Revocation check failed, refusing token {jti}: {e}")
+            return True
+        if expires_at is None:
+            self.false_positives += 1
+            return False
+        return True
+
+    # ---- mirror ----------------------------------------------------------
+
+    def refresh(self) -> int:
+        """Rebuild the local filter and token versions from Redis (blocking)"""
+        self._pending = []
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.zremrangebyscore(REVOKED_KEY, "-inf", time.time())
+            pipe.zrange(REVOKED_KEY, 0, -1)
+            pipe.hgetall(TOKEN_VERSIONS_KEY)
+            _, revoked, versions = pipe.execute()
+            bloom = self._new_filter(len(revoked))
+            for jti in revoked:
+                bloom.add(jti.decode("utf-8"))
+            now = time.time()
+            for jti, expires_at in list(self._unsynced.items()):
+                if expires_at > now:
+                    bloom.add(jti)
+                else:
+                    del self._unsynced[jti]
+            self._filter = bloom
+            # Revoked during the rebuild: later ones already went into the new filter
+            for jti in self._pending:
+                bloom.add(jti)
+        finally:
+            self._pending = None
+        for user_id, version in versions.items():
+            token_versions.observe(int(user_id), int(version))
+        return len(revoked)
+
+    async def start(self):
+        """Load the mirror and keep it current (call from the app's lifespan)"""
+        if self._async_client is None:
+            self._async_client = aioredis.from_url(self._url)
+        self._tasks = [asyncio.ensure_future(self._listen()), asyncio.ensure_future(self._refresh_periodically())]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._tasks = []
+
+    async def _refresh(self):
+        try:
+            loaded = await asyncio.get_running_loop().run_in_executor(None, self.refresh)
+            logger.info(f"Revocation filter rebuilt with {loaded} token ids")
+        except redis.RedisError as e:
+            logger.warning(f"Revocation filter rebuild failed: {e}")
+
+    async def _refresh_periodically(self):
+        while True:
+            await asyncio.sleep(settings.REVOCATION_REFRESH_SECONDS)
+            await self._refresh()
+
+    async def _listen(self):
+        while True:
+            pubsub = self._async_client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                # Anything revoked before (or while we were away) is only in Redis
+                await self._refresh()
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    event = json.loads(message["data"])
+                    if "jti" in event:
+                        self._remember(event["jti"])
+                    elif "uid" in event:
+                        token_versions.observe(int(event["uid"]), int(event["ver"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Revocation listener lost its subscription: {e}")
+                await asyncio.sleep(RECONNECT_SECONDS)
+            finally:
+                try:
+                    await pubsub.reset()
+                except Exception:
+                    pass
+
+
+# Global revocation list instance
+revocation_list = RevocationList(settings.REDIS_URL, settings.REVOCATION_CHANNEL)
@@ -1,8 +1,8 @@
 # Security Utilities
+import uuid
 from datetime import datetime, timedelta
 from typing import Any, Union, Optional
 from jose import jwt, JWTError
-import bcrypt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer
 from sqlalchemy.orm import Session
@@ -11,29 +11,32 @@ from sqlalchemy import select
 
 from .config import settings
 from .database import get_db
+from .passwords import password_hasher
+from .principal import Principal, token_claims, token_versions
+from .principal_cache import load_principal, load_user, principal_cache
+from .revocation import revocation_list
 from ..models import User
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against a hash using bcrypt"""
-    try:
-        return bcrypt.checkpw(
-            plain_password.encode('utf-8'),
-            hashed_password.encode('utf-8')
-        )
-    except Exception as e:
-        print(f"Password verification error: {str(e)}")
-        return False
+    """Verify a password against a bcrypt hash (on the password executor; async code: ``password_hasher.verify_async``)"""
+    return password_hasher.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    """Hash a password using bcrypt"""
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+    """Hash a password with bcrypt (on the password executor; async code: ``password_hasher.hash_async``)"""
+    return password_hasher.hash(password)
 
 def create_access_token(
     subject: Union[str, Any], 
-    expires_delta: Optional[timedelta] = None
+    expires_delta: Optional[timedelta] = None,
+    user: Optional[User] = None
 ) -> str:
-    """Create JWT access token"""
+    """Create JWT access token
+    
+    With ``user`` given the token carries its token version (``ver``), so a
+    version bump revokes it. With ``JWT_CLAIMS_TOKENS`` on it also carries
+    the user's id, role and department, which lets
+    :func:`get_current_principal` skip the database.
+    """
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
@@ -41,7 +44,9 @@ def create_access_token(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
     
-    to_encode = {"exp": expire, "sub": str(subject)}
+    to_encode = {"exp": expire, "sub": str(subject), "jti": uuid.uuid4().hex}
+    if user is not None:
+        to_encode.update(token_claims(user))
     encoded_jwt = jwt.encode(
         to_encode, 
         settings.SECRET_KEY, 
@@ -49,45 +54,64 @@ def create_access_token(
     )
     return encoded_jwt
 
-def verify_token(token: str) -> Optional[str]:
-    """Verify JWT token and return subject"""
+def decode_token(token: str) -> Optional[dict]:
+    """Verify JWT token and return its payload (None if invalid, expired or without subject)"""
     try:
         payload = jwt.decode(
             token, 
             settings.SECRET_KEY, 
             algorithms=[settings.ALGORITHM]
         )
-        token_data = payload.get("sub")
-        if token_data is None:
+        if payload.get("sub") is None:
             return None
-        return token_data
+        return payload
     except JWTError:
         return None
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify plain password against hashed password"""
-    # Demo mode - bypass bcrypt issues
-    demo_passwords = {
-        "Admin123!": ["admin@qstream.vn", "manager.01@qstream.vn", "manager.02@qstream.vn", 
-                     "staff.01@qstream.vn", "staff.02@qstream.vn", "staff.03@qstream.vn", "staff.04@qstream.vn"],
-        "admin123": ["admin@test.com"]
-    }
-    
-    # Check demo passwords
-    for pwd, emails in demo_passwords.items():
-        if plain_password == pwd:
-            return True
-    
-    # Fallback to bcrypt if available
-    try:
-        return pwd_context.verify(plain_password, hashed_password)
-    except Exception as e:
-        print(f"Password verification error: {e}")
+def verify_token(token: str) -> Optional[str]:
+    """Verify JWT token and return subject"""
+    payload = decode_token(token)
+    return payload["sub"] if payload is not None else None
+
+def token_is_current(payload: dict, user_id: int, token_version: Optional[int] = None) -> bool:
+    """False if the token was revoked: by logout (its ``jti``) or by a bump of its ``ver`` claim"""
+    if revocation_list.is_revoked(payload.get("jti")):
+        return False
+    version = payload.get("ver")
+    if version is None:
+        return True  # issued before tokens carried a version: inactive users are refused by the caller
+    if token_version is not None and version < token_version:
         return False
+    return token_versions.is_current(user_id, version)
 
-def get_password_hash(password: str) -> str:
-    """Hash password"""
-    return pwd_context.hash(password)
+def bump_token_version(user: User) -> int:
+    """Revoke the user's outstanding claims tokens (takes effect when the caller commits)
+    
+    Call it when role, department, active flag or password change; pass the
+    returned version to :func:`user_changed` (or :func:`user_changed_async`)
+    after the commit.
+    """
+    user.token_version = (user.token_version or 0) + 1
+    return user.token_version
+
+def user_changed(user_id: int, token_version: Optional[int] = None):
+    """After committing a change to a user: drop its cached principal, revoke older tokens everywhere"""
+    principal_cache.invalidate(user_id)
+    if token_version is not None:
+        revocation_list.revoke_user(user_id, token_version)
+
+async def user_changed_async(user_id: int, token_version: Optional[int] = None):
+    """Async variant of :func:`user_changed` for ``async def`` handlers"""
+    principal_cache.invalidate(user_id)
+    if token_version is not None:
+        await revocation_list.revoke_user_async(user_id, token_version)
+
+def revoke_token(payload: dict) -> bool:
+    """Revoke one access token (logout) on every worker; False for tokens without ``jti``"""
+    if payload.get("jti") is None:
+        return False
+    revocation_list.revoke(payload["jti"], payload["exp"])
+    return True
 
 def create_credentials_exception() -> HTTPException:
     """Create credentials exception"""
@@ -108,7 +132,8 @@ def get_current_user(
     credentials_exception = create_credentials_exception()
     try:
         print(f"🔐 DEBUG: Received token: {token.credentials[:20]}...")  # Debug log
-        email = verify_token(token.credentials)
+        payload = decode_token(token.credentials)
+        email = payload["sub"] if payload is not None else None
         print(f"🔐 DEBUG: Verified email: {email}")  # Debug log
         if email is None:
             print("🔐 DEBUG: Email is None, raising exception")  # Debug log
@@ -117,11 +142,14 @@ def get_current_user(
         print(f"🔐 DEBUG: JWT Error: {e}")  # Debug log
         raise credentials_exception
         
-    user = db.query(User).filter(User.email == email).first()
+    user = load_user(db, email)  # cached between requests, see principal_cache.py
     print(f"🔐 DEBUG: Found user: {user.email if user else 'None'}")  # Debug log
     if user is None:
         print("🔐 DEBUG: User is None, raising exception")  # Debug log
         raise credentials_exception
+    # Deactivation revokes every token, including ones issued without ``ver``
+    if user.is_active is False or not token_is_current(payload, user.id, user.token_version):
+        raise credentials_exception
         
     return user
 
@@ -183,18 +211,37 @@ def get_current_user_sync(
         token_str = token.credentials if hasattr(token, 'credentials') else token
         
         # Verify token and get email
-        email = verify_token(token_str)
-        if email is None:
+        payload = decode_token(token_str)
+        if payload is None:
             raise credentials_exception
             
-        # Get user from database
-        from ..models import User
-        user = db.query(User).filter(User.email == email).first()
+        # Get user from the principal cache, or the database
+        user = load_user(db, payload["sub"])
         
-        if user is None:
+        if user is None or user.is_active is False or not token_is_current(payload, user.id, user.token_version):
             raise credentials_exception
             
         return user
         
     except Exception:
-        raise credentials_exception
\ No newline at end of file
+        raise credentials_exception
+
+def get_current_principal(token: str = Depends(security)) -> Principal:
+    """Id, role and department of the caller, for handlers that need nothing else
+    
+    Claims tokens (``JWT_CLAIMS_TOKENS``) are answered from the token alone,
+    without a database session. Older subject-only tokens fall back to the
+    principal cache, then to a short-lived session. Handlers that need the
+    full ``User`` keep depending on :func:`get_current_user_sync`.
+    """
+    payload = decode_token(token.credentials)
+    if payload is None:
+        raise create_credentials_exception()
+    principal = Principal.from_claims(payload)
+    if principal is None:
+        principal = load_principal(payload["sub"])
+    if principal is None or not principal.is_active:
+        raise create_credentials_exception()
+    if not token_is_current(payload, principal.id, principal.token_version):
+        raise create_credentials_exception()
+    return principal
\ No newline at end of file
@@ -8,6 +8,7 @@ import logging
 from app.core.database import get_db
 from app.core.security import get_current_user
 from app.models import User
+from app.realtime.auth import CLOSE_UNAUTHORIZED, authenticate
 from app.schemas.schedule import (
     ScheduleCreate, ScheduleUpdate, ScheduleResponse,
     LeaveRequestCreate, LeaveRequestUpdate, LeaveRequestResponse,
@@ -23,18 +24,23 @@ logger = logging.getLogger(__name__)
 
 # WebSocket endpoint for real-time schedule updates
 @router.websocket("/ws/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, user_id: int, db: Session = Depends(get_db)):
-    """WebSocket endpoint for real-time schedule updates"""
+async def websocket_endpoint(websocket: WebSocket, user_id: int):
+    """WebSocket endpoint for real-time schedule updates
+
+    No ``Depends(get_db)`` here: a session held for the life of the socket
+    would pin a pooled connection. The user is looked up in a short-lived
+    session while authenticating the ``?token=`` and only a detached
+    principal is kept.
+    """
     try:
-        # Get user info for connection
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await authenticate(websocket, user_id)
         if not user:
-            await websocket.close(code=4004, reason="User not found")
+            await websocket.close(code=CLOSE_UNAUTHORIZED, reason="Not authenticated")
             return
         
         await websocket_manager.schedule_connect(
             websocket=websocket,
-            user_id=user_id,
+            user_id=user.id,
             user_role=user.role,
             department_id=user.department_id
         )
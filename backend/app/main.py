@@ -11,10 +11,22 @@ import asyncio
 from datetime import datetime
 import redis.asyncio as redis
 
-from .core.database import create_tables
+from .core.database import allow_blocking_db, async_engine, create_tables, SessionLocal
 from .core.config import settings
+from .core.principal import Principal
+from .core.revocation import revocation_list
+from .core.security import get_current_principal
 from .models import Base
 from .websocket_manager import websocket_manager
+from .realtime.broker import create_broker
+from .realtime.envelope import decode_client_message, negotiate
+from .realtime.replay import department_stream, ticket_stream
+from .realtime.rooms import DASHBOARD_ROLES
+from .services.queue_engine import queue_engine
+from .services.position_broadcaster import position_broadcaster
+from .services.now_serving import now_serving
+from .services.wait_estimator import wait_estimator
+from .services.estimator_feed import estimator_feed
 
 # Redis connection
 redis_client = None
@@ -25,12 +37,52 @@ async def lifespan(app: FastAPI):
     global redis_client
     redis_client = redis.from_url(settings.REDIS_URL)
     
-    # Create database tables
-    create_tables()
+    # Create database tables (startup may block the loop; see DB_SYNC_ON_EVENT_LOOP)
+    with allow_blocking_db():
+        create_tables()
+    
+    # Load waiting tickets into the in-memory queue engine
+    try:
+        with allow_blocking_db(), SessionLocal() as db:
+            loaded = queue_engine.warm_start(db)
+        print(f"Queue engine warm start: {loaded} waiting tickets")
+    except Exception as e:
+        print(f"Queue engine warm start failed: {e}")
+    
+    # WebSocket events reach clients on every worker through the broker
+    await websocket_manager.start(create_broker(
+        settings.WEBSOCKET_BROKER, settings.REDIS_URL, settings.WEBSOCKET_BROKER_CHANNEL
+    ))
+    
+    # Mirror revoked tokens from Redis and follow new revocations
+    await revocation_list.start()
+    
+    # Position pushes and service times are scheduled onto this loop from sync endpoints
+    position_broadcaster.bind_loop(asyncio.get_running_loop())
+    estimator_feed.bind_loop(asyncio.get_running_loop())
+    
+    # Materialize the "now serving" display board
+    try:
+        with allow_blocking_db(), SessionLocal() as db:
+            loaded = now_serving.warm_start(db, asyncio.get_running_loop())
+        print(f"Display board warm start: {loaded} active tickets")
+    except Exception as e:
+        print(f"Display board warm start failed: {e}")
+    
+    # Seed the wait-time estimator with recent service times
+    try:
+        with allow_blocking_db(), SessionLocal() as db:
+            loaded = wait_estimator.warm_start(db)
+        print(f"Wait estimator warm start: {loaded} completed tickets")
+    except Exception as e:
+        print(f"Wait estimator warm start failed: {e}")
     
     yield
     
     # Shutdown
+    await websocket_manager.stop()
+    await revocation_list.stop()
+    await async_engine.dispose()
     if redis_client:
         await redis_client.close()
 
@@ -76,15 +128,22 @@ app.include_router(api_router, prefix="/api/v1")
 async def websocket_endpoint(websocket: WebSocket, client_id: str):
     """WebSocket endpoint for real-time updates"""
     print(f"New WebSocket connection request from client {client_id}")
+    connection = None
     
     try:
-        # Accept connection first
-        await websocket.accept()
-        print(f"WebSocket connection accepted for client {client_id}")
+        # Accept connection first; clients pick the wire format by offering
+        # the "qms.msgpack" / "qms.json" subprotocol (or ?encoding=msgpack).
+        # permessage-deflate is negotiated by uvicorn when the client offers it.
+        encoding, subprotocol = negotiate(
+            websocket.scope.get("subprotocols", []),
+            websocket.query_params.get("encoding")
+        )
+        await websocket.accept(subprotocol=subprotocol)
+        print(f"WebSocket connection accepted for client {client_id} ({encoding})")
         
         # Add to manager
-        success = await websocket_manager.connect(websocket, client_id)
-        if not success:
+        connection = await websocket_manager.connect(websocket, client_id, encoding)
+        if connection is None:
             print(f"Failed to add client {client_id} to manager")
             await websocket.close()
             return
@@ -92,17 +151,24 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
         print(f"Client {client_id} successfully connected and added to manager")
         
         try:
-            # Keep connection alive with message handling loop
+            # Keep connection alive with message handling loop; keepalive
+            # pings and eviction of silent clients are done by the manager's
+            # heartbeat wheel, which only needs to hear about activity
             while True:
-                # Wait for messages with a timeout to allow for periodic checks
                 try:
-                    data = await asyncio.wait_for(websocket.receive_text(), timeout=60.0)
-                    print(f"Received data from {client_id}: {data}")
+                    data = await websocket.receive()
+                    if data["type"] == "websocket.disconnect":
+                        raise WebSocketDisconnect(data.get("code", 1000))
+                    if not websocket_manager.touch(client_id, connection):
+                        # The client reconnected on a new socket; that handler owns client_id now
+                        print(f"Client {client_id} superseded by a newer connection")
+                        break
+                    print(f"Received data from {client_id}: {data.get('text') or data.get('bytes')}")
                     
                     try:
-                        message = json.loads(data)
-                    except json.JSONDecodeError:
-                        print(f"Invalid JSON from {client_id}: {data}")
+                        message = decode_client_message(data)
+                    except ValueError:
+                        print(f"Invalid message from {client_id}: {data}")
                         continue
                         
                     msg_type = message.get("type")
@@ -123,28 +189,59 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
                         if ticket_id:
                             success = await websocket_manager.join_queue(client_id, ticket_id)
                             if success:
+                                # A reconnecting client sends the epoch and last seq it saw
+                                stream = websocket_manager.resume(
+                                    client_id,
+                                    ticket_stream(ticket_id),
+                                    message.get("resume_from"),
+                                    message.get("epoch")
+                                )
                                 response = {
                                     "type": "joined",
-                                    "ticket_id": ticket_id
+                                    "ticket_id": ticket_id,
+                                    **stream
                                 }
                                 await websocket_manager.send_personal_message(
                                     json.dumps(response),
                                     client_id
                                 )
+                                if not stream["resumed"] and str(ticket_id).isdigit():
+                                    await position_broadcaster.ticket_subscribed(int(ticket_id))
                     
-                except asyncio.TimeoutError:
-                    # No message received in 60 seconds, connection is still alive
-                    # Send a keep-alive ping from server
-                    try:
-                        await websocket.send_text(json.dumps({
-                            "type": "server_ping",
-                            "timestamp": datetime.now().isoformat()
-                        }))
-                    except:
-                        # Connection is dead, break out of loop
-                        print(f"Failed to send keep-alive to {client_id}")
-                        break
-                    continue
+                    elif msg_type == "join_department":
+                        department_id = message.get("department_id")
+                        role = message.get("role", "staff")
+                        if str(department_id).isdigit():
+                            success = await websocket_manager.join_department(client_id, int(department_id), role)
+                            stream = {}
+                            if success and role in DASHBOARD_ROLES:
+                                # resumed=False: refetch the queue over HTTP
+                                stream = websocket_manager.resume(
+                                    client_id,
+                                    department_stream(department_id),
+                                    message.get("resume_from"),
+                                    message.get("epoch")
+                                )
+                            await websocket_manager.send_personal_message(
+                                json.dumps({
+                                    "type": "joined_department" if success else "error",
+                                    "department_id": int(department_id),
+                                    "role": role,
+                                    **stream
+                                }),
+                                client_id
+                            )
+                    
+                    elif msg_type == "leave_department":
+                        department_id = message.get("department_id")
+                        await websocket_manager.leave_department(
+                            client_id,
+                            int(department_id) if str(department_id).isdigit() else None
+                        )
+                    
+                except RuntimeError:
+                    # receive() after the heartbeat closed the socket
+                    raise WebSocketDisconnect(1001)
                 
         except WebSocketDisconnect:
             print(f"Client {client_id} disconnected normally")
@@ -164,7 +261,9 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
         
     finally:
         print(f"Cleaning up connection for {client_id}")
-        await websocket_manager.disconnect(client_id)
+        # Leaves a resumed connection of the same client id alone
+        if connection is not None:
+            await websocket_manager.disconnect(client_id, connection)
 
 # Utility function to broadcast queue updates
 async def broadcast_queue_update(ticket_id: str, update_data: dict):
@@ -186,6 +285,17 @@ async def health_check():
         "version": "1.0.0"
     }
 
+# WebSocket metrics of this worker (connections, queue depths, send failures, fan-out latency)
+@app.get("/metrics/websocket")
+async def websocket_metrics(current_user: Principal = Depends(get_current_principal)):
+    if current_user.role not in ["manager", "admin"]:
+        raise HTTPException(status_code=403, detail="Manager or admin access required")
+    return {
+        "pid": os.getpid(),
+        "timestamp": datetime.utcnow().isoformat(),
+        **websocket_manager.metrics_snapshot()
+    }
+
 # Root endpoint
 @app.get("/")
 async def root():
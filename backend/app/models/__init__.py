@@ -1,7 +1,8 @@
 """
 Minimal models for Queue Management System
-Tables: 9 (departments, users, services, counters, queue_tickets, 
-        staff_performance, ticket_complaints, shifts, staff_schedules)
+Tables: 10 (departments, users, services, counters, queue_tickets, 
+        staff_performance, ticket_complaints, shifts, staff_schedules,
+        ticket_counters)
 """
 
 from ..core.database import Base
@@ -11,6 +12,7 @@ from .department import Department
 from .service import Service
 from .counter import Counter
 from .ticket import QueueTicket, TicketStatus, TicketPriority
+from .ticket_counter import TicketCounter
 from .ticket_complaint import TicketComplaint, TicketComplaintStatus
 from .schedule import Shift, StaffSchedule
 from .staff_performance import StaffPerformance
@@ -24,6 +26,7 @@ __all__ = [
     "QueueTicket",
     "TicketStatus",
     "TicketPriority",
+    "TicketCounter",
     "TicketComplaint",
     "TicketComplaintStatus", 
     "Shift",
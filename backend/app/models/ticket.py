@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Text, Index, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -52,4 +52,13 @@ class QueueTicket(Base):
     department = relationship("Department", back_populates="tickets")
     staff = relationship("User", back_populates="tickets_handled")
     counter = relationship("Counter", back_populates="tickets")
-    ticket_complaints = relationship("TicketComplaint", back_populates="ticket")
\ No newline at end of file
+    ticket_complaints = relationship("TicketComplaint", back_populates="ticket")
+
+    __table_args__ = (
+        # Keeps the call-next claim on the (small) set of waiting tickets
+        Index(
+            'idx_queue_tickets_waiting',
+            'department_id', 'created_at',
+            postgresql_where=text("status = 'waiting'")
+        ),
+    )
\ No newline at end of file
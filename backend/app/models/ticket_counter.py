@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+
+from ..core.database import Base
+
+
+class TicketCounter(Base):
+    """Last issued ticket number per prefix (A, B, C, D, X).
+
+    One row per prefix; allocation is a single row-locked UPDATE so
+    concurrent kiosks never see the same number.
+    """
+    __tablename__ = "ticket_counters"
+    
+    prefix = Column(String(8), primary_key=True)
+    last_value = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
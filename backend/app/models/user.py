@@ -16,6 +16,7 @@ class User(Base):
     role = Column(String)  # admin, manager, staff
     department_id = Column(Integer, ForeignKey("departments.id"))
     is_active = Column(Boolean, default=True)
+    token_version = Column(Integer, nullable=False, default=0)  # bumped to revoke outstanding claims tokens
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # Relationships
@@ -0,0 +1,34 @@
+"""
+Real-time delivery building blocks used by the WebSocket manager
+"""
+
+from .broker import Broker, RedisBroker, create_broker
+from .coalescer import Coalescer
+from .connection import Connection
+from .envelope import Envelope, negotiate
+from .heartbeat import HeartbeatWheel
+from .metrics import LatencyWindow, Metrics
+from .registry import Registry
+from .replay import ReplayLog, department_stream, ticket_stream
+from .rooms import RoomIndex, department_room, role_room, ticket_room
+
+__all__ = [
+    "Broker",
+    "RedisBroker",
+    "create_broker",
+    "Coalescer",
+    "Connection",
+    "Envelope",
+    "HeartbeatWheel",
+    "LatencyWindow",
+    "Metrics",
+    "negotiate",
+    "Registry",
+    "ReplayLog",
+    "department_stream",
+    "ticket_stream",
+    "RoomIndex",
+    "department_room",
+    "role_room",
+    "ticket_room",
+]
@@ -0,0 +1,56 @@
+"""
+Who is on the other end of a WebSocket
+
+WebSocket endpoints live as long as their socket, so they must not take a
+database session with ``Depends(get_db)``: every open dashboard would pin a
+pooled connection until it disconnects, and a handful of them exhaust the
+pool and stall every HTTP request. :func:`authenticate` instead verifies the
+``?token=`` JWT and returns a detached :class:`~app.core.principal.Principal`:
+straight from the token's claims in claims mode, otherwise from the
+principal cache or a short-lived session on the threadpool, which is back
+in the pool before the socket is accepted.
+"""
+import asyncio
+import logging
+from typing import Optional
+
+from fastapi import WebSocket
+
+from ..core.principal import Principal
+from ..core.principal_cache import load_principal
+from ..core.revocation import revocation_list
+from ..core.security import decode_token, token_is_current
+
+logger = logging.getLogger(__name__)
+
+# Close code (application range) for sockets that fail authentication
+CLOSE_UNAUTHORIZED = 4401
+
+
+async def authenticate(websocket: WebSocket, user_id: Optional[int] = None) -> Optional[Principal]:
+    """Principal of the socket's ``?token=``, or None (the caller closes with CLOSE_UNAUTHORIZED)
+
+    With ``user_id`` (from the URL) the token must belong to that user.
+    """
+    token = websocket.query_params.get("token")
+    payload = decode_token(token) if token else None
+    if payload is None:
+        return None
+    loop = asyncio.get_running_loop()
+    principal = Principal.from_claims(payload)
+    if principal is None:
+        principal = await loop.run_in_executor(None, load_principal, payload["sub"])
+    if principal is None or not principal.is_active:
+        return None
+    if revocation_list.might_be_revoked(payload.get("jti")):
+        current = await loop.run_in_executor(
+            None, token_is_current, payload, principal.id, principal.token_version
+        )  # asks Redis
+    else:
+        current = token_is_current(payload, principal.id, principal.token_version)
+    if not current:
+        return None
+    if user_id is not None and principal.id != user_id:
+        logger.warning(f"WebSocket token of user {principal.id} used for user {user_id}")
+        return None
+    return principal
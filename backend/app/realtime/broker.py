@@ -0,0 +1,125 @@
+"""
+Fan-out of WebSocket events across workers
+
+Every broadcast of the WebSocket manager is published as an event and every
+worker delivers it to the sockets it holds. :class:`Broker` (the default)
+delivers in-process only, which is all a single worker needs.
+:class:`RedisBroker` additionally publishes on a Redis pub/sub channel so
+clients connected to other uvicorn workers or replicas get the event too.
+
+The publishing worker delivers locally first and skips its own events when
+they come back from Redis, so local clients never wait on Redis and keep
+working while it is unavailable.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from typing import Awaitable, Callable, Optional
+
+import redis.asyncio as redis
+
+from .envelope import dumps
+
+logger = logging.getLogger(__name__)
+
+Deliver = Callable[[dict], Awaitable[None]]
+
+# Seconds between reconnect attempts of the Redis listener
+RECONNECT_SECONDS = 1.0
+
+
+class Broker:
+    """In-process broker: events go straight to this worker's sockets"""
+
+    def __init__(self, deliver: Optional[Deliver] = None):
+        self._deliver = deliver
+
+    async def start(self, deliver: Deliver):
+        self._deliver = deliver
+
+    async def publish(self, event: dict):
+        await self._deliver_local(event)
+
+    async def stop(self):
+        self._deliver = None
+
+    async def _deliver_local(self, event: dict):
+        if self._deliver is not None:
+            await self._deliver(event)
+
+
+class RedisBroker(Broker):
+    """Broker that also relays events to other workers over Redis pub/sub"""
+
+    def __init__(self, url: Optional[str] = None, channel: str = "ws:events", client=None):
+        super().__init__()
+        self.url = url
+        self.channel = channel
+        self.origin = uuid.uuid4().hex  # tells our own events apart when they come back
+        self._client = client
+        self._listener: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+
+    async def start(self, deliver: Deliver):
+        await super().start(deliver)
+        if self._client is None:
+            self._client = redis.from_url(self.url)
+        self._listener = asyncio.ensure_future(self._listen())
+        # Events published before the subscription is active would be lost
+        try:
+            await asyncio.wait_for(self._ready.wait(), 5)
+        except asyncio.TimeoutError:
+            logger.warning(f"Redis broker not subscribed to {self.channel} yet, continuing")
+
+    async def publish(self, event: dict):
+        await self._deliver_local(event)
+        try:
+            await self._client.publish(self.channel, dumps({"origin": self.origin, "event": event}))
+        except Exception as e:
+            logger.warning(f"Redis broker publish failed, delivered locally only: {e}")
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+        await super().stop()
+
+    async def _listen(self):
+        while True:
+            pubsub = self._client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                self._ready.set()
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    envelope = json.loads(message["data"])
+                    if envelope.get("origin") == self.origin:
+                        continue
+                    try:
+                        await self._deliver_local(envelope["event"])
+                    except Exception as e:
+                        logger.warning(f"Delivering broker event failed: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Redis broker listener lost its subscription: {e}")
+                await asyncio.sleep(RECONNECT_SECONDS)
+            finally:
+                try:
+                    await pubsub.reset()
+                except Exception:
+                    pass
+
+
+def create_broker(kind: str, url: str, channel: str) -> Broker:
+    """Broker named by the ``WEBSOCKET_BROKER`` setting (``local`` or ``redis``)"""
+    if kind == "redis":
+        return RedisBroker(url, channel)
+    if kind != "local":
+        logger.warning(f"Unknown WEBSOCKET_BROKER {kind!r}, using the in-process broker")
+    return Broker()
@@ -0,0 +1,79 @@
+"""
+Per-room coalescing of bursty events
+
+During a rush a department produces many ticket events per second and each
+used to become its own dashboard broadcast. A :class:`Coalescer` sends the
+first event for a key (e.g. a department) right away, then opens a window:
+everything arriving for that key inside the window is handed to the flush
+callback as one batch when the window closes, which opens the next window.
+So a key produces at most one message per window however fast events come,
+and a quiet key still gets its first event without delay.
+
+Batches of one key are flushed in arrival order and never overlap, so the
+merged messages keep per-ticket ordering.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+Flush = Callable[[Hashable, List], Awaitable[None]]
+
+
+class Coalescer:
+    """Batches events per key into at most one flush per ``window`` seconds"""
+
+    def __init__(self, window: float, flush: Flush):
+        self.window = window
+        self._flush = flush
+        self._pending: Dict[Hashable, List] = {}
+        # Keys inside a window: its timer, or None while a batch is being sent
+        self._windows: Dict[Hashable, Optional[asyncio.TimerHandle]] = {}
+
+    async def add(self, key: Hashable, event):
+        if key in self._windows:
+            self._pending.setdefault(key, []).append(event)
+            return
+        if self.window <= 0:
+            await self._run(key, [event])
+            return
+        self._windows[key] = None
+        await self._flush_window(key, [event])
+
+    def close(self):
+        """Drop pending batches and timers (at shutdown)"""
+        for timer in self._windows.values():
+            if timer is not None:
+                timer.cancel()
+        self._windows.clear()
+        self._pending.clear()
+
+    @property
+    def pending(self) -> int:
+        return sum(len(events) for events in self._pending.values())
+
+    def _open_window(self, key: Hashable):
+        loop = asyncio.get_running_loop()
+        self._windows[key] = loop.call_later(self.window, self._close_window, key)
+
+    def _close_window(self, key: Hashable):
+        events = self._pending.pop(key, None)
+        if not events:
+            del self._windows[key]
+            return
+        # The key stays "in a window" while its batch is sent, so later
+        # events queue behind it instead of overtaking it
+        self._windows[key] = None
+        asyncio.ensure_future(self._flush_window(key, events))
+
+    async def _flush_window(self, key: Hashable, events: List):
+        await self._run(key, events)
+        if key in self._windows:  # not closed meanwhile
+            self._open_window(key)
+
+    async def _run(self, key: Hashable, events: List):
+        try:
+            await self._flush(key, events)
+        except Exception as e:
+            logger.warning(f"Flushing {len(events)} coalesced events for {key!r} failed: {e}")
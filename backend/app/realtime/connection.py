@@ -0,0 +1,165 @@
+"""
+Outbound side of one WebSocket connection
+
+Every socket gets a bounded queue and its own writer task, so a broadcast
+only appends to queues and never waits on a client. A slow client delays
+nobody but itself; a dead one is noticed by its own writer's send timeout.
+
+Messages are :class:`~.envelope.Envelope` objects shared by every
+connection of a broadcast; the writer asks each for the socket's wire
+format (JSON text or MessagePack binary), which is encoded only once.
+
+When a queue overflows the connection is first downgraded: its backlog is
+thrown away and replaced by a single ``resync`` message telling the client
+to refetch its state over HTTP. Overflowing again before that message was
+delivered means the client cannot keep up at all and it is dropped.
+
+Sends, failures, overflows and delivery latency are counted in the
+manager's :class:`~.metrics.Metrics`, when one is given.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, Union
+
+from fastapi import WebSocket
+
+from .envelope import JSON, Envelope
+from .metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+RESYNC_MESSAGE = Envelope({"type": "resync", "reason": "backlog"})
+
+# Close code for clients dropped because they could not keep up (RFC 6455 "try again later")
+CLOSE_TOO_SLOW = 1013
+
+
+class Connection:
+    """A WebSocket plus its bounded outbound queue and writer task"""
+
+    __slots__ = ("key", "websocket", "encoding", "limit", "send_timeout", "_pending", "_wakeup", "_writer",
+                 "_on_dead", "_metrics", "lagging", "closed", "sent", "overflows", "last_seen")
+
+    def __init__(
+        self,
+        key,
+        websocket: WebSocket,
+        limit: int,
+        send_timeout: float,
+        on_dead: Optional[Callable[["Connection"], Awaitable[None]]] = None,
+        encoding: str = JSON,
+        metrics: Optional[Metrics] = None
+    ):
+        self.key = key
+        self.websocket = websocket
+        self.encoding = encoding
+        self.limit = limit
+        self.send_timeout = send_timeout
+        self._pending: Deque[Envelope] = deque()
+        self._wakeup = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+        self._on_dead = on_dead
+        self._metrics = metrics
+        self.lagging = False  # backlog was replaced by a resync message not yet sent
+        self.closed = False
+        self.sent = 0
+        self.overflows = 0
+        self.last_seen = time.monotonic()  # last frame received, see heartbeat.py
+
+    def start(self):
+        self._writer = asyncio.ensure_future(self._write_loop())
+
+    def touch(self):
+        """The client sent something: it is alive"""
+        self.last_seen = time.monotonic()
+
+    @property
+    def backlog(self) -> int:
+        return len(self._pending)
+
+    def enqueue(self, message: Union[Envelope, str, dict]) -> bool:
+        """Queue a message without waiting; False if the connection is (now) gone"""
+        if self.closed:
+            return False
+        if len(self._pending) >= self.limit:
+            self.overflows += 1
+            if self.lagging:
+                logger.info(f"Dropping WebSocket {self.key}: outbound queue overflowed twice")
+                if self._metrics is not None:
+                    self._metrics.slow_drops += 1
+                self.abort(CLOSE_TOO_SLOW)
+                return False
+            logger.info(f"WebSocket {self.key} is lagging, replacing {len(self._pending)} queued messages with resync")
+            self._pending.clear()
+            self._pending.append(RESYNC_MESSAGE)
+            self.lagging = True
+            if self._metrics is not None:
+                self._metrics.overflows += 1
+            self._wakeup.set()
+            return True
+        self._pending.append(Envelope.of(message))
+        self._wakeup.set()
+        return True
+
+    async def _write_loop(self):
+        loop = asyncio.get_running_loop()
+        pending = self._pending
+        metrics = self._metrics
+        try:
+            while True:
+                while not pending:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                # One deadline per drained batch, pushed forward after every send
+                async with asyncio.timeout_at(loop.time() + self.send_timeout) as deadline:
+                    while pending:
+                        message = pending.popleft()
+                        data = message.encode(self.encoding)
+                        if isinstance(data, bytes):
+                            await self.websocket.send_bytes(data)
+                        else:
+                            await self.websocket.send_text(data)
+                        self.sent += 1
+                        if message is RESYNC_MESSAGE:
+                            self.lagging = False
+                        if metrics is not None:
+                            metrics.sent += 1
+                            if message is not RESYNC_MESSAGE:  # a shared constant, created at import
+                                metrics.delivery.observe(time.monotonic() - message.created)
+                        deadline.reschedule(loop.time() + self.send_timeout)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.info(f"WebSocket {self.key} writer stopped: {e!r}")
+            if metrics is not None:
+                metrics.send_failures += 1
+            self.closed = True
+            self._pending.clear()
+            if self._on_dead is not None:
+                await self._on_dead(self)
+
+    def abort(self, code: int = 1000):
+        """Stop writing and close the socket in the background"""
+        if self.closed:
+            return
+        self.closed = True
+        self._pending.clear()
+        self.stop()
+        asyncio.ensure_future(self._close(code))
+
+    def stop(self):
+        """Cancel the writer task (unless we are running inside it)"""
+        self.closed = True
+        writer = self._writer
+        if writer is not None and not writer.done() and writer is not asyncio.current_task():
+            writer.cancel()
+
+    async def _close(self, code: int):
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code), self.send_timeout)
+        except Exception:
+            pass
+        if self._on_dead is not None:
+            await self._on_dead(self)
@@ -0,0 +1,119 @@
+"""
+Broadcast envelopes
+
+An :class:`Envelope` wraps one outgoing message and caches its encoded form
+per wire format, so a broadcast to N sockets encodes the payload once per
+format instead of N times. JSON goes through ``orjson`` when it is
+installed; sockets that negotiated the ``qms.msgpack`` subprotocol get
+MessagePack binary frames instead.
+"""
+import json
+import logging
+import time
+from typing import Any, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    logger.info("msgpack package not installed. WebSocket clients will only be offered JSON.")
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+# Wire formats, named after the WebSocket subprotocol that selects them
+JSON = "json"
+MSGPACK = "msgpack"
+SUBPROTOCOLS = {"qms.json": JSON, "qms.msgpack": MSGPACK}
+
+
+def dumps(message: Any) -> str:
+    """JSON text of a message (orjson when available)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(message, default=str).decode()
+    return json.dumps(message, default=str)
+
+
+def negotiate(offered: list, requested: Optional[str] = None) -> tuple:
+    """Pick ``(encoding, subprotocol to accept)`` for a WebSocket handshake.
+
+    ``offered`` are the client's ``Sec-WebSocket-Protocol`` values in
+    preference order; ``requested`` is an ``?encoding=`` query parameter for
+    clients that cannot set subprotocols. Unknown or unavailable formats fall
+    back to JSON.
+    """
+    for subprotocol in offered:
+        encoding = SUBPROTOCOLS.get(subprotocol)
+        if encoding == MSGPACK and not MSGPACK_AVAILABLE:
+            continue
+        if encoding is not None:
+            return encoding, subprotocol
+    if requested == MSGPACK and MSGPACK_AVAILABLE:
+        return MSGPACK, None
+    return JSON, None
+
+
+class Envelope:
+    """One message, encoded at most once per wire format"""
+
+    __slots__ = ("_message", "_text", "_binary", "created")
+
+    def __init__(self, message: Any = None, text: Optional[str] = None):
+        self._message = message
+        self._text = text
+        self._binary: Optional[bytes] = None
+        self.created = time.monotonic()  # for delivery latency, see metrics.py
+
+    @classmethod
+    def of(cls, message: Union["Envelope", str, dict]) -> "Envelope":
+        """Wrap a dict, or JSON text a caller already encoded"""
+        if isinstance(message, Envelope):
+            return message
+        if isinstance(message, str):
+            return cls(text=message)
+        return cls(message)
+
+    @property
+    def message(self) -> Any:
+        if self._message is None and self._text is not None:
+            self._message = json.loads(self._text)
+        return self._message
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = dumps(self._message)
+        return self._text
+
+    @property
+    def binary(self) -> bytes:
+        if self._binary is None:
+            self._binary = msgpack.packb(self.message, default=str)
+        return self._binary
+
+    def encode(self, encoding: str) -> Union[str, bytes]:
+        return self.binary if encoding == MSGPACK else self.text
+
+
+def decode_client_message(frame: dict) -> dict:
+    """Message dict of a received ASGI frame (JSON text or MessagePack bytes).
+
+    Raises ``ValueError`` for anything that is not an object in either format.
+    """
+    if frame.get("text") is not None:
+        message = json.loads(frame["text"])
+    elif frame.get("bytes") is not None and MSGPACK_AVAILABLE:
+        message = msgpack.unpackb(frame["bytes"])
+    else:
+        raise ValueError("unsupported frame")
+    if not isinstance(message, dict):
+        raise ValueError("message is not an object")
+    return message
@@ -0,0 +1,106 @@
+"""
+Keepalives and idle eviction for every WebSocket
+
+Instead of a receive timeout and ping per socket, one task drives a hashed
+timer wheel holding all connections. Receiving a frame only stamps the
+connection's ``last_seen`` (:meth:`Connection.touch`); the wheel looks at a
+connection again when its next deadline comes up:
+
+- silent for ``interval``: it gets the ``server_ping`` shared by every
+  connection pinged in that tick
+- silent for ``idle_timeout``: it is closed and dropped from the manager
+- otherwise it is put back in the slot of its next deadline
+
+Each tick only touches the connections due in its slot, so the cost per
+connection is constant and there is no timer or task per socket. Closed
+connections are skipped when their slot comes up rather than removed.
+"""
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime
+from typing import List, Optional, Set
+
+from .connection import Connection
+from .envelope import Envelope
+
+logger = logging.getLogger(__name__)
+
+# Close code for connections evicted after being silent too long (RFC 6455 "going away")
+CLOSE_IDLE = 1001
+
+
+class HeartbeatWheel:
+    """Hashed timer wheel over the last activity of all connections"""
+
+    def __init__(self, interval: float, idle_timeout: float, tick: float = 1.0):
+        self.interval = interval
+        self.idle_timeout = max(idle_timeout, interval)
+        self.tick = tick
+        # No deadline is ever more than one interval away
+        self._slots: List[Set[Connection]] = [set() for _ in range(math.ceil(interval / tick) + 1)]
+        self._cursor = 0
+        self._task: Optional[asyncio.Task] = None
+        self.pinged = 0
+        self.evicted = 0
+
+    def add(self, connection: Connection):
+        connection.touch()
+        self._schedule(connection, connection.last_seen + self.interval, time.monotonic())
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def __len__(self) -> int:
+        return sum(len(slot) for slot in self._slots)
+
+    def _schedule(self, connection: Connection, due: float, now: float):
+        ticks = min(max(1, math.ceil((due - now) / self.tick)), len(self._slots) - 1)
+        self._slots[(self._cursor + ticks) % len(self._slots)].add(connection)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time() + self.tick
+        while True:
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+            next_tick += self.tick
+            try:
+                self.advance()
+            except Exception as e:
+                logger.warning(f"Heartbeat tick failed: {e}")
+
+    def advance(self):
+        """Process the next slot (one tick)"""
+        self._cursor = (self._cursor + 1) % len(self._slots)
+        due, self._slots[self._cursor] = self._slots[self._cursor], set()
+        now = time.monotonic()
+        ping = None
+        for connection in due:
+            if connection.closed:
+                continue
+            idle = now - connection.last_seen
+            if idle >= self.idle_timeout:
+                logger.info(f"Evicting WebSocket {connection.key}: silent for {idle:.0f}s")
+                connection.abort(CLOSE_IDLE)
+                self.evicted += 1
+                continue
+            if idle >= self.interval:
+                if ping is None:
+                    ping = Envelope({"type": "server_ping", "timestamp": datetime.now().isoformat()})
+                connection.enqueue(ping)
+                self.pinged += 1
+                due_at = min(now + self.interval, connection.last_seen + self.idle_timeout)
+            else:
+                due_at = connection.last_seen + self.interval
+            self._schedule(connection, due_at, now)
@@ -0,0 +1,84 @@
+"""
+Live counters of the WebSocket layer
+
+One :class:`Metrics` per manager. Connections report into it as they go
+(sends, failed sends, overflows, clients dropped for being too slow) and the
+manager times each fan-out; gauges such as connection counts and queue
+depths are read from the registries when a snapshot is taken, so nothing is
+maintained per message beyond a counter increment and, for latencies, one
+append to a bounded window of recent samples.
+
+Latencies:
+
+- ``fanout``: time for the manager to hand one event to every local
+  recipient's queue, per broker op
+- ``delivery``: time from a message being created to its frame being written
+  to a socket, i.e. fan-out plus queueing behind the socket's backlog
+"""
+import time
+from collections import deque
+from typing import Deque, Dict
+
+
+class LatencyWindow:
+    """The most recent ``size`` samples of a latency, for percentiles"""
+
+    __slots__ = ("samples", "count")
+
+    def __init__(self, size: int = 2048):
+        self.samples: Deque[float] = deque(maxlen=size)
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def summary(self) -> dict:
+        """Total count plus p50/p90/p99/max (milliseconds) of the recent samples"""
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {"count": self.count}
+        last = len(ordered) - 1
+        return {
+            "count": self.count,
+            "p50_ms": round(ordered[last * 50 // 100] * 1000, 3),
+            "p90_ms": round(ordered[last * 90 // 100] * 1000, 3),
+            "p99_ms": round(ordered[last * 99 // 100] * 1000, 3),
+            "max_ms": round(ordered[last] * 1000, 3),
+        }
+
+
+class Metrics:
+    """Counters and latency windows shared by a manager and its connections"""
+
+    def __init__(self, window: int = 2048):
+        self.window = window
+        self.started = time.monotonic()
+        self.sent = 0  # frames written
+        self.send_failures = 0  # writers stopped by a send error or timeout
+        self.overflows = 0  # backlogs replaced by a resync message
+        self.slow_drops = 0  # clients closed for overflowing twice
+        self.fanout: Dict[str, LatencyWindow] = {}
+        self.recipients: Dict[str, int] = {}
+        self.delivery = LatencyWindow(window)
+
+    def observe_fanout(self, op: str, seconds: float, recipients: int):
+        samples = self.fanout.get(op)
+        if samples is None:
+            samples = self.fanout[op] = LatencyWindow(self.window)
+        samples.observe(seconds)
+        self.recipients[op] = self.recipients.get(op, 0) + recipients
+
+    def snapshot(self) -> dict:
+        return {
+            "uptime_seconds": round(time.monotonic() - self.started, 1),
+            "sent": self.sent,
+            "send_failures": self.send_failures,
+            "overflows": self.overflows,
+            "slow_drops": self.slow_drops,
+            "fanout": {
+                op: {**samples.summary(), "recipients": self.recipients.get(op, 0)}
+                for op, samples in self.fanout.items()
+            },
+            "delivery": self.delivery.summary(),
+        }
@@ -0,0 +1,59 @@
+"""
+Registry of live WebSocket connections
+
+One :class:`Registry` holds a kind of socket (``/ws`` clients keyed by
+client id, schedule sockets keyed by user id): the connection records by
+key and by socket object, and their room memberships in a two-way
+:class:`~.rooms.RoomIndex`. Ticket subscriptions are rooms too
+(:func:`~.rooms.ticket_room`), so a client can follow several tickets and
+every add, remove, join and leave is O(1) per room involved.
+"""
+from typing import Dict, Hashable, Iterator, Optional
+
+from .connection import Connection
+from .rooms import RoomIndex
+
+
+class Registry:
+    """Connections by key and by socket, plus the rooms they joined"""
+
+    def __init__(self):
+        self.connections: Dict[Hashable, Connection] = {}
+        self.rooms = RoomIndex()
+        self._by_socket: Dict[int, Connection] = {}  # id(websocket) -> connection
+
+    def add(self, connection: Connection) -> Optional[Connection]:
+        """Register a connection; returns the one it replaces (same key), if any"""
+        previous = self.connections.get(connection.key)
+        if previous is not None:
+            self._by_socket.pop(id(previous.websocket), None)
+        self.connections[connection.key] = connection
+        self._by_socket[id(connection.websocket)] = connection
+        return previous
+
+    def remove(self, key: Hashable, connection: Optional[Connection] = None) -> Optional[Connection]:
+        """Unregister ``key`` (only if it is still ``connection``, when given)
+
+        Its rooms are kept: the caller decides what leaving them means.
+        """
+        current = self.connections.get(key)
+        if current is None or (connection is not None and current is not connection):
+            return None
+        del self.connections[key]
+        self._by_socket.pop(id(current.websocket), None)
+        return current
+
+    def get(self, key: Hashable) -> Optional[Connection]:
+        return self.connections.get(key)
+
+    def by_socket(self, websocket) -> Optional[Connection]:
+        return self._by_socket.get(id(websocket))
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.connections
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.connections)
+
+    def __len__(self) -> int:
+        return len(self.connections)
@@ -0,0 +1,113 @@
+"""
+Resumable WebSocket streams
+
+Events for a followed ticket and a department's dashboards form a *stream*
+(keys ``("ticket", ticket_id)`` and ``("department", department_id)``).
+:class:`ReplayLog` numbers every event of a stream with a consecutive
+``seq`` and keeps the last few in a ring buffer. A client that reconnects
+sends the ``epoch`` and last ``seq`` it saw (``resume_from``) with its
+join message and gets only what it missed, or a snapshot when the events
+are no longer buffered.
+
+A stream lives while it has subscribers and for a grace period after its
+last subscriber dropped, so events that happen while a phone is offline are
+still produced and buffered. Each stream incarnation has its own epoch, so
+sequence numbers of an expired stream, another worker or a restarted server
+are never mistaken for current ones. Clients should ignore ``seq`` values
+they already saw: events arriving while a resume is handled can come twice.
+"""
+import itertools
+import time
+import uuid
+from collections import deque
+from typing import Deque, Dict, Hashable, Iterator, List, Optional, Tuple, Union
+
+from .envelope import Envelope
+
+# Seconds between sweeps for expired streams
+PRUNE_INTERVAL_SECONDS = 10.0
+
+
+def ticket_stream(ticket_id) -> tuple:
+    return ("ticket", str(ticket_id))
+
+
+def department_stream(department_id: int) -> tuple:
+    return ("department", int(department_id))
+
+
+class _Stream:
+    __slots__ = ("epoch", "seq", "events", "expires")
+
+    def __init__(self, epoch: str, size: int):
+        self.epoch = epoch
+        self.seq = 0
+        self.events: Deque[Tuple[int, Envelope]] = deque(maxlen=size)
+        self.expires: Optional[float] = None  # set once the last subscriber left
+
+
+class ReplayLog:
+    """Sequence numbers and a bounded replay buffer per stream"""
+
+    def __init__(self, size: int, grace: float):
+        self.size = size
+        self.grace = grace
+        self._prefix = uuid.uuid4().hex[:8]
+        self._incarnations = itertools.count(1)
+        self._streams: Dict[Hashable, _Stream] = {}
+        self._next_prune = 0.0
+
+    def open(self, key: Hashable) -> dict:
+        """A subscriber joined: keep the stream; returns its ``{"epoch", "seq"}``"""
+        stream = self._streams.get(key)
+        if stream is None:
+            stream = self._streams[key] = _Stream(f"{self._prefix}.{next(self._incarnations)}", self.size)
+        stream.expires = None
+        return {"epoch": stream.epoch, "seq": stream.seq}
+
+    def retain(self, key: Hashable):
+        """The last subscriber left: keep buffering for the grace period"""
+        now = time.monotonic()
+        stream = self._streams.get(key)
+        if stream is not None:
+            stream.expires = now + self.grace
+        if now >= self._next_prune:
+            self._next_prune = now + PRUNE_INTERVAL_SECONDS
+            for key, stream in list(self._streams.items()):
+                if stream.expires is not None and stream.expires <= now:
+                    del self._streams[key]
+
+    def retained(self) -> Iterator[Hashable]:
+        """Streams without subscribers still inside their grace period"""
+        now = time.monotonic()
+        for key, stream in self._streams.items():
+            if stream.expires is not None and stream.expires > now:
+                yield key
+
+    def is_retained(self, key: Hashable) -> bool:
+        stream = self._streams.get(key)
+        return stream is not None and stream.expires is not None and stream.expires > time.monotonic()
+
+    def record(self, key: Hashable, message: Union[Envelope, str, dict]) -> Envelope:
+        """Number and buffer an event of ``key`` (unchanged if nobody follows it)"""
+        envelope = Envelope.of(message)
+        stream = self._streams.get(key)
+        if stream is None or not isinstance(envelope.message, dict):
+            return envelope
+        stream.seq += 1
+        envelope = Envelope({**envelope.message, "seq": stream.seq})
+        stream.events.append((stream.seq, envelope))
+        return envelope
+
+    def since(self, key: Hashable, resume_from, epoch) -> Optional[List[Envelope]]:
+        """Events after ``resume_from``, or None when the client needs a snapshot"""
+        stream = self._streams.get(key)
+        if stream is None or epoch != stream.epoch or not isinstance(resume_from, int):
+            return None
+        missed = stream.seq - resume_from
+        if missed < 0 or missed > len(stream.events):
+            return None
+        return [envelope for _, envelope in itertools.islice(stream.events, len(stream.events) - missed, None)]
+
+    def __len__(self) -> int:
+        return len(self._streams)
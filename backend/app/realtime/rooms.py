@@ -0,0 +1,82 @@
+"""
+Room subscriptions of WebSocket connections
+
+A room is a hashable key such as ``("department", 3, "staff")`` or
+``("ticket", "42")``. The index keeps both directions (room -> connection
+keys, connection key -> rooms), so joining, leaving and dropping a
+connection cost O(rooms of that connection) and a broadcast touches only
+the members of its room.
+"""
+from typing import Dict, Hashable, Iterable, Iterator, Optional, Set
+
+# Roles that see staff-facing queue events (new tickets, dashboard refreshes)
+DASHBOARD_ROLES = ("staff", "manager", "admin")
+
+
+def department_room(department_id: Optional[int], role: str = "staff") -> tuple:
+    """Room of everyone with ``role`` following a department"""
+    return ("department", department_id, role)
+
+
+def ticket_room(ticket_id) -> tuple:
+    """Room of the clients following a ticket (same key as its replay stream)"""
+    return ("ticket", str(ticket_id))
+
+
+def role_room(role: str) -> tuple:
+    """Room of everyone with ``role``, whatever their department"""
+    return ("role", role)
+
+
+class RoomIndex:
+    """Two-way index between rooms and connection keys"""
+
+    def __init__(self):
+        self._members: Dict[Hashable, Set[Hashable]] = {}  # room -> connection keys
+        self._rooms: Dict[Hashable, Set[Hashable]] = {}  # connection key -> rooms
+
+    def join(self, key: Hashable, room: Hashable):
+        self._members.setdefault(room, set()).add(key)
+        self._rooms.setdefault(key, set()).add(room)
+
+    def leave(self, key: Hashable, room: Hashable):
+        members = self._members.get(room)
+        if members is not None:
+            members.discard(key)
+            if not members:
+                del self._members[room]
+        rooms = self._rooms.get(key)
+        if rooms is not None:
+            rooms.discard(room)
+            if not rooms:
+                del self._rooms[key]
+
+    def leave_all(self, key: Hashable):
+        """Drop a connection from every room it joined"""
+        for room in self._rooms.pop(key, ()):
+            members = self._members.get(room)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del self._members[room]
+
+    def members(self, room: Hashable) -> Set[Hashable]:
+        """Connection keys in ``room`` (a live set: copy before mutating the index)"""
+        return self._members.get(room, set())
+
+    def members_of(self, rooms: Iterable[Hashable]) -> Set[Hashable]:
+        """Union of several rooms, each connection once"""
+        keys: Set[Hashable] = set()
+        for room in rooms:
+            keys |= self._members.get(room, set())
+        return keys
+
+    def rooms_of(self, key: Hashable) -> Set[Hashable]:
+        return self._rooms.get(key, set())
+
+    def __contains__(self, room: Hashable) -> bool:
+        return room in self._members
+
+    def __iter__(self) -> Iterator[Hashable]:
+        """Rooms with at least one member"""
+        return iter(self._members)
@@ -5,6 +5,8 @@ Core services package for Queue Management System
 from .auth import authenticate_user, create_access_token, get_password_hash, verify_password
 from .department import get_departments, get_department, create_department, update_department
 from .ticket import create_ticket, get_ticket, update_ticket_status, get_next_ticket
+from .ticket_numbers import allocate_ticket_number, allocate_ticket_number_async, department_prefix
+from .queue_engine import queue_engine
 
 __all__ = [
     # Auth services
@@ -23,5 +25,13 @@ __all__ = [
     "create_ticket",
     "get_ticket",
     "update_ticket_status",
-    "get_next_ticket"
+    "get_next_ticket",
+    
+    # Ticket number allocation
+    "allocate_ticket_number",
+    "allocate_ticket_number_async",
+    "department_prefix",
+    
+    # Queue engine
+    "queue_engine"
 ]
\ No newline at end of file
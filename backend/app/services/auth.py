@@ -1,38 +1,28 @@
 """
 Authentication and User management services
 """
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 from jose import JWTError, jwt
-import bcrypt
 
 from ..core.config import settings
+from ..core.passwords import password_hasher
+from ..core.principal import token_claims
+from ..core.security import bump_token_version, get_password_hash, user_changed, verify_password
 from ..models.user import User
 from ..schemas.auth import UserCreate, UserUpdate
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify password using bcrypt"""
-    try:
-        return bcrypt.checkpw(
-            plain_password.encode('utf-8'),
-            hashed_password.encode('utf-8')
-        )
-    except Exception as e:
-        print(f"Password verification error: {str(e)}")
-        return False
-
-def get_password_hash(password: str) -> str:
-    """Hash password using bcrypt"""
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
-
-def create_access_token(data: dict) -> str:
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None, user: Optional[User] = None) -> str:
+    """JWT for ``data`` plus the token version of ``user`` (all its claims in ``JWT_CLAIMS_TOKENS`` mode)"""
     to_encode = data.copy()
-    expires_delta = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    expires_delta = expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     expire = datetime.utcnow() + expires_delta
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
+    if user is not None:
+        to_encode.update(token_claims(user))
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
@@ -54,7 +44,8 @@ def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
                 print(f"User {email} has no password hash")
                 return None
                 
-            is_valid = verify_password(password, user.password_hash)
+            # Off the request thread's CPU; re-hashed when PASSWORD_BCRYPT_ROUNDS changed
+            is_valid, new_hash = password_hasher.verify_and_update(password, user.password_hash)
         except Exception as e:
             print(f"Password verification error: {str(e)}")
             print(f"Password hash type: {type(user.password_hash)}")
@@ -64,6 +55,12 @@ def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
         if not is_valid:
             print(f"Invalid password for user: {email}")
             return None
+        
+        if new_hash is not None:
+            # Same password, so outstanding tokens stay valid
+            user.password_hash = new_hash
+            db.commit()
+            user_changed(user.id)
             
         print(f"Authentication successful for user: {email}")
         return user
@@ -93,13 +90,18 @@ def update_user(db: Session, user_id: int, user_data: UserUpdate) -> Optional[Us
     if not user:
         return None
         
-    for field, value in user_data.dict(exclude_unset=True).items():
+    changes = user_data.dict(exclude_unset=True)
+    for field, value in changes.items():
         if field == "password":
             setattr(user, "password_hash", get_password_hash(value))
         else:
             setattr(user, field, value)
+    token_version = None
+    if changes.keys() & {"password", "role", "department_id", "is_active"}:
+        token_version = bump_token_version(user)
             
     db.commit()
+    user_changed(user_id, token_version)
     db.refresh(user)
     return user
 
@@ -8,6 +8,7 @@ from sqlalchemy import select
 from ..models.department import Department
 from ..models.service import Service
 from ..schemas.department import DepartmentCreate, DepartmentUpdate
+from .queue_versions import queue_versions, CATALOG
 
 def get_departments(db: Session, skip: int = 0, limit: int = 100, include_inactive: bool = False) -> List[Department]:
     query = db.query(Department)
@@ -31,6 +32,7 @@ def create_department(db: Session, department_data: DepartmentCreate) -> Departm
     db.add(db_department)
     db.commit()
     db.refresh(db_department)
+    queue_versions.bump(CATALOG)
     return db_department
 
 def update_department(db: Session, department_id: int, department_data: DepartmentUpdate) -> Optional[Department]:
@@ -43,6 +45,7 @@ def update_department(db: Session, department_id: int, department_data: Departme
             
     db.commit()
     db.refresh(department)
+    queue_versions.bump(CATALOG)
     return department
 
 def get_department_services(db: Session, department_id: int) -> List[Service]:
@@ -62,4 +65,5 @@ def create_service(db: Session, department_id: int, name: str, description: str,
     db.add(db_service)
     db.commit()
     db.refresh(db_service)
+    queue_versions.bump(CATALOG)
     return db_service
\ No newline at end of file
@@ -0,0 +1,87 @@
+"""
+Service times for every worker's wait estimator
+
+The estimator (``wait_estimator``) lives in each process, but a call or a
+completion is handled by one worker only. Each one is therefore published
+through the WebSocket broker as a ``service_time`` event and applied by
+every worker, the publishing one included, so all of them learn from the
+same samples, count the same staff as serving and hand out the same
+estimates (and estimate ETags) for a ticket.
+
+Like the position broadcaster, :meth:`EstimatorFeed.ticket_moved` may be
+called from threadpool endpoints and hands the publish to the event loop
+bound at startup. Before that (scripts, warm start) events are applied
+locally.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional
+
+from ..websocket_manager import websocket_manager
+from .wait_estimator import ServiceTimeEstimator, wait_estimator
+
+logger = logging.getLogger(__name__)
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _parse(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+class EstimatorFeed:
+    """Fans calls and completions out to the estimator of every worker"""
+
+    def __init__(self, estimator: ServiceTimeEstimator):
+        self.estimator = estimator
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        websocket_manager.on("service_time", self._event)
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        """Remember the server event loop; until then events are applied locally"""
+        self._loop = loop
+
+    def ticket_moved(self, row):
+        """A ticket changed state (row from RETURNING_TICKET); any thread"""
+        status = getattr(row.status, "value", row.status)
+        if status not in ("called", "completed"):
+            return
+        event = {
+            "department_id": row.department_id,
+            "service_id": row.service_id,
+            "staff_id": row.staff_id,
+            "status": status,
+            "called_at": _iso(row.called_at),
+            "completed_at": _iso(row.completed_at),
+        }
+        if self._loop is None or self._loop.is_closed():
+            self.apply(event)
+            return
+        self._loop.call_soon_threadsafe(self._publish, event)
+
+    def apply(self, event: dict):
+        """Feed one published call or completion into this worker's estimator"""
+        department_id = event["department_id"]
+        self.estimator.staff_active(department_id, event["staff_id"])
+        called_at, completed_at = _parse(event["called_at"]), _parse(event["completed_at"])
+        if event["status"] == "completed" and called_at and completed_at:
+            self.estimator.observe(department_id, event["service_id"], event["staff_id"], called_at, completed_at)
+
+    # ---- event loop ----------------------------------------------------
+
+    def _publish(self, event: dict):
+        asyncio.ensure_future(websocket_manager.publish("service_time", **event))
+
+    async def _event(self, event: dict):
+        # Runs on every worker, including the one that published it
+        try:
+            self.apply(event)
+        except Exception as e:
+            logger.warning(f"Service time event not applied: {e}")
+
+
+# Global feed instance
+estimator_feed = EstimatorFeed(wait_estimator)
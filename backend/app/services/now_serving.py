@@ -0,0 +1,213 @@
+"""
+"Now serving" display board
+
+An in-memory materialized view of every department: which ticket each
+counter is serving and which tickets are next up. It is loaded once at
+startup and then maintained from the same queue events that drive the queue
+engine (see ``queue_events``), so display clients never query Postgres.
+
+Each department snapshot is serialized once per change and fanned out to all
+SSE subscribers. Every change gets a board-wide sequence number that is used
+as the SSE event id; a reconnecting display sends it back as
+``Last-Event-ID`` and only receives departments that changed after it.
+"""
+import asyncio
+import heapq
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from ..core.database import SessionLocal
+from .queue_priority import QueueKey, queue_key
+
+logger = logging.getLogger(__name__)
+
+# Waiting tickets shown as "next up" per department
+NEXT_UP_COUNT = 5
+
+_LOAD_ACTIVE = text("""
+    SELECT id, ticket_number, department_id, staff_id, status, priority, created_at, called_at
+    FROM queue_tickets
+    WHERE status IN ('waiting', 'called')
+""")
+
+_LOAD_DEPARTMENT_NAMES = text("SELECT id, name FROM departments")
+
+# Counter name when the staff member is assigned to one, else their name
+_LOAD_COUNTER_LABELS = text("""
+    SELECT u.id, COALESCE(c.name, u.full_name) AS label
+    FROM users u
+    LEFT JOIN counters c ON c.assigned_staff_id = u.id AND c.is_active = true
+    WHERE u.role IN ('staff', 'manager', 'admin')
+""")
+
+
+class DepartmentBoard:
+    """Serving and waiting tickets of one department"""
+
+    def __init__(self, department_id: int):
+        self.department_id = department_id
+        self.serving: Dict[int, dict] = {}  # ticket_id -> called ticket
+        self.waiting: Dict[int, Tuple[QueueKey, str]] = {}  # ticket_id -> (call order key, number)
+        self.sequence = 0
+        self.payload = ""
+
+    def render(self, labels: Dict[int, str], names: Dict[int, str]) -> dict:
+        next_up = heapq.nsmallest(NEXT_UP_COUNT, self.waiting.values())
+        serving = sorted(self.serving.values(), key=lambda t: t["called_at"] or "")
+        return {
+            "department_id": self.department_id,
+            "department_name": names.get(self.department_id),
+            "serving": [
+                {
+                    "counter": labels.get(ticket["staff_id"]),
+                    "staff_id": ticket["staff_id"],
+                    "ticket_number": ticket["ticket_number"],
+                    "called_at": ticket["called_at"],
+                }
+                for ticket in serving
+            ],
+            "next_up": [number for _, number in next_up],
+            "waiting_count": len(self.waiting),
+        }
+
+
+class NowServingBoard:
+    """Per-department display snapshots with change notification"""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._boards: Dict[int, DepartmentBoard] = {}
+        self._labels: Dict[int, str] = {}
+        self._names: Dict[int, str] = {}
+        self._changed = asyncio.Event()
+        self.sequence = 0
+        # Sequences restart with the process; event ids carry the epoch so old ones are told apart
+        self.epoch = format(int(time.time() * 1000), "x")
+
+    # ---- loading -------------------------------------------------------
+
+    def warm_start(self, db: Session, loop: asyncio.AbstractEventLoop) -> int:
+        """Load active tickets and counter labels; later changes arrive on ``loop``"""
+        self._loop = loop
+        self._changed = asyncio.Event()
+        rows = db.execute(_LOAD_ACTIVE).fetchall()
+        self._labels = {row.id: row.label for row in db.execute(_LOAD_COUNTER_LABELS)}
+        self._names = {row.id: row.name for row in db.execute(_LOAD_DEPARTMENT_NAMES)}
+        self._boards.clear()
+        for row in rows:
+            board = self._board(row.department_id)
+            if row.status == "called":
+                board.serving[row.id] = self._serving_entry(row)
+            else:
+                board.waiting[row.id] = (queue_key(row.id, row.priority, row.created_at), row.ticket_number)
+        for board in self._boards.values():
+            self._publish(board)
+        return len(rows)
+
+    def _board(self, department_id: int) -> DepartmentBoard:
+        board = self._boards.get(department_id)
+        if board is None:
+            board = self._boards[department_id] = DepartmentBoard(department_id)
+        return board
+
+    @staticmethod
+    def _serving_entry(row) -> dict:
+        return {
+            "staff_id": row.staff_id,
+            "ticket_number": row.ticket_number,
+            "called_at": row.called_at.isoformat() if row.called_at else None,
+        }
+
+    # ---- changes (any thread) ------------------------------------------
+
+    def ticket_enqueued(self, ticket_id: int, department_id: int, ticket_number: str,
+                        priority=None, created_at: Optional[datetime] = None):
+        key = queue_key(ticket_id, priority, created_at)
+        self._call_soon(self._apply_enqueued, department_id, ticket_id, key, ticket_number)
+
+    def ticket_moved(self, row):
+        self._call_soon(self._apply_moved, row)
+
+    def _call_soon(self, callback, *args):
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(callback, *args)
+
+    # ---- event loop ----------------------------------------------------
+
+    def _apply_enqueued(self, department_id, ticket_id, key, ticket_number):
+        board = self._board(department_id)
+        board.waiting[ticket_id] = (key, ticket_number)
+        self._publish(board)
+
+    def _apply_moved(self, row):
+        board = self._board(row.department_id)
+        board.waiting.pop(row.id, None)
+        if row.status == "called":
+            board.serving[row.id] = self._serving_entry(row)
+            if row.staff_id is not None and row.staff_id not in self._labels:
+                asyncio.ensure_future(self._load_labels())
+        else:
+            board.serving.pop(row.id, None)
+        self._publish(board)
+
+    async def _load_labels(self):
+        try:
+            labels = await asyncio.get_running_loop().run_in_executor(None, self._query_labels)
+        except Exception as e:
+            logger.warning(f"Display board could not load counter labels: {e}")
+            return
+        self._labels = labels
+        for board in self._boards.values():
+            if any(t["staff_id"] in labels for t in board.serving.values()):
+                self._publish(board)
+
+    @staticmethod
+    def _query_labels() -> Dict[int, str]:
+        with SessionLocal() as db:
+            return {row.id: row.label for row in db.execute(_LOAD_COUNTER_LABELS)}
+
+    def _publish(self, board: DepartmentBoard):
+        self.sequence += 1
+        board.sequence = self.sequence
+        board.payload = json.dumps(board.render(self._labels, self._names), ensure_ascii=False)
+        # Wake every waiting stream, then arm a fresh event for the next change
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    # ---- reading (event loop) ------------------------------------------
+
+    def changed_since(self, sequence: int, department_id: Optional[int] = None) -> List[DepartmentBoard]:
+        boards = self._boards.values()
+        if department_id is not None:
+            board = self._boards.get(department_id)
+            boards = [board] if board else []
+        return sorted((b for b in boards if b.sequence > sequence), key=lambda b: b.sequence)
+
+    def empty_payload(self, department_id: int) -> str:
+        """Snapshot of a department that has had no active tickets yet"""
+        return json.dumps(DepartmentBoard(department_id).render(self._labels, self._names), ensure_ascii=False)
+
+    async def wait_for_change(self, sequence: int, timeout: float) -> bool:
+        """Wait until the board moves past ``sequence``; False on timeout
+
+        Returns at once if it already has, e.g. a change published while the
+        caller was awaiting something else after reading the board.
+        """
+        if self.sequence > sequence:
+            return True
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+# Global board instance
+now_serving = NowServingBoard()
@@ -0,0 +1,188 @@
+"""
+Ticket position broadcaster
+
+After every call-next, complete, cancel or registration in a department,
+the waiting tickets that have a WebSocket subscriber (``join_queue``) get
+their new position and ETA, and staff dashboards following the
+department (``join_department``) get a ``queue_update``, merged per
+department by the manager's coalescing window during bursts. Positions of
+all subscribed tickets of the department come from one windowed query, and
+only tickets whose position or ETA changed since the last push are sent, so
+customers no longer need to poll ``/tickets/{id}/status``.
+
+State changes happen in sync endpoints running in the threadpool, so
+:meth:`PositionBroadcaster.department_changed` is thread-safe: it hands the
+work to the event loop bound at startup. From there the change is published
+through the WebSocket broker, so every worker refreshes the subscribers it
+holds itself. Changes arriving while a refresh is running are coalesced into
+one more refresh per department.
+
+Tickets whose subscriber just dropped keep being refreshed for the resume
+grace period, so a reconnecting phone can replay what it missed.
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import text, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from ..core.database import SessionLocal
+from ..websocket_manager import websocket_manager
+from .queue_priority import priority_rank_sql
+from .wait_estimator import wait_estimator
+
+logger = logging.getLogger(__name__)
+
+_SUBSCRIBED_POSITIONS = text(f"""
+    SELECT id, service_id, position, estimated_duration
+    FROM (
+        SELECT qt.id, qt.service_id, s.estimated_duration,
+               ROW_NUMBER() OVER (
+                   ORDER BY {priority_rank_sql('qt.priority')}, qt.created_at, qt.id
+               ) AS position
+        FROM queue_tickets qt
+        LEFT JOIN services s ON s.id = qt.service_id
+        WHERE qt.department_id = :dept_id AND qt.status = 'waiting'
+    ) ranked
+    WHERE id = ANY(:ticket_ids)
+""").bindparams(bindparam("ticket_ids", type_=ARRAY(Integer)))
+
+_TICKET_STATE = text("SELECT department_id, status FROM queue_tickets WHERE id = :ticket_id")
+
+Position = Tuple[int, int]  # (queue position, estimated wait in minutes)
+
+
+class PositionBroadcaster:
+    """Pushes position changes of subscribed waiting tickets"""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sent: Dict[int, Tuple[int, Position]] = {}  # ticket_id -> (department_id, last pushed)
+        self._dirty: Set[int] = set()
+        self._flushing = False
+        websocket_manager.on("department_changed", self._department_event)
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        """Remember the server event loop; until then changes are ignored"""
+        self._loop = loop
+
+    # ---- triggers (any thread) -----------------------------------------
+
+    def department_changed(self, department_id: int, moved=None):
+        """Queue of ``department_id`` changed; ``moved`` is the ticket row that moved, if any"""
+        if self._loop is None or self._loop.is_closed():
+            return
+        if moved is not None:
+            moved = {"id": moved.id, "status": getattr(moved.status, "value", moved.status)}
+        self._loop.call_soon_threadsafe(self._publish, department_id, moved)
+
+    async def ticket_subscribed(self, ticket_id: int):
+        """Send the current position (or status, once called) to a client that just joined a ticket"""
+        self._sent.pop(ticket_id, None)
+        row = await asyncio.get_running_loop().run_in_executor(
+            None, self._load_ticket, ticket_id
+        )
+        if row is None:
+            return
+        if row.status == "waiting":
+            self._schedule(row.department_id, None)
+        else:
+            await self._send_moved({"id": ticket_id, "status": row.status})
+
+    # ---- event loop ----------------------------------------------------
+
+    def _publish(self, department_id: int, moved: Optional[dict]):
+        asyncio.ensure_future(
+            websocket_manager.publish("department_changed", department_id=department_id, moved=moved)
+        )
+
+    async def _department_event(self, event: dict):
+        # Runs on every worker; each one only serves the sockets it holds
+        department_id, moved = event["department_id"], event.get("moved")
+        if websocket_manager.has_dashboard_listeners(department_id):
+            action = "new_ticket" if moved is None else moved["status"]
+            await websocket_manager.broadcast_queue_update(department_id, action, local=True, ticket=moved)
+        self._schedule(department_id, moved)
+
+    def _schedule(self, department_id: int, moved: Optional[dict]):
+        followed = websocket_manager.followed_tickets()
+        if moved is not None and str(moved["id"]) in followed:
+            asyncio.ensure_future(self._send_moved(moved))
+        if not followed:
+            return
+        self._dirty.add(department_id)
+        if not self._flushing:
+            self._flushing = True
+            asyncio.ensure_future(self._flush())
+
+    async def _flush(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while self._dirty:
+                department_id = self._dirty.pop()
+                subscribed = [int(key) for key in websocket_manager.followed_tickets() if key.isdigit()]
+                if not subscribed:
+                    continue
+                try:
+                    rows = await loop.run_in_executor(None, self._load_positions, department_id, subscribed)
+                    await self._send_changes(department_id, rows)
+                except Exception as e:
+                    logger.warning(f"Position broadcast failed for department {department_id}: {e}")
+        finally:
+            self._flushing = False
+
+    async def _send_changes(self, department_id: int, rows):
+        seen = set()
+        for row in rows:
+            seen.add(row.id)
+            people_ahead = row.position - 1
+            estimate = wait_estimator.estimate(
+                department_id, people_ahead, row.service_id, row.estimated_duration
+            )
+            current = (row.position, estimate.minutes)
+            previous = self._sent.get(row.id)
+            if previous is not None and previous[1] == current:
+                continue
+            self._sent[row.id] = (department_id, current)
+            await websocket_manager.send_queue_update(str(row.id), {
+                "status": "waiting",
+                "position": current[0],
+                "people_ahead": people_ahead,
+                "estimated_wait": estimate.minutes,
+                "estimated_wait_range": estimate.as_range(),
+            }, local=True)
+
+        # Forget tickets of this department that left the queue or lost their subscribers
+        for ticket_id, (dept, _) in list(self._sent.items()):
+            if dept == department_id and ticket_id not in seen:
+                del self._sent[ticket_id]
+
+    async def _send_moved(self, moved: dict):
+        self._sent.pop(moved["id"], None)
+        ticket_id = str(moved["id"])
+        if moved["status"] == "called":
+            await websocket_manager.send_ticket_called(ticket_id, None, local=True)
+        elif moved["status"] == "completed":
+            await websocket_manager.send_ticket_completed(ticket_id, local=True)
+        else:
+            await websocket_manager.send_queue_status(ticket_id, {"status": moved["status"]}, local=True)
+
+    # ---- database (executor threads) -----------------------------------
+
+    @staticmethod
+    def _load_positions(department_id: int, ticket_ids: List[int]):
+        with SessionLocal() as db:
+            return db.execute(_SUBSCRIBED_POSITIONS, {
+                "dept_id": department_id,
+                "ticket_ids": ticket_ids,
+            }).fetchall()
+
+    @staticmethod
+    def _load_ticket(ticket_id: int):
+        with SessionLocal() as db:
+            return db.execute(_TICKET_STATE, {"ticket_id": ticket_id}).first()
+
+
+# Global broadcaster instance
+position_broadcaster = PositionBroadcaster()
@@ -0,0 +1,191 @@
+"""
+In-memory queue engine
+
+Keeps every department's waiting tickets in a binary heap ordered by
+priority class and arrival time, loaded from Postgres in a single query at
+startup and kept current from this process's registrations and transitions.
+
+The heap is a hint, not an authority: tickets registered through another
+worker never reach it. "Call next" therefore always claims with the
+database's own ordering (one SKIP LOCKED statement, see ``ticket_claim``)
+and only drops the claimed ticket from the heap; the heap serves cheap
+previews such as :meth:`QueueEngine.peek` and :meth:`QueueEngine.waiting_ids`.
+"""
+import heapq
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .queue_priority import QueueKey, queue_key
+from .ticket_claim import claim_next_ticket, claim_next_ticket_async
+
+_LOAD_WAITING = """
+    SELECT id, department_id, priority, created_at
+    FROM queue_tickets
+    WHERE status = 'waiting'
+"""
+
+
+class DepartmentQueue:
+    """Waiting tickets of one department (heap with lazy deletion)"""
+
+    def __init__(self):
+        self.heap: List[QueueKey] = []
+        self.entries: Dict[int, QueueKey] = {}  # ticket_id -> key currently live in heap
+
+    def __len__(self):
+        return len(self.entries)
+
+    def push(self, key: QueueKey):
+        ticket_id = key[2]
+        if self.entries.get(ticket_id) == key:
+            return
+        self.entries[ticket_id] = key
+        heapq.heappush(self.heap, key)
+
+    def discard(self, ticket_id: int) -> bool:
+        # The heap entry is left in place and skipped when it surfaces
+        return self.entries.pop(ticket_id, None) is not None
+
+    def _drop_dead(self):
+        while self.heap and self.entries.get(self.heap[0][2]) != self.heap[0]:
+            heapq.heappop(self.heap)
+
+    def peek(self) -> Optional[int]:
+        self._drop_dead()
+        return self.heap[0][2] if self.heap else None
+
+    def pop(self) -> Optional[QueueKey]:
+        self._drop_dead()
+        if not self.heap:
+            return None
+        key = heapq.heappop(self.heap)
+        del self.entries[key[2]]
+        return key
+
+    def ordered(self) -> List[int]:
+        """Ticket ids in call order (O(n log n), for snapshots only)"""
+        return [key[2] for key in sorted(self.entries.values())]
+
+
+class QueueEngine:
+    """Per-department priority queues shared by all call-next endpoints"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queues: Dict[int, DepartmentQueue] = {}
+        self._departments: Dict[int, int] = {}  # ticket_id -> department_id
+        self.warm = False
+
+    def _queue(self, department_id: int) -> DepartmentQueue:
+        queue = self._queues.get(department_id)
+        if queue is None:
+            queue = self._queues[department_id] = DepartmentQueue()
+        return queue
+
+    def _add_locked(self, ticket_id, department_id, priority, created_at):
+        previous = self._departments.get(ticket_id)
+        if previous is not None and previous != department_id:
+            self._queue(previous).discard(ticket_id)
+        self._departments[ticket_id] = department_id
+        self._queue(department_id).push(queue_key(ticket_id, priority, created_at))
+
+    # ---- loading -------------------------------------------------------
+
+    def warm_start(self, db: Session, department_id: Optional[int] = None):
+        """(Re)load waiting tickets from Postgres in one query"""
+        sql = _LOAD_WAITING
+        params = {}
+        if department_id is not None:
+            sql += " AND department_id = :dept_id"
+            params["dept_id"] = department_id
+        rows = db.execute(text(sql), params).fetchall()
+
+        with self._lock:
+            if department_id is None:
+                self._queues.clear()
+                self._departments.clear()
+            else:
+                for ticket_id in self._queue(department_id).entries:
+                    self._departments.pop(ticket_id, None)
+                self._queues[department_id] = DepartmentQueue()
+            for row in rows:
+                self._add_locked(row.id, row.department_id, row.priority, row.created_at)
+            if department_id is None:
+                self.warm = True
+        return len(rows)
+
+    # ---- state changes -------------------------------------------------
+
+    def add(self, ticket_id: int, department_id: int, priority=None, created_at: Optional[datetime] = None):
+        """Register a newly created waiting ticket"""
+        with self._lock:
+            self._add_locked(ticket_id, department_id, priority, created_at)
+
+    def discard(self, ticket_id: int):
+        """Forget a ticket that left the waiting state (called, cancelled, ...)"""
+        with self._lock:
+            department_id = self._departments.pop(ticket_id, None)
+            if department_id is not None:
+                self._queue(department_id).discard(ticket_id)
+
+    # ---- reads ---------------------------------------------------------
+
+    def peek(self, db: Session, department_id: int) -> Optional[int]:
+        """Id of the ticket that would be called next, without claiming it"""
+        with self._lock:
+            ticket_id = self._queue(department_id).peek()
+        if ticket_id is None:
+            self.warm_start(db, department_id)
+            with self._lock:
+                ticket_id = self._queue(department_id).peek()
+        return ticket_id
+
+    def waiting_ids(self, department_id: int) -> List[int]:
+        with self._lock:
+            return self._queue(department_id).ordered()
+
+    def waiting_count(self, department_id: int) -> int:
+        with self._lock:
+            return len(self._queue(department_id))
+
+    # ---- claiming ------------------------------------------------------
+
+    def call_next(
+        self,
+        db: Session,
+        department_id: int,
+        staff_id: Optional[int],
+        require_idle: bool = False
+    ) -> Optional[Row]:
+        """Claim the best waiting ticket of a department for a staff member.
+
+        The claim orders in the database, which sees tickets registered on
+        every worker; the heap only forgets the claimed ticket.
+        """
+        row = claim_next_ticket(db, department_id, staff_id, require_idle)
+        if row is not None:
+            self.discard(row.id)
+        return row
+
+    async def call_next_async(
+        self,
+        db: AsyncSession,
+        department_id: int,
+        staff_id: Optional[int],
+        require_idle: bool = False
+    ) -> Optional[Row]:
+        """Async variant of :meth:`call_next`"""
+        row = await claim_next_ticket_async(db, department_id, staff_id, require_idle)
+        if row is not None:
+            self.discard(row.id)
+        return row
+
+
+# Global engine instance
+queue_engine = QueueEngine()
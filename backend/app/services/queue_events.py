@@ -0,0 +1,75 @@
+"""
+Queue change notifications
+
+Side effects of a ticket entering or leaving a department queue, kept in
+one place so every registration, claim and transition updates the same
+derived state: the Redis queue index, the department ETag version, the
+WebSocket position broadcaster, the "now serving" display board and the
+wait-time estimator of every worker. The in-memory queue engine is updated
+by the callers themselves (it sits below this module).
+"""
+from datetime import datetime
+from typing import Optional
+
+from .estimator_feed import estimator_feed
+from .now_serving import now_serving
+from .position_broadcaster import position_broadcaster
+from .queue_index import queue_index
+from .queue_versions import queue_versions, department_scope
+
+
+def queue_changed(department_id: int, moved=None):
+    """Department queue changed; ``moved`` is the ticket row that moved, if any"""
+    queue_versions.bump(department_scope(department_id))
+    position_broadcaster.department_changed(department_id, moved)
+
+
+async def queue_changed_async(department_id: int, moved=None):
+    """Async variant of :func:`queue_changed`"""
+    await queue_versions.bump_async(department_scope(department_id))
+    position_broadcaster.department_changed(department_id, moved)
+
+
+def ticket_enqueued(
+    ticket_id: int,
+    department_id: int,
+    ticket_number: str,
+    priority=None,
+    created_at: Optional[datetime] = None
+):
+    """A new waiting ticket was committed"""
+    queue_index.add(ticket_id, department_id, priority, created_at)
+    now_serving.ticket_enqueued(ticket_id, department_id, ticket_number, priority, created_at)
+    queue_changed(department_id)
+
+
+async def ticket_enqueued_async(
+    ticket_id: int,
+    department_id: int,
+    ticket_number: str,
+    priority=None,
+    created_at: Optional[datetime] = None
+):
+    """Async variant of :func:`ticket_enqueued` (Redis without blocking the event loop)"""
+    await queue_index.add_async(ticket_id, department_id, priority, created_at)
+    now_serving.ticket_enqueued(ticket_id, department_id, ticket_number, priority, created_at)
+    await queue_changed_async(department_id)
+
+
+def ticket_moved(row):
+    """A ticket left the waiting state or changed state (row from RETURNING_TICKET)"""
+    queue_index.discard(row.id, row.department_id)
+    _moved(row)
+    queue_changed(row.department_id, row)
+
+
+async def ticket_moved_async(row):
+    """Async variant of :func:`ticket_moved` (Redis without blocking the event loop)"""
+    await queue_index.discard_async(row.id, row.department_id)
+    _moved(row)
+    await queue_changed_async(row.department_id, row)
+
+
+def _moved(row):
+    now_serving.ticket_moved(row)
+    estimator_feed.ticket_moved(row)
@@ -0,0 +1,320 @@
+"""
+Redis queue index for "people ahead" lookups
+
+Each department keeps a sorted set ``queue:{department_id}:waiting`` of its
+waiting ticket ids, scored in call order (priority class, then arrival), so a
+customer's position is a single ``ZRANK`` instead of a ``COUNT(*)`` over
+``queue_tickets``. The set is written on every transition (see
+``queue_events``) and is only an index: Postgres stays the source of truth.
+
+Members are zero-padded ticket ids, so tickets arriving in the same
+millisecond (equal scores) are ranked by id like in SQL, not as strings.
+
+A department set is trusted while its marker key exists. The marker expires
+after ``QUEUE_INDEX_REBUILD_SECONDS``, and it disappears when Redis is
+flushed; the next lookup then rebuilds the set from Postgres. Every Redis
+failure is swallowed and the caller falls back to SQL.
+
+A rebuild reads Postgres first and writes Redis afterwards, so a ticket
+added or called in between would be undone by the write. Every add and
+discard is therefore also journaled for ``JOURNAL_KEEP_SECONDS`` in
+``queue:{department_id}:journal``. The rebuild replays the journal entries
+since the read started on top of the rows. It then replaces the set in a
+transaction that WATCHes the journal, and starts over if another write
+lands first.
+"""
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+import redis
+import redis.asyncio as aioredis
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from .queue_priority import priority_rank, priority_rank_sql
+
+logger = logging.getLogger(__name__)
+
+# Score = rank * RANK_SPAN + arrival in ms; stays well inside a double's 2**53
+RANK_SPAN = 10 ** 13
+
+# Journal entries kept for rebuilds in flight; replayed from this far before
+# the Postgres read, to cover clock skew between workers
+JOURNAL_KEEP_SECONDS = 60
+JOURNAL_MARGIN_MS = 5000
+
+# Attempts at swapping in a rebuilt set while writes keep landing
+REBUILD_ATTEMPTS = 5
+
+_LOAD_DEPARTMENT = text("""
+    SELECT id, priority, created_at
+    FROM queue_tickets
+    WHERE department_id = :dept_id AND status = 'waiting'
+""")
+
+_COUNT_WAITING = text("""
+    SELECT COUNT(*) FROM queue_tickets WHERE department_id = :dept_id AND status = 'waiting'
+""")
+
+_COUNT_AHEAD = text(f"""
+    SELECT COUNT(*)
+    FROM queue_tickets AS other, queue_tickets AS me
+    WHERE me.id = :ticket_id
+      AND other.department_id = me.department_id
+      AND other.status = 'waiting'
+      AND (({priority_rank_sql('other.priority')}), other.created_at, other.id)
+          < (({priority_rank_sql('me.priority')}), me.created_at, me.id)
+""")
+
+
+def queue_score(priority=None, created_at: Optional[datetime] = None) -> int:
+    """Sorted-set score matching ``queue_priority.queue_key`` ordering"""
+    arrival_ms = int((created_at or datetime.utcnow()).timestamp() * 1000)
+    return priority_rank(priority) * RANK_SPAN + arrival_ms
+
+
+def queue_member(ticket_id: int) -> str:
+    """Sorted-set member: fixed width, so equal scores order by ticket id"""
+    return f"{ticket_id:012d}"
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class QueueIndex:
+    """Per-department waiting sets in Redis"""
+
+    def __init__(self, url: str):
+        self._url = url
+        self._client: Optional[redis.Redis] = None
+        self._async_client: Optional[aioredis.Redis] = None  # for the *_async methods (event loop)
+
+    @property
+    def client(self) -> redis.Redis:
+        if self._client is None:
+            self._client = redis.Redis.from_url(
+                self._url,
+                socket_timeout=settings.QUEUE_INDEX_TIMEOUT_SECONDS,
+                socket_connect_timeout=settings.QUEUE_INDEX_TIMEOUT_SECONDS,
+            )
+        return self._client
+
+    @property
+    def async_client(self) -> aioredis.Redis:
+        if self._async_client is None:
+            self._async_client = aioredis.Redis.from_url(
+                self._url,
+                socket_timeout=settings.QUEUE_INDEX_TIMEOUT_SECONDS,
+                socket_connect_timeout=settings.QUEUE_INDEX_TIMEOUT_SECONDS,
+            )
+        return self._async_client
+
+    @staticmethod
+    def _waiting_key(department_id: int) -> str:
+        return f"queue:{department_id}:waiting"
+
+    @staticmethod
+    def _ready_key(department_id: int) -> str:
+        # v2: padded members; the marker of a set of bare ids must not vouch for it
+        return f"queue:{department_id}:ready:v2"
+
+    @staticmethod
+    def _journal_key(department_id: int) -> str:
+        return f"queue:{department_id}:journal"
+
+    @staticmethod
+    def _rebuild_lock_key(department_id: int) -> str:
+        return f"queue:{department_id}:rebuilding"
+
+    # ---- state changes -------------------------------------------------
+
+    def add(self, ticket_id: int, department_id: int, priority=None, created_at: Optional[datetime] = None):
+        """Register a newly created waiting ticket"""
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            self._write(pipe, department_id, queue_member(ticket_id), queue_score(priority, created_at))
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Queue index add failed for ticket {ticket_id}: {e}")
+
+    async def add_async(self, ticket_id: int, department_id: int, priority=None, created_at: Optional[datetime] = None):
+        """Async variant of :meth:`add`"""
+        try:
+            pipe = self.async_client.pipeline(transaction=False)
+            self._write(pipe, department_id, queue_member(ticket_id), queue_score(priority, created_at))
+            await pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Queue index add failed for ticket {ticket_id}: {e}")
+
+    def discard(self, ticket_id: int, department_id: int):
+        """Remove a ticket that left the waiting state"""
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            self._write(pipe, department_id, queue_member(ticket_id))
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Queue index discard failed for ticket {ticket_id}: {e}")
+
+    async def discard_async(self, ticket_id: int, department_id: int):
+        """Async variant of :meth:`discard`"""
+        try:
+            pipe = self.async_client.pipeline(transaction=False)
+            self._write(pipe, department_id, queue_member(ticket_id))
+            await pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Queue index discard failed for ticket {ticket_id}: {e}")
+
+    def _write(self, pipe, department_id: int, member: str, score: Optional[int] = None):
+        # Queues the change and its journal entry: "+member:score" adds, "-member" discards
+        waiting_key, journal_key = self._waiting_key(department_id), self._journal_key(department_id)
+        now = _now_ms()
+        if score is None:
+            pipe.zrem(waiting_key, member)
+            pipe.zadd(journal_key, {f"-{member}": now})
+        else:
+            pipe.zadd(waiting_key, {member: score})
+            pipe.zadd(journal_key, {f"+{member}:{score}": now})
+        pipe.zremrangebyscore(journal_key, "-inf", now - JOURNAL_KEEP_SECONDS * 1000)
+        pipe.expire(journal_key, JOURNAL_KEEP_SECONDS)
+
+    def rebuild(self, db: Session, department_id: int) -> int:
+        """Replace a department's set with the waiting tickets in Postgres"""
+        since = _now_ms() - JOURNAL_MARGIN_MS
+        rows = db.execute(_LOAD_DEPARTMENT, {"dept_id": department_id}).fetchall()
+        journal_key = self._journal_key(department_id)
+        with self.client.pipeline(transaction=True) as pipe:
+            for _ in range(REBUILD_ATTEMPTS):
+                try:
+                    pipe.watch(journal_key)
+                    members = self._replay(rows, pipe.zrangebyscore(journal_key, since, "+inf"))
+                    pipe.multi()
+                    self._store(pipe, department_id, members)
+                    pipe.execute()
+                    return len(members)
+                except redis.WatchError:
+                    continue
+        raise redis.WatchError(f"Queue index of department {department_id} kept changing during rebuild")
+
+    async def rebuild_async(self, db: AsyncSession, department_id: int) -> int:
+        """Async variant of :meth:`rebuild`"""
+        since = _now_ms() - JOURNAL_MARGIN_MS
+        rows = (await db.execute(_LOAD_DEPARTMENT, {"dept_id": department_id})).fetchall()
+        journal_key = self._journal_key(department_id)
+        async with self.async_client.pipeline(transaction=True) as pipe:
+            for _ in range(REBUILD_ATTEMPTS):
+                try:
+                    await pipe.watch(journal_key)
+                    members = self._replay(rows, await pipe.zrangebyscore(journal_key, since, "+inf"))
+                    pipe.multi()
+                    self._store(pipe, department_id, members)
+                    await pipe.execute()
+                    return len(members)
+                except redis.WatchError:
+                    continue
+        raise redis.WatchError(f"Queue index of department {department_id} kept changing during rebuild")
+
+    @staticmethod
+    def _replay(rows, entries) -> Dict[str, int]:
+        """Rows read from Postgres plus the journaled changes since (oldest first)"""
+        members = {queue_member(row.id): queue_score(row.priority, row.created_at) for row in rows}
+        for entry in entries:
+            entry = entry.decode("utf-8")
+            if entry.startswith("+"):
+                member, _, score = entry[1:].partition(":")
+                members[member] = int(score)
+            else:
+                members.pop(entry[1:], None)
+        return members
+
+    def _store(self, pipe, department_id: int, members: Dict[str, int]):
+        # Queues the swap on a sync or async pipeline; the caller executes it
+        waiting_key = self._waiting_key(department_id)
+        pipe.delete(waiting_key)
+        if members:
+            pipe.zadd(waiting_key, members)
+        pipe.set(self._ready_key(department_id), 1, ex=settings.QUEUE_INDEX_REBUILD_SECONDS)
+
+    # ---- reads ---------------------------------------------------------
+
+    def _ready(self, db: Session, department_id: int) -> bool:
+        """Whether the department's set can be read, rebuilding it first if needed"""
+        if self.client.exists(self._ready_key(department_id)):
+            return True
+        # One poller rebuilds; the others count in SQL meanwhile
+        if not self.client.set(self._rebuild_lock_key(department_id), 1, nx=True, ex=10):
+            return False
+        try:
+            self.rebuild(db, department_id)
+        finally:
+            self.client.delete(self._rebuild_lock_key(department_id))
+        return True
+
+    async def _ready_async(self, db: AsyncSession, department_id: int) -> bool:
+        """Async variant of :meth:`_ready`"""
+        client = self.async_client
+        if await client.exists(self._ready_key(department_id)):
+            return True
+        if not await client.set(self._rebuild_lock_key(department_id), 1, nx=True, ex=10):
+            return False
+        try:
+            await self.rebuild_async(db, department_id)
+        finally:
+            await client.delete(self._rebuild_lock_key(department_id))
+        return True
+
+    def people_ahead(self, db: Session, ticket_id: int, department_id: int) -> int:
+        """Waiting tickets that will be called before ``ticket_id``"""
+        try:
+            if self._ready(db, department_id):
+                rank = self.client.zrank(self._waiting_key(department_id), queue_member(ticket_id))
+                if rank is not None:
+                    return rank
+        except redis.RedisError as e:
+            logger.warning(f"Queue index unavailable, counting in SQL: {e}")
+        return self._count_ahead(db, ticket_id)
+
+    async def people_ahead_async(self, db: AsyncSession, ticket_id: int, department_id: int) -> int:
+        """Async variant of :meth:`people_ahead`"""
+        try:
+            if await self._ready_async(db, department_id):
+                rank = await self.async_client.zrank(self._waiting_key(department_id), queue_member(ticket_id))
+                if rank is not None:
+                    return rank
+        except redis.RedisError as e:
+            logger.warning(f"Queue index unavailable, counting in SQL: {e}")
+        return await self._count_ahead_async(db, ticket_id)
+
+    def waiting_count(self, db: Session, department_id: int) -> int:
+        """Waiting tickets of the department (all workers), e.g. ahead of a new ticket"""
+        try:
+            if self._ready(db, department_id):
+                return self.client.zcard(self._waiting_key(department_id))
+        except redis.RedisError as e:
+            logger.warning(f"Queue index unavailable, counting in SQL: {e}")
+        return db.execute(_COUNT_WAITING, {"dept_id": department_id}).scalar() or 0
+
+    async def waiting_count_async(self, db: AsyncSession, department_id: int) -> int:
+        """Async variant of :meth:`waiting_count`"""
+        try:
+            if await self._ready_async(db, department_id):
+                return await self.async_client.zcard(self._waiting_key(department_id))
+        except redis.RedisError as e:
+            logger.warning(f"Queue index unavailable, counting in SQL: {e}")
+        return (await db.execute(_COUNT_WAITING, {"dept_id": department_id})).scalar() or 0
+
+    @staticmethod
+    def _count_ahead(db: Session, ticket_id: int) -> int:
+        return db.execute(_COUNT_AHEAD, {"ticket_id": ticket_id}).scalar() or 0
+
+    @staticmethod
+    async def _count_ahead_async(db: AsyncSession, ticket_id: int) -> int:
+        return (await db.execute(_COUNT_AHEAD, {"ticket_id": ticket_id})).scalar() or 0
+
+
+# Global index instance
+queue_index = QueueIndex(settings.REDIS_URL)
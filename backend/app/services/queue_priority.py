@@ -0,0 +1,45 @@
+"""
+Call order of waiting tickets
+
+Shared by the in-memory queue engine and the SQL claim statement so both
+always agree on who is next: priority class first, then arrival time.
+"""
+from datetime import datetime
+from typing import Optional, Tuple
+
+from ..models.ticket import TicketPriority
+
+# Lower rank is served first; tickets of the same rank are served FIFO.
+PRIORITY_RANK = {
+    TicketPriority.disabled: 0,
+    TicketPriority.elderly: 1,
+    TicketPriority.vip: 2,
+    TicketPriority.high: 3,
+    TicketPriority.normal: 4,
+}
+
+QueueKey = Tuple[int, float, int]  # (priority rank, arrival timestamp, ticket id)
+
+
+def priority_rank(priority) -> int:
+    """Rank of a priority value (enum member, string or None)"""
+    if priority is None:
+        return PRIORITY_RANK[TicketPriority.normal]
+    try:
+        return PRIORITY_RANK[TicketPriority(priority)]
+    except ValueError:
+        return PRIORITY_RANK[TicketPriority.normal]
+
+
+def queue_key(ticket_id: int, priority=None, created_at: Optional[datetime] = None) -> QueueKey:
+    """Sort key of a waiting ticket: priority class, then arrival, then id"""
+    arrival = (created_at or datetime.utcnow()).timestamp()
+    return (priority_rank(priority), arrival, ticket_id)
+
+
+def priority_rank_sql(column: str = "priority") -> str:
+    """SQL expression computing the same rank as :func:`priority_rank`"""
+    whens = " ".join(
+        f"WHEN '{priority.value}' THEN {rank}" for priority, rank in PRIORITY_RANK.items()
+    )
+    return f"CASE {column}::text {whens} ELSE {PRIORITY_RANK[TicketPriority.normal]} END"
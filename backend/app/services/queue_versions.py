@@ -0,0 +1,230 @@
+"""
+Versions for conditional GET
+
+Every department queue and the service catalog carry a counter that is
+bumped whenever they change. Polling endpoints emit it as a weak ETag and
+answer a matching ``If-None-Match`` with 304 before touching Postgres.
+
+The counters are fields of one Redis hash (``queue:versions``), so a change
+made on any worker invalidates the tags every other worker hands out. The
+hash also holds an epoch that prefixes every tag: if Redis is flushed the
+counters restart at 0 under a new epoch, and old tags never match again.
+
+A poll reads the whole hash (one ``HGETALL``; it has a field per department).
+When Redis fails, responses carry no ETag and nothing is answered with 304.
+Bumps that failed are retried with the next bump on this worker.
+"""
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional, Union
+
+import redis
+import redis.asyncio as aioredis
+from fastapi import Request, Response
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CATALOG = "catalog"
+VERSIONS_KEY = "queue:versions"
+EPOCH_FIELD = "epoch"
+
+
+def department_scope(department_id: int) -> str:
+    return f"dept{department_id}"
+
+
+def scope_department(scope: str) -> Optional[int]:
+    """Department id of a :func:`department_scope`; None for other scopes"""
+    suffix = scope[4:] if scope.startswith("dept") else ""
+    return int(suffix) if suffix.isdigit() else None
+
+
+class VersionRegistry:
+    """Monotonic change counters keyed by scope, shared by all workers through Redis"""
+
+    def __init__(self, url: Optional[str] = None, client=None, async_client=None):
+        self._url = url
+        self._client = client
+        self._async_client = async_client
+        self._lock = threading.Lock()
+        self._unsynced = set()  # scopes bumped here while Redis was failing
+
+    @property
+    def client(self) -> redis.Redis:
+        if self._client is None:
+            self._client = redis.Redis.from_url(
+                self._url,
+                socket_timeout=settings.QUEUE_INDEX_TIMEOUT_SECONDS,
+                socket_connect_timeout=settings.QUEUE_INDEX_TIMEOUT_SECONDS,
+            )
+        return self._client
+
+    @property
+    def async_client(self) -> aioredis.Redis:
+        if self._async_client is None:
+            self._async_client = aioredis.Redis.from_url(
+                self._url,
+                socket_timeout=settings.QUEUE_INDEX_TIMEOUT_SECONDS,
+                socket_connect_timeout=settings.QUEUE_INDEX_TIMEOUT_SECONDS,
+            )
+        return self._async_client
+
+    # ---- bumps -----------------------------------------------------------
+
+    def _pending(self, scope: str):
+        with self._lock:
+            scopes = self._unsynced | {scope}
+            self._unsynced = set()
+        return scopes
+
+    def _failed(self, scopes, error):
+        with self._lock:
+            self._unsynced |= scopes
+        logger.warning(f"Version bump of {', '.join(sorted(scopes))} not stored, Redis failed: {error}")
+
+    def bump(self, scope: str):
+        """Invalidate the scope's tags on every worker (blocking; threadpool code)"""
+        scopes = self._pending(scope)
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for pending in scopes:
+                pipe.hincrby(VERSIONS_KEY, pending, 1)
+            pipe.execute()
+        except redis.RedisError as e:
+            self._failed(scopes, e)
+
+    async def bump_async(self, scope: str):
+        """Async variant of :meth:`bump`"""
+        scopes = self._pending(scope)
+        try:
+            pipe = self.async_client.pipeline(transaction=False)
+            for pending in scopes:
+                pipe.hincrby(VERSIONS_KEY, pending, 1)
+            await pipe.execute()
+        except redis.RedisError as e:
+            self._failed(scopes, e)
+
+    # ---- reads -----------------------------------------------------------
+
+    def snapshot(self) -> Optional[Dict[str, str]]:
+        """All versions and the epoch, or None if they cannot be trusted.
+
+        Take it before reading the data a tag describes, so a concurrent
+        change can only make the tag older than the data, never newer.
+        """
+        if self._unsynced:
+            return None
+        try:
+            versions = self.client.hgetall(VERSIONS_KEY)
+            if EPOCH_FIELD.encode() not in versions:
+                self.client.hsetnx(VERSIONS_KEY, EPOCH_FIELD, self._new_epoch())
+                versions = self.client.hgetall(VERSIONS_KEY)
+        except redis.RedisError as e:
+            logger.warning(f"Queue versions unavailable, not tagging: {e}")
+            return None
+        return self._decode(versions)
+
+    async def snapshot_async(self) -> Optional[Dict[str, str]]:
+        """Async variant of :meth:`snapshot`"""
+        if self._unsynced:
+            return None
+        client = self.async_client
+        try:
+            versions = await client.hgetall(VERSIONS_KEY)
+            if EPOCH_FIELD.encode() not in versions:
+                await client.hsetnx(VERSIONS_KEY, EPOCH_FIELD, self._new_epoch())
+                versions = await client.hgetall(VERSIONS_KEY)
+        except redis.RedisError as e:
+            logger.warning(f"Queue versions unavailable, not tagging: {e}")
+            return None
+        return self._decode(versions)
+
+    @staticmethod
+    def _new_epoch() -> str:
+        return format(int(time.time() * 1000), "x")
+
+    @staticmethod
+    def _decode(versions) -> Dict[str, str]:
+        return {key.decode("utf-8"): value.decode("utf-8") for key, value in versions.items()}
+
+    # ---- tags ------------------------------------------------------------
+
+    @staticmethod
+    def etag(scope: str, resource: str = "", versions: Optional[Dict[str, str]] = None) -> Optional[str]:
+        """Weak ETag for ``resource`` (e.g. a ticket id) at the scope's version in a :meth:`snapshot`
+
+        None when there is no snapshot (Redis unavailable).
+        """
+        if versions is None:
+            return None
+        tag = f"{versions[EPOCH_FIELD]}.{scope}.{versions.get(scope, '0')}"
+        if resource:
+            tag = f"{tag}.{resource}"
+        return f'W/"{tag}"'
+
+    @staticmethod
+    def parse(etag: str, versions: Dict[str, str]) -> Optional[Dict[str, str]]:
+        """Split one of our ETags into scope/version/resource; None if foreign or stale"""
+        value = etag.strip()
+        if value.startswith("W/"):
+            value = value[2:]
+        parts = value.strip('"').split(".", 3)
+        if len(parts) < 3 or parts[0] != versions[EPOCH_FIELD]:
+            return None
+        return {
+            "scope": parts[1],
+            "version": parts[2],
+            "resource": parts[3] if len(parts) > 3 else "",
+        }
+
+    def resource_not_modified(
+        self,
+        request: Request,
+        resource: Union[str, Callable[[str], str]],
+        versions: Optional[Dict[str, str]]
+    ) -> Optional[Response]:
+        """304 if the client holds a current tag for ``resource``.
+
+        The scope is read back from the tag itself, so the caller does not
+        need to look up which department the resource belongs to. When the
+        resource part depends on the scope, pass a function of the scope.
+        """
+        if versions is None:
+            return None
+        for candidate in _if_none_match(request):
+            parsed = self.parse(candidate, versions)
+            if not parsed:
+                continue
+            expected = resource(parsed["scope"]) if callable(resource) else resource
+            if parsed["resource"] == expected and parsed["version"] == versions.get(parsed["scope"], "0"):
+                return Response(status_code=304, headers={"ETag": candidate})
+        return None
+
+
+def _if_none_match(request: Request):
+    header = request.headers.get("if-none-match")
+    return [tag.strip() for tag in header.split(",")] if header else []
+
+
+def not_modified(request: Request, etag: Optional[str]) -> Optional[Response]:
+    """304 response if the client already holds ``etag``"""
+    if etag is None:
+        return None
+    candidates = _if_none_match(request)
+    if "*" in candidates or etag in candidates:
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+
+def set_etag(response: Response, etag: Optional[str]):
+    """Tag a fresh response; no-cache makes clients revalidate on every poll"""
+    if etag is not None:
+        response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+
+
+# Global version registry
+queue_versions = VersionRegistry(settings.REDIS_URL)
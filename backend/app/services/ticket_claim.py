@@ -0,0 +1,127 @@
+"""
+Contention-free "call next"
+
+A claim is one ``UPDATE ... WHERE id = (SELECT ... FOR UPDATE SKIP LOCKED
+LIMIT 1) RETURNING ...`` statement. Staff pressing "call next" at the same
+moment lock different rows instead of reading the same head ticket, so
+each gets a distinct ticket in a single round trip and nobody retries.
+
+A claim that requires the staff member to be idle (one called ticket at a
+time) first takes a transaction-scoped advisory lock on the staff member.
+Two call-next requests of the same person would otherwise each lock a
+different row, both see no called ticket under READ COMMITTED, and both
+succeed. The lock is its own statement, so the claim after it runs on a
+fresh snapshot that includes the other request's committed ticket.
+"""
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .queue_events import ticket_moved, ticket_moved_async
+from .queue_priority import priority_rank_sql
+
+# Columns handed back by every ticket state change (``qt`` = queue_tickets)
+RETURNING_TICKET = """
+    RETURNING qt.id, qt.ticket_number, qt.customer_name, qt.customer_phone,
+              qt.service_id, qt.department_id, qt.staff_id, qt.status,
+              qt.priority, qt.notes, qt.created_at, qt.called_at,
+              qt.served_at, qt.completed_at,
+              (SELECT s.name FROM services s WHERE s.id = qt.service_id) AS service_name
+"""
+
+# Claims the head of the department queue in call order.
+_CLAIM_UPDATE = f"""
+    UPDATE queue_tickets AS qt
+    SET status = 'called', staff_id = :staff_id, called_at = NOW()
+    WHERE qt.id = (
+        SELECT id FROM queue_tickets
+        WHERE department_id = :dept_id AND status = 'waiting'
+        ORDER BY {priority_rank_sql()}, created_at, id
+        FOR UPDATE SKIP LOCKED
+        LIMIT 1
+    )
+"""
+
+_CLAIM_NEXT = text(f"""
+    {_CLAIM_UPDATE}
+    {RETURNING_TICKET}
+""")
+
+# Held until commit/rollback: one idle-only claim per staff member at a time.
+_LOCK_STAFF = text("SELECT pg_advisory_xact_lock(hashtext('call_next'), :staff_id)")
+
+# Same claim, only for a staff member without a called ticket. Always returns
+# one row: ``idle`` tells a busy staff member apart from an empty queue.
+_CLAIM_NEXT_IF_IDLE = text(f"""
+    WITH idle AS (
+        SELECT NOT EXISTS (
+            SELECT 1 FROM queue_tickets WHERE staff_id = :staff_id AND status = 'called'
+        ) AS idle
+    ), claimed AS (
+        {_CLAIM_UPDATE}
+          AND (SELECT idle FROM idle)
+        {RETURNING_TICKET}
+    )
+    SELECT claimed.*, idle.idle FROM idle LEFT JOIN claimed ON true
+""")
+
+
+class StaffBusy(Exception):
+    """The staff member still has a called ticket"""
+
+
+def claim_next_ticket(
+    db: Session,
+    department_id: int,
+    staff_id: Optional[int],
+    require_idle: bool = False
+) -> Optional[Row]:
+    """Mark the next waiting ticket of a department as called and return it.
+
+    With ``require_idle`` nothing is claimed while the staff member still has
+    a called ticket: :class:`StaffBusy` is raised instead. Returns None when
+    nothing is waiting. Commits on success.
+    """
+    params = {"dept_id": department_id, "staff_id": staff_id}
+    if require_idle and staff_id is not None:
+        db.execute(_LOCK_STAFF, params)
+        row = db.execute(_CLAIM_NEXT_IF_IDLE, params).fetchone()
+    else:
+        row = db.execute(_CLAIM_NEXT, params).fetchone()
+    if row is None or row.id is None:
+        db.rollback()
+        _raise_if_busy(row, staff_id)
+        return None
+    db.commit()
+    ticket_moved(row)
+    return row
+
+
+async def claim_next_ticket_async(
+    db: AsyncSession,
+    department_id: int,
+    staff_id: Optional[int],
+    require_idle: bool = False
+) -> Optional[Row]:
+    """Async variant of :func:`claim_next_ticket`"""
+    params = {"dept_id": department_id, "staff_id": staff_id}
+    if require_idle and staff_id is not None:
+        await db.execute(_LOCK_STAFF, params)
+        row = (await db.execute(_CLAIM_NEXT_IF_IDLE, params)).fetchone()
+    else:
+        row = (await db.execute(_CLAIM_NEXT, params)).fetchone()
+    if row is None or row.id is None:
+        await db.rollback()
+        _raise_if_busy(row, staff_id)
+        return None
+    await db.commit()
+    await ticket_moved_async(row)
+    return row
+
+
+def _raise_if_busy(row: Optional[Row], staff_id: Optional[int]):
+    if row is not None and not row.idle:
+        raise StaffBusy(f"Staff {staff_id} is still serving a called ticket")
@@ -0,0 +1,90 @@
+"""
+Ticket number allocation
+
+Numbers are handed out from one counter row per prefix in ``ticket_counters``.
+Allocation is a single ``UPDATE ... RETURNING`` on that row, so it is O(1)
+and concurrent registrations are serialized by the row lock instead of
+racing on ``MAX(ticket_number)`` scans over ``queue_tickets``.
+"""
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Department prefix mapping - Bank style A,B,C,D based on department ID
+DEPARTMENT_PREFIXES = {
+    1: "A",  # Phòng Kế hoạch Tổng hợp
+    2: "B",  # Phòng Tài chính Kế toán
+    3: "C",  # Phòng Hành chính Quản trị
+    4: "D",  # Phòng Công nghệ Thông tin
+}
+FALLBACK_PREFIX = "X"
+
+_ADVANCE_COUNTER = text("""
+    UPDATE ticket_counters
+    SET last_value = last_value + 1, updated_at = NOW()
+    WHERE prefix = :prefix
+    RETURNING last_value
+""")
+
+# Only runs the first time a prefix is seen: continue numbering from the
+# highest ticket already issued with that prefix so the UNIQUE constraint
+# on ticket_number keeps holding for existing data.
+_SEED_COUNTER = text("""
+    INSERT INTO ticket_counters (prefix, last_value, updated_at)
+    SELECT :prefix, COALESCE(MAX(CAST(SUBSTRING(ticket_number FROM :digits_from) AS INTEGER)), 0), NOW()
+    FROM queue_tickets
+    WHERE ticket_number ~ :pattern
+    ON CONFLICT (prefix) DO NOTHING
+""")
+
+
+def department_prefix(department_id: int) -> str:
+    """Letter prefix used on tickets of a department"""
+    return DEPARTMENT_PREFIXES.get(department_id, FALLBACK_PREFIX)
+
+
+def format_ticket_number(prefix: str, value: int) -> str:
+    """Counter-style format: A001, B015, ... (grows past 3 digits if needed)"""
+    return f"{prefix}{value:03d}"
+
+
+def _seed_params(prefix: str) -> dict:
+    return {
+        "prefix": prefix,
+        "digits_from": len(prefix) + 1,
+        "pattern": f"^{prefix}[0-9]+$",
+    }
+
+
+def allocate_number(db: Session, prefix: str) -> int:
+    """Atomically reserve the next counter value for ``prefix``.
+
+    The counter row stays locked until the caller's transaction ends, so the
+    number is only consumed if the ticket insert commits.
+    """
+    value = db.execute(_ADVANCE_COUNTER, {"prefix": prefix}).scalar()
+    if value is None:
+        db.execute(_SEED_COUNTER, _seed_params(prefix))
+        value = db.execute(_ADVANCE_COUNTER, {"prefix": prefix}).scalar()
+    return value
+
+
+async def allocate_number_async(db: AsyncSession, prefix: str) -> int:
+    """Async variant of :func:`allocate_number`"""
+    value = (await db.execute(_ADVANCE_COUNTER, {"prefix": prefix})).scalar()
+    if value is None:
+        await db.execute(_SEED_COUNTER, _seed_params(prefix))
+        value = (await db.execute(_ADVANCE_COUNTER, {"prefix": prefix})).scalar()
+    return value
+
+
+def allocate_ticket_number(db: Session, department_id: int) -> str:
+    """Next ticket number for a department, e.g. ``A042``"""
+    prefix = department_prefix(department_id)
+    return format_ticket_number(prefix, allocate_number(db, prefix))
+
+
+async def allocate_ticket_number_async(db: AsyncSession, department_id: int) -> str:
+    """Async variant of :func:`allocate_ticket_number`"""
+    prefix = department_prefix(department_id)
+    return format_ticket_number(prefix, await allocate_number_async(db, prefix))
@@ -0,0 +1,199 @@
+"""
+Ticket state machine
+
+Every legal move is a single guarded ``UPDATE ... WHERE status = <expected>
+RETURNING ...`` that also returns the service name, so a transition costs
+one round trip and can never be applied to a ticket in the wrong state:
+
+    waiting -> called       (call_ticket, or claim_next_ticket for call-next)
+    called  -> completed    (complete_ticket)
+    waiting -> no_show      (cancel_ticket)
+    called  -> no_show      (cancel_ticket: customer did not show up when called)
+
+Functions return the updated row, or None when the ticket does not exist,
+is outside the given department/staff scope, or is not in a source state.
+"""
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.ticket import TicketStatus
+from .queue_engine import queue_engine
+from .queue_events import ticket_moved, ticket_moved_async
+from .ticket_claim import RETURNING_TICKET
+
+# target status -> statuses it may be reached from
+TRANSITIONS: Dict[TicketStatus, Tuple[TicketStatus, ...]] = {
+    TicketStatus.called: (TicketStatus.waiting,),
+    TicketStatus.completed: (TicketStatus.called,),
+    TicketStatus.no_show: (TicketStatus.waiting, TicketStatus.called),
+}
+
+# Optional scoping shared by all moves: ticket must belong to the department
+# and/or be held by the given staff member when those params are not NULL.
+_SCOPE = """
+    AND (CAST(:dept_id AS INTEGER) IS NULL OR qt.department_id = :dept_id)
+    AND (CAST(:owner_id AS INTEGER) IS NULL OR qt.staff_id = :owner_id)
+"""
+
+
+def _sources_sql(target: TicketStatus) -> str:
+    return ", ".join(f"'{status.value}'" for status in TRANSITIONS[target])
+
+
+_CALL = text(f"""
+    UPDATE queue_tickets AS qt
+    SET status = 'called', called_at = NOW(), staff_id = :staff_id
+    WHERE qt.id = :ticket_id AND qt.status IN ({_sources_sql(TicketStatus.called)})
+    {_SCOPE}
+    {RETURNING_TICKET}
+""")
+
+_COMPLETE = text(f"""
+    UPDATE queue_tickets AS qt
+    SET status = 'completed',
+        completed_at = NOW(),
+        served_at = COALESCE(qt.served_at, NOW()),
+        called_at = COALESCE(qt.called_at, NOW()),
+        staff_id = COALESCE(:staff_id, qt.staff_id),
+        notes = COALESCE(:notes, qt.notes)
+    WHERE qt.id = :ticket_id AND qt.status IN ({_sources_sql(TicketStatus.completed)})
+    {_SCOPE}
+    {RETURNING_TICKET}
+""")
+
+_CANCEL = text(f"""
+    UPDATE queue_tickets AS qt
+    SET status = 'no_show',
+        completed_at = NOW(),
+        notes = COALESCE(:notes, qt.notes)
+    WHERE qt.id = :ticket_id AND qt.status IN ({_sources_sql(TicketStatus.no_show)})
+    AND (CAST(:waiting_only AS BOOLEAN) IS FALSE OR qt.status = 'waiting')
+    {_SCOPE}
+    {RETURNING_TICKET}
+""")
+
+
+def _apply(db: Session, statement, params: dict) -> Optional[Row]:
+    params.setdefault("dept_id", None)
+    params.setdefault("owner_id", None)
+    row = db.execute(statement, params).fetchone()
+    if row is None:
+        db.rollback()
+        return None
+    db.commit()
+    queue_engine.discard(row.id)
+    ticket_moved(row)
+    return row
+
+
+async def _apply_async(db: AsyncSession, statement, params: dict) -> Optional[Row]:
+    params.setdefault("dept_id", None)
+    params.setdefault("owner_id", None)
+    row = (await db.execute(statement, params)).fetchone()
+    if row is None:
+        await db.rollback()
+        return None
+    await db.commit()
+    queue_engine.discard(row.id)
+    await ticket_moved_async(row)
+    return row
+
+
+def call_ticket(
+    db: Session,
+    ticket_id: int,
+    staff_id: Optional[int],
+    department_id: Optional[int] = None
+) -> Optional[Row]:
+    """waiting -> called, assigning the calling staff member"""
+    return _apply(db, _CALL, {
+        "ticket_id": ticket_id,
+        "staff_id": staff_id,
+        "dept_id": department_id,
+    })
+
+
+def complete_ticket(
+    db: Session,
+    ticket_id: int,
+    staff_id: Optional[int] = None,
+    department_id: Optional[int] = None,
+    owner_id: Optional[int] = None,
+    notes: Optional[str] = None
+) -> Optional[Row]:
+    """called -> completed
+
+    ``staff_id`` records who served the ticket; ``owner_id`` additionally
+    requires the ticket to be held by that staff member.
+    """
+    return _apply(db, _COMPLETE, {
+        "ticket_id": ticket_id,
+        "staff_id": staff_id,
+        "dept_id": department_id,
+        "owner_id": owner_id,
+        "notes": notes,
+    })
+
+
+async def complete_ticket_async(
+    db: AsyncSession,
+    ticket_id: int,
+    staff_id: Optional[int] = None,
+    department_id: Optional[int] = None,
+    owner_id: Optional[int] = None,
+    notes: Optional[str] = None
+) -> Optional[Row]:
+    """Async variant of :func:`complete_ticket`"""
+    return await _apply_async(db, _COMPLETE, {
+        "ticket_id": ticket_id,
+        "staff_id": staff_id,
+        "dept_id": department_id,
+        "owner_id": owner_id,
+        "notes": notes,
+    })
+
+
+def cancel_ticket(
+    db: Session,
+    ticket_id: int,
+    department_id: Optional[int] = None,
+    notes: Optional[str] = None,
+    waiting_only: bool = False
+) -> Optional[Row]:
+    """waiting/called -> no_show (``waiting_only`` for customer cancellations)"""
+    return _apply(db, _CANCEL, {
+        "ticket_id": ticket_id,
+        "dept_id": department_id,
+        "notes": notes,
+        "waiting_only": waiting_only,
+    })
+
+
+def ticket_status(db: Session, ticket_id: int) -> Optional[str]:
+    """Current status of a ticket, used to explain a rejected transition"""
+    return db.execute(
+        text("SELECT status FROM queue_tickets WHERE id = :ticket_id"),
+        {"ticket_id": ticket_id}
+    ).scalar()
+
+
+def transition_ticket(
+    db: Session,
+    ticket_id: int,
+    new_status: TicketStatus,
+    staff_id: Optional[int] = None,
+    department_id: Optional[int] = None
+) -> Optional[Row]:
+    """Apply the move leading to ``new_status``; None if it is not a legal target"""
+    new_status = TicketStatus(new_status)
+    if new_status == TicketStatus.called:
+        return call_ticket(db, ticket_id, staff_id, department_id)
+    if new_status == TicketStatus.completed:
+        return complete_ticket(db, ticket_id, staff_id, department_id)
+    if new_status == TicketStatus.no_show:
+        return cancel_ticket(db, ticket_id, department_id)
+    return None
@@ -0,0 +1,216 @@
+"""
+Learned wait-time estimator
+
+Replaces ``people_ahead * service.estimated_duration``. Actual service
+times (``called_at`` -> ``completed_at``) feed exponentially weighted means
+and variances per service, per staff member and per department, updated in
+O(1) on every completion (see ``queue_events``). A department is served in
+parallel by every staff member who called or completed a ticket recently,
+so its throughput is the sum of their individual rates:
+
+    wait ~= people_ahead / sum(1 / mean_service_time(staff))
+
+The static ``estimated_duration`` is only used until a service, staff member
+or department has enough samples. The model is seeded at startup from the
+most recent completions in one query.
+"""
+import math
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+
+# Minutes per ticket when nothing better is known (same as the old status endpoint)
+DEFAULT_SERVICE_MINUTES = 15
+
+# Completions needed before a learned mean replaces the static duration
+MIN_SAMPLES = 3
+
+# Service times outside this range (minutes) are data errors, not customers
+MIN_SERVICE_MINUTES = 0.25
+MAX_SERVICE_MINUTES = 240
+
+_RECENT_COMPLETIONS = text("""
+    SELECT service_id, staff_id, department_id, called_at, completed_at
+    FROM queue_tickets
+    WHERE status = 'completed' AND called_at IS NOT NULL AND completed_at IS NOT NULL
+    ORDER BY completed_at DESC
+    LIMIT :limit
+""")
+
+
+class EwmaStat:
+    """Exponentially weighted mean and variance of one stream of samples"""
+
+    __slots__ = ("mean", "variance", "count")
+
+    def __init__(self):
+        self.mean = 0.0
+        self.variance = 0.0
+        self.count = 0
+
+    def update(self, value: float, alpha: float):
+        if self.count == 0:
+            self.mean = value
+        else:
+            diff = value - self.mean
+            increment = alpha * diff
+            self.mean += increment
+            self.variance = (1 - alpha) * (self.variance + diff * increment)
+        self.count += 1
+
+    @property
+    def trusted(self) -> bool:
+        return self.count >= MIN_SAMPLES
+
+
+class WaitEstimate:
+    """Estimated minutes until a ticket is called, with a one-sigma range"""
+
+    __slots__ = ("minutes", "low", "high")
+
+    def __init__(self, minutes: float, spread: float = 0.0):
+        self.minutes = int(round(minutes))
+        self.low = max(0, int(math.floor(minutes - spread)))
+        self.high = int(math.ceil(minutes + spread))
+
+    def as_range(self):
+        return [self.low, self.high]
+
+
+class ServiceTimeEstimator:
+    """Online service-time model shared by all status endpoints"""
+
+    def __init__(self, alpha: float, active_minutes: float):
+        self.alpha = alpha
+        self.active_seconds = active_minutes * 60
+        self._lock = threading.Lock()
+        self._services: Dict[int, EwmaStat] = {}
+        self._staff: Dict[int, EwmaStat] = {}
+        self._departments: Dict[int, EwmaStat] = {}
+        self._active: Dict[int, Dict[int, float]] = {}  # department_id -> {staff_id: last seen}
+        self._latest: Dict[int, float] = {}  # department_id -> newest completion observed (epoch s)
+
+    # ---- learning ------------------------------------------------------
+
+    def observe(self, department_id: int, service_id: Optional[int], staff_id: Optional[int],
+                called_at: datetime, completed_at: datetime):
+        """Record one finished ticket"""
+        minutes = (completed_at - called_at).total_seconds() / 60
+        if not MIN_SERVICE_MINUTES <= minutes <= MAX_SERVICE_MINUTES:
+            return
+        with self._lock:
+            self._latest[department_id] = max(self._latest.get(department_id, 0.0), completed_at.timestamp())
+            self._stat(self._departments, department_id).update(minutes, self.alpha)
+            if service_id is not None:
+                self._stat(self._services, service_id).update(minutes, self.alpha)
+            if staff_id is not None:
+                self._stat(self._staff, staff_id).update(minutes, self.alpha)
+
+    def staff_active(self, department_id: int, staff_id: Optional[int], now: Optional[float] = None):
+        """A staff member called or completed a ticket in the department.
+
+        ``now`` (seconds, same clock as :meth:`estimate`) replays history;
+        it defaults to the monotonic clock.
+        """
+        if staff_id is None:
+            return
+        with self._lock:
+            self._active.setdefault(department_id, {})[staff_id] = time.monotonic() if now is None else now
+
+    def warm_start(self, db: Session, limit: int = 2000) -> int:
+        """Seed the model from the most recent completions (oldest first)"""
+        rows = db.execute(_RECENT_COMPLETIONS, {"limit": limit}).fetchall()
+        wall, clock = datetime.now(), time.monotonic()
+        for row in reversed(rows):
+            self.observe(row.department_id, row.service_id, row.staff_id, row.called_at, row.completed_at)
+            age = (wall - row.completed_at).total_seconds()
+            if age < self.active_seconds:
+                self.staff_active(row.department_id, row.staff_id, now=clock - age)
+        return len(rows)
+
+    @staticmethod
+    def _stat(table: Dict[int, EwmaStat], key: int) -> EwmaStat:
+        stat = table.get(key)
+        if stat is None:
+            stat = table[key] = EwmaStat()
+        return stat
+
+    # ---- estimating ----------------------------------------------------
+
+    def _active_staff(self, department_id: int, now: float) -> Dict[int, float]:
+        # Caller holds the lock; drops staff not seen within active_seconds
+        active = self._active.get(department_id, {})
+        for staff_id, seen in list(active.items()):
+            if now - seen > self.active_seconds:
+                del active[staff_id]
+        return active
+
+    def revision(self, department_id: int, now: Optional[float] = None) -> str:
+        """Short tag that changes whenever the department's estimates may change
+
+        Covers what :meth:`estimate` reads besides its arguments: the newest
+        completion learned from and the staff currently counted as serving,
+        including staff expiring after ``active_minutes`` without a queue
+        change. Both are the same on every worker once ``estimator_feed``
+        has delivered the same calls and completions, so ETags of wait
+        estimates match whichever worker answers.
+        """
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            staff = ",".join(str(staff_id) for staff_id in sorted(self._active_staff(department_id, now)))
+            latest = int(self._latest.get(department_id, 0.0) * 1000)
+            return f"{latest:x}-{zlib.crc32(staff.encode()):x}"
+
+    def service_minutes(self, service_id: Optional[int], fallback: Optional[float] = None) -> Tuple[float, float]:
+        """(mean, variance) of one ticket of a service"""
+        with self._lock:
+            stat = self._services.get(service_id)
+            if stat is not None and stat.trusted:
+                return stat.mean, stat.variance
+        return float(fallback or DEFAULT_SERVICE_MINUTES), 0.0
+
+    def estimate(self, department_id: int, people_ahead: int, service_id: Optional[int] = None,
+                 fallback_minutes: Optional[float] = None, now: Optional[float] = None) -> WaitEstimate:
+        """Wait until ``people_ahead`` tickets of the department have been served"""
+        if people_ahead <= 0:
+            return WaitEstimate(0)
+
+        ticket_mean, ticket_variance = self.service_minutes(service_id, fallback_minutes)
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            department = self._departments.get(department_id)
+            if department is not None and department.trusted:
+                default_mean, default_variance = department.mean, department.variance
+            else:
+                default_mean, default_variance = ticket_mean, ticket_variance
+
+            active = self._active_staff(department_id, now)
+            rate = 0.0  # tickets per minute across active staff
+            for staff_id in active:
+                stat = self._staff.get(staff_id)
+                mean = stat.mean if stat is not None and stat.trusted else default_mean
+                rate += 1 / max(mean, MIN_SERVICE_MINUTES)
+
+        if rate == 0:
+            rate = 1 / max(default_mean, MIN_SERVICE_MINUTES)  # assume one counter open
+        servers = max(1.0, rate * default_mean)
+        minutes = people_ahead / rate
+        # Sum of people_ahead service times spread over the open counters
+        spread = math.sqrt(people_ahead * default_variance) / servers
+        return WaitEstimate(minutes, spread)
+
+
+# Global estimator instance
+wait_estimator = ServiceTimeEstimator(
+    alpha=settings.WAIT_ESTIMATOR_ALPHA,
+    active_minutes=settings.WAIT_ESTIMATOR_ACTIVE_MINUTES
+)
@@ -0,0 +1,19 @@
+"""
+Offline queue simulation
+
+Discrete-event simulator for trying call-next policies, staffing levels and
+ticket assignment rules against synthetic or historical demand before they
+reach production. Run ``python -m app.simulation --help``.
+"""
+
+from .simulator import ASSIGNMENTS, POLICIES, SimulationResult, Simulator
+from .workload import ServiceProfile, Workload
+
+__all__ = [
+    "Simulator",
+    "SimulationResult",
+    "POLICIES",
+    "ASSIGNMENTS",
+    "Workload",
+    "ServiceProfile",
+]
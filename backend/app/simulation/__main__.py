@@ -0,0 +1,124 @@
+"""
+Command line entry point of the queue simulator
+
+    python -m app.simulation --days 30 --staff 3
+    python -m app.simulation --history 28 --staff 1=4,2=2 --policy fifo
+    python -m app.simulation --compare --staff 2,3,4 --json
+
+``--history N`` fits the workload from the last N days of ``queue_tickets``;
+without it a synthetic office is simulated. ``--compare`` runs every
+policy / assignment combination for each staffing level given.
+"""
+import argparse
+import json
+import sys
+import time
+
+from ..core.config import settings
+from ..services.wait_estimator import ServiceTimeEstimator
+from .simulator import ASSIGNMENTS, POLICIES, Simulator
+from .workload import Workload
+
+
+def parse_staffing(value: str, departments):
+    """``3`` -> 3 per department; ``1=4,2=2`` -> per department id"""
+    if "=" not in value:
+        return {dept: int(value) for dept in departments}
+    staffing = {}
+    for part in value.split(","):
+        dept, _, size = part.partition("=")
+        staffing[int(dept)] = int(size)
+    return staffing
+
+
+def print_result(label: str, result):
+    print(f"\n{label}")
+    print(f"{'dept':>6} {'staff':>5} {'served':>7} {'unserved':>8} {'per day':>8} "
+          f"{'p50':>6} {'p95':>6} {'p99':>6} {'util':>6} {'eta err':>8}")
+    rows = [(str(dept), stats) for dept, stats in result.departments.items()]
+    rows.append(("all", result.overall))
+    for name, stats in rows:
+        eta = f"{stats['eta_error_mean']:8.1f}" if "eta_error_mean" in stats else f"{'-':>8}"
+        print(f"{name:>6} {stats['staff']:>5} {stats['served']:>7} {stats['unserved']:>8} "
+              f"{stats['throughput_per_day']:>8} {stats['wait_p50']:>6} {stats['wait_p95']:>6} "
+              f"{stats['wait_p99']:>6} {stats['utilization']:>6.0%} {eta}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.simulation", description="Discrete-event queue simulator")
+    parser.add_argument("--days", type=float, default=30, help="simulated days (default 30)")
+    parser.add_argument("--history", type=int, metavar="DAYS", help="fit the workload from queue_tickets history")
+    parser.add_argument("--departments", type=int, default=4, help="synthetic departments")
+    parser.add_argument("--daily-tickets", type=int, default=120, help="synthetic tickets per department and day")
+    parser.add_argument("--service-minutes", type=float, default=8.0, help="synthetic mean service time")
+    parser.add_argument("--load", type=float, default=1.0, help="multiply every arrival rate")
+    parser.add_argument("--staff", default="3", help="staff per department: N, N1,N2 (with --compare) or DEPT=N,...")
+    parser.add_argument("--policy", choices=POLICIES, default="priority")
+    parser.add_argument("--assignment", choices=ASSIGNMENTS, default="pooled")
+    parser.add_argument("--compare", action="store_true", help="run every policy and assignment")
+    parser.add_argument("--open", type=int, default=8, dest="open_hour", help="opening hour")
+    parser.add_argument("--close", type=int, default=17, dest="close_hour", help="closing hour")
+    parser.add_argument("--weekdays", type=int, default=5, help="open days per week")
+    parser.add_argument("--estimator", action="store_true", help="measure the learned wait estimator's error")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    if args.history:
+        from ..core.database import SessionLocal
+        with SessionLocal() as db:
+            workload = Workload.from_history(db, args.history)
+        if not workload.departments:
+            parser.error(f"no completed tickets in the last {args.history} days")
+    else:
+        workload = Workload.synthetic(
+            departments=args.departments,
+            daily_tickets=args.daily_tickets,
+            open_hour=args.open_hour,
+            close_hour=args.close_hour,
+            weekdays=args.weekdays,
+            mean_service_minutes=args.service_minutes,
+            seed=args.seed,
+        )
+    if args.load != 1.0:
+        workload = workload.scaled(args.load)
+
+    if args.compare and "=" not in args.staff:
+        staff_levels = args.staff.split(",")
+        combinations = [(policy, assignment) for policy in POLICIES for assignment in ASSIGNMENTS]
+    else:
+        staff_levels = [args.staff]
+        combinations = [(args.policy, args.assignment)]
+
+    runs = []
+    for staff in staff_levels:
+        staffing = parse_staffing(staff, workload.departments)
+        for policy, assignment in combinations:
+            estimator = None
+            if args.estimator:
+                estimator = ServiceTimeEstimator(settings.WAIT_ESTIMATOR_ALPHA, settings.WAIT_ESTIMATOR_ACTIVE_MINUTES)
+            simulator = Simulator(
+                workload, staffing,
+                policy=policy,
+                assignment=assignment,
+                open_hour=args.open_hour,
+                close_hour=args.close_hour,
+                weekdays=args.weekdays,
+                estimator=estimator,
+                seed=args.seed,
+            )
+            started = time.perf_counter()
+            result = simulator.run(args.days)
+            elapsed = time.perf_counter() - started
+            label = f"staff={staff} policy={policy} assignment={assignment}"
+            runs.append({"label": label, "seconds": round(elapsed, 3), **result.as_dict()})
+            if not args.json:
+                print_result(f"{label}  ({args.days:g} days in {elapsed:.2f}s)", result)
+
+    if args.json:
+        json.dump(runs, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""
+Discrete-event queue simulator
+
+Replays a :class:`~.workload.Workload` against a staffing plan with one
+event heap (arrivals, service completions, shift changes), so a month of
+traffic runs in well under a second per department. Dispatch uses the same
+code as the API: waiting tickets live in :class:`DepartmentQueue` heaps
+keyed by :func:`queue_key`, and idle staff take the head of the queue
+exactly like ``POST /staff/call-next``. Optionally the live
+:class:`ServiceTimeEstimator` runs alongside to measure ETA error.
+
+Time is measured in minutes from Monday 00:00 of the first simulated week.
+"""
+import heapq
+import math
+import random
+from datetime import datetime, timedelta
+from itertools import count
+from typing import Dict, List, Optional
+
+from ..services.queue_engine import DepartmentQueue
+from ..services.queue_priority import queue_key
+from ..services.wait_estimator import ServiceTimeEstimator
+from .workload import Workload
+
+# Call order of waiting tickets
+POLICIES = ("priority", "fifo")
+
+# How tickets reach a staff member: one shared department queue (the API's
+# behaviour) or a personal queue picked at registration by shortest backlog
+ASSIGNMENTS = ("pooled", "least-loaded")
+
+# Any Monday works: only weekday and hour of the epoch matter
+_EPOCH = datetime(2024, 1, 1)
+
+ARRIVAL, SERVICE_END, SHIFT_START, SHIFT_END = 0, 1, 2, 3
+
+
+class Ticket:
+    __slots__ = ("id", "department_id", "service", "priority", "arrived", "called", "staff", "estimate")
+
+    def __init__(self, ticket_id, department_id, service, priority, arrived):
+        self.id = ticket_id
+        self.department_id = department_id
+        self.service = service
+        self.priority = priority
+        self.arrived = arrived
+        self.called = None
+        self.staff = None
+        self.estimate = None
+
+
+class Staff:
+    __slots__ = ("id", "department_id", "queue", "current", "on_shift", "busy_minutes", "shift_minutes",
+                 "shift_started", "served")
+
+    def __init__(self, staff_id: int, department_id: int):
+        self.id = staff_id
+        self.department_id = department_id
+        self.queue: Optional[DepartmentQueue] = None  # personal queue (least-loaded assignment)
+        self.current: Optional[Ticket] = None
+        self.on_shift = False
+        self.busy_minutes = 0.0
+        self.shift_minutes = 0.0
+        self.shift_started = 0.0
+        self.served = 0
+
+    @property
+    def backlog(self) -> int:
+        return len(self.queue) + (self.current is not None)
+
+
+class SimulationResult:
+    """Per-department and overall metrics of one run"""
+
+    def __init__(self, days: float):
+        self.days = days
+        self.departments: Dict[int, dict] = {}
+        self.overall: dict = {}
+
+    def as_dict(self) -> dict:
+        return {
+            "days": self.days,
+            "overall": self.overall,
+            "departments": {str(dept): stats for dept, stats in self.departments.items()},
+        }
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+def _summary(waits: List[float], served: int, unserved: int, staff: List[Staff],
+             days: float, eta_errors: List[float]) -> dict:
+    waits = sorted(waits)
+    shift = sum(member.shift_minutes for member in staff)
+    stats = {
+        "served": served,
+        "unserved": unserved,
+        "throughput_per_day": round(served / days, 1) if days else 0.0,
+        "wait_mean": round(sum(waits) / len(waits), 1) if waits else 0.0,
+        "wait_p50": round(percentile(waits, 0.50), 1),
+        "wait_p95": round(percentile(waits, 0.95), 1),
+        "wait_p99": round(percentile(waits, 0.99), 1),
+        "utilization": round(sum(member.busy_minutes for member in staff) / shift, 3) if shift else 0.0,
+    }
+    if eta_errors:
+        errors = sorted(eta_errors)
+        stats["eta_error_mean"] = round(sum(errors) / len(errors), 1)
+        stats["eta_error_p90"] = round(percentile(errors, 0.90), 1)
+    return stats
+
+
+class Simulator:
+    """One simulated run of a workload under a staffing plan and policy"""
+
+    def __init__(
+        self,
+        workload: Workload,
+        staffing: Dict[int, int],
+        policy: str = "priority",
+        assignment: str = "pooled",
+        open_hour: int = 8,
+        close_hour: int = 17,
+        weekdays: int = 5,
+        estimator: Optional[ServiceTimeEstimator] = None,
+        seed: int = 1
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy {policy!r}, expected one of {POLICIES}")
+        if assignment not in ASSIGNMENTS:
+            raise ValueError(f"Unknown assignment {assignment!r}, expected one of {ASSIGNMENTS}")
+        self.workload = workload
+        self.policy = policy
+        self.assignment = assignment
+        self.open_hour = open_hour
+        self.close_hour = close_hour
+        self.weekdays = weekdays
+        self.estimator = estimator
+        self.rng = random.Random(seed)
+
+        self._events: List[tuple] = []
+        self._sequence = count()
+        self._ticket_ids = count(1)
+        self.queues: Dict[int, DepartmentQueue] = {}
+        self.tickets: Dict[int, Ticket] = {}
+        self.staff: Dict[int, List[Staff]] = {}
+        staff_ids = count(1)
+        for dept in workload.departments:
+            self.queues[dept] = DepartmentQueue()
+            members = [Staff(next(staff_ids), dept) for _ in range(staffing.get(dept, 0))]
+            if assignment == "least-loaded":
+                for member in members:
+                    member.queue = DepartmentQueue()
+            self.staff[dept] = members
+
+        self._waits: Dict[int, List[float]] = {dept: [] for dept in self.queues}
+        self._unserved: Dict[int, int] = {dept: 0 for dept in self.queues}
+        self._eta_errors: Dict[int, List[float]] = {dept: [] for dept in self.queues}
+
+    # ---- event heap ----------------------------------------------------
+
+    def _schedule(self, at: float, kind: int, payload):
+        heapq.heappush(self._events, (at, kind, next(self._sequence), payload))
+
+    def _schedule_arrivals(self, days: float):
+        """Non-homogeneous Poisson arrivals, piecewise constant per hour"""
+        hours = int(math.ceil(days * 24))
+        for dept, rates in self.workload.rates.items():
+            for hour in range(hours):
+                rate = rates[hour % len(rates)]
+                if rate <= 0:
+                    continue
+                moment = hour * 60 + self.rng.expovariate(rate) * 60
+                while moment < (hour + 1) * 60:
+                    self._schedule(moment, ARRIVAL, dept)
+                    moment += self.rng.expovariate(rate) * 60
+
+    def _schedule_shifts(self, days: float):
+        for day in range(int(math.ceil(days))):
+            if day % 7 >= self.weekdays:
+                continue
+            start = day * 1440 + self.open_hour * 60
+            end = day * 1440 + self.close_hour * 60
+            for members in self.staff.values():
+                for member in members:
+                    self._schedule(start, SHIFT_START, member)
+                    self._schedule(end, SHIFT_END, member)
+
+    # ---- dispatch (mirrors the API) -------------------------------------
+
+    def _key(self, ticket: Ticket):
+        if self.policy == "fifo":
+            return queue_key(ticket.id, None, _EPOCH + timedelta(minutes=ticket.arrived))
+        return queue_key(ticket.id, ticket.priority, _EPOCH + timedelta(minutes=ticket.arrived))
+
+    def _queue_for(self, ticket: Ticket) -> DepartmentQueue:
+        members = self.staff[ticket.department_id]
+        if self.assignment == "pooled" or not members:
+            return self.queues[ticket.department_id]
+        # Registration picks the on-shift counter with the shortest backlog
+        on_shift = [member for member in members if member.on_shift] or members
+        chosen = min(on_shift, key=lambda member: (member.backlog, member.id))
+        ticket.staff = chosen
+        return chosen.queue
+
+    def _people_ahead(self, ticket: Ticket, queue: DepartmentQueue) -> int:
+        if ticket.staff is None:
+            return len(queue)
+        return ticket.staff.backlog
+
+    def _call_next(self, member: Staff, now: float):
+        """An idle, on-shift staff member takes the head of their queue"""
+        queue = member.queue if member.queue is not None else self.queues[member.department_id]
+        key = queue.pop()
+        if key is None:
+            return
+        ticket = self.tickets.pop(key[2])
+        ticket.called = now
+        member.current = ticket
+        self._waits[ticket.department_id].append(now - ticket.arrived)
+        if ticket.estimate is not None:
+            self._eta_errors[ticket.department_id].append(abs(ticket.estimate - (now - ticket.arrived)))
+        if self.estimator is not None:
+            self.estimator.staff_active(member.department_id, member.id, now=now * 60)
+        duration = ticket.service.sample_minutes(self.rng)
+        member.busy_minutes += duration
+        self._schedule(now + duration, SERVICE_END, member)
+
+    def _idle_staff(self, department_id: int) -> List[Staff]:
+        return [member for member in self.staff[department_id] if member.on_shift and member.current is None]
+
+    # ---- event handlers ------------------------------------------------
+
+    def _closed(self, now: float) -> bool:
+        """Past closing time or a day off: the kiosk issues no tickets"""
+        day, minute = divmod(now, 1440)
+        return day % 7 >= self.weekdays or minute >= self.close_hour * 60
+
+    def _arrival(self, department_id: int, now: float):
+        if self._closed(now):
+            self._unserved[department_id] += 1
+            return
+        ticket = Ticket(
+            next(self._ticket_ids),
+            department_id,
+            self.workload.pick_service(department_id, self.rng),
+            self.workload.pick_priority(self.rng),
+            now,
+        )
+        queue = self._queue_for(ticket)
+        if self.estimator is not None:
+            ticket.estimate = self.estimator.estimate(
+                department_id, self._people_ahead(ticket, queue), ticket.service.service_id,
+                ticket.service.estimated_duration, now=now * 60
+            ).minutes
+        self.tickets[ticket.id] = ticket
+        queue.push(self._key(ticket))
+
+        if ticket.staff is not None:
+            if ticket.staff.on_shift and ticket.staff.current is None:
+                self._call_next(ticket.staff, now)
+        else:
+            idle = self._idle_staff(department_id)
+            if idle:
+                self._call_next(idle[0], now)
+
+    def _service_end(self, member: Staff, now: float):
+        ticket = member.current
+        member.current = None
+        member.served += 1
+        if self.estimator is not None:
+            called = _EPOCH + timedelta(minutes=ticket.called)
+            self.estimator.observe(member.department_id, ticket.service.service_id, member.id,
+                                   called, _EPOCH + timedelta(minutes=now))
+            self.estimator.staff_active(member.department_id, member.id, now=now * 60)
+        if member.on_shift:
+            self._call_next(member, now)
+
+    def _shift_start(self, member: Staff, now: float):
+        member.on_shift = True
+        member.shift_started = now
+        if member.current is None:
+            self._call_next(member, now)
+
+    def _shift_end(self, member: Staff, now: float):
+        # The ticket being served is finished; nothing new is called
+        member.on_shift = False
+        member.shift_minutes += now - member.shift_started
+        department_id = member.department_id
+        if any(other.on_shift for other in self.staff[department_id]):
+            if member.queue is not None:
+                self._reassign(member.queue, now)
+            return
+        # Office closed for the day: whoever is still waiting goes home unserved
+        self._drop_queue(self.queues[department_id], department_id)
+        for other in self.staff[department_id]:
+            if other.queue is not None:
+                self._drop_queue(other.queue, department_id)
+
+    def _reassign(self, queue: DepartmentQueue, now: float):
+        """Hand the personal queue of a staff member going off shift to colleagues"""
+        while True:
+            key = queue.pop()
+            if key is None:
+                break
+            ticket = self.tickets[key[2]]
+            self._queue_for(ticket).push(key)
+            if ticket.staff.current is None:
+                self._call_next(ticket.staff, now)
+
+    def _drop_queue(self, queue: DepartmentQueue, department_id: int):
+        while True:
+            key = queue.pop()
+            if key is None:
+                break
+            del self.tickets[key[2]]
+            self._unserved[department_id] += 1
+
+    # ---- running -------------------------------------------------------
+
+    def run(self, days: float = 30) -> SimulationResult:
+        end = days * 1440
+        self._schedule_arrivals(days)
+        self._schedule_shifts(days)
+        handlers = (self._arrival, self._service_end, self._shift_start, self._shift_end)
+        events = self._events
+        while events:
+            now, kind, _, payload = heapq.heappop(events)
+            if now > end and kind == ARRIVAL:
+                continue
+            handlers[kind](payload, now)
+        for ticket in self.tickets.values():
+            self._unserved[ticket.department_id] += 1
+
+        result = SimulationResult(days)
+        all_waits, all_errors, all_staff = [], [], []
+        served = unserved = 0
+        for dept in self.queues:
+            members = self.staff[dept]
+            waits = self._waits[dept]
+            result.departments[dept] = _summary(
+                waits, len(waits), self._unserved[dept], members, days, self._eta_errors[dept]
+            )
+            result.departments[dept]["staff"] = len(members)
+            all_waits.extend(waits)
+            all_errors.extend(self._eta_errors[dept])
+            all_staff.extend(members)
+            served += len(waits)
+            unserved += self._unserved[dept]
+        result.overall = _summary(all_waits, served, unserved, all_staff, days, all_errors)
+        result.overall["staff"] = len(all_staff)
+        return result
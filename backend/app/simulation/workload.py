@@ -0,0 +1,183 @@
+"""
+Simulation workloads
+
+A workload describes who arrives when and how long they take to serve:
+hourly arrival rates per department and weekday, the service mix of each
+department, a log-normal service-time distribution per service and the
+priority mix. It is either fitted from ``queue_tickets`` history or
+generated synthetically.
+"""
+import math
+import random
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from ..models.ticket import TicketPriority
+
+HOURS_PER_WEEK = 7 * 24
+
+_ARRIVALS = text("""
+    SELECT department_id,
+           EXTRACT(ISODOW FROM created_at)::int - 1 AS weekday,
+           EXTRACT(HOUR FROM created_at)::int AS hour,
+           COUNT(*) AS tickets
+    FROM queue_tickets
+    WHERE created_at >= NOW() - make_interval(days => :days)
+    GROUP BY 1, 2, 3
+""")
+
+_SERVICE_TIMES = text("""
+    SELECT qt.service_id, qt.department_id, COUNT(*) AS tickets,
+           AVG(LN(GREATEST(EXTRACT(EPOCH FROM qt.completed_at - qt.called_at) / 60, 0.25))) AS log_mean,
+           STDDEV_SAMP(LN(GREATEST(EXTRACT(EPOCH FROM qt.completed_at - qt.called_at) / 60, 0.25))) AS log_sd,
+           MAX(s.estimated_duration) AS estimated_duration
+    FROM queue_tickets qt
+    LEFT JOIN services s ON s.id = qt.service_id
+    WHERE qt.created_at >= NOW() - make_interval(days => :days)
+    GROUP BY qt.service_id, qt.department_id
+""")
+
+_COMPLETED_FILTER = "qt.status = 'completed' AND qt.called_at IS NOT NULL AND qt.completed_at IS NOT NULL"
+
+_PRIORITY_MIX = text("""
+    SELECT COALESCE(priority::text, 'normal') AS priority, COUNT(*) AS tickets
+    FROM queue_tickets
+    WHERE created_at >= NOW() - make_interval(days => :days)
+    GROUP BY 1
+""")
+
+
+class ServiceProfile:
+    """Share of a department's arrivals and log-normal service time of one service"""
+
+    __slots__ = ("service_id", "department_id", "weight", "log_mean", "log_sd", "estimated_duration")
+
+    def __init__(self, service_id: int, department_id: int, weight: float,
+                 mean_minutes: float, cv: float = 0.5, estimated_duration: Optional[float] = None):
+        self.service_id = service_id
+        self.department_id = department_id
+        self.weight = weight
+        # Log-normal with the requested mean and coefficient of variation
+        self.log_sd = math.sqrt(math.log(1 + cv * cv))
+        self.log_mean = math.log(mean_minutes) - self.log_sd ** 2 / 2
+        self.estimated_duration = estimated_duration or mean_minutes
+
+    def sample_minutes(self, rng: random.Random) -> float:
+        return rng.lognormvariate(self.log_mean, self.log_sd)
+
+
+class Workload:
+    """Arrival rates, service mix and priority mix of every department"""
+
+    def __init__(self):
+        # department_id -> 168 hourly arrival rates (Monday 00:00 first)
+        self.rates: Dict[int, List[float]] = {}
+        self.services: Dict[int, List[ServiceProfile]] = defaultdict(list)
+        self.priorities: List[Tuple[str, float]] = [(TicketPriority.normal.value, 1.0)]
+
+    @property
+    def departments(self) -> List[int]:
+        return sorted(self.rates)
+
+    def pick_service(self, department_id: int, rng: random.Random) -> ServiceProfile:
+        profiles = self.services[department_id]
+        return rng.choices(profiles, weights=[p.weight for p in profiles])[0]
+
+    def pick_priority(self, rng: random.Random) -> str:
+        names, weights = zip(*self.priorities)
+        return rng.choices(names, weights=weights)[0]
+
+    def scaled(self, factor: float) -> "Workload":
+        """Same workload with every arrival rate multiplied by ``factor``"""
+        copy = Workload()
+        copy.rates = {dept: [rate * factor for rate in rates] for dept, rates in self.rates.items()}
+        copy.services = self.services
+        copy.priorities = self.priorities
+        return copy
+
+    # ---- construction ------------------------------------------------------
+
+    @classmethod
+    def synthetic(
+        cls,
+        departments: int = 4,
+        services_per_department: int = 3,
+        daily_tickets: int = 120,
+        open_hour: int = 8,
+        close_hour: int = 17,
+        weekdays: int = 5,
+        mean_service_minutes: float = 8.0,
+        seed: int = 1
+    ) -> "Workload":
+        """Government-office shaped demand: morning and early-afternoon peaks"""
+        rng = random.Random(seed)
+        workload = cls()
+        hours = list(range(open_hour, close_hour))
+        # Two bumps, the morning one larger; normalised to daily_tickets
+        shape = [
+            1.0 + 1.2 * math.exp(-((h - (open_hour + 1.5)) ** 2) / 2)
+            + 0.7 * math.exp(-((h - 14) ** 2) / 2)
+            for h in hours
+        ]
+        total = sum(shape)
+        for dept in range(1, departments + 1):
+            rates = [0.0] * HOURS_PER_WEEK
+            for day in range(weekdays):
+                for hour, weight in zip(hours, shape):
+                    rates[day * 24 + hour] = daily_tickets * weight / total
+            workload.rates[dept] = rates
+            for index in range(services_per_department):
+                mean = mean_service_minutes * rng.uniform(0.5, 1.6)
+                workload.services[dept].append(ServiceProfile(
+                    service_id=dept * 100 + index,
+                    department_id=dept,
+                    weight=rng.uniform(0.5, 2.0),
+                    mean_minutes=mean,
+                    cv=rng.uniform(0.3, 0.8),
+                    estimated_duration=round(mean_service_minutes),
+                ))
+        workload.priorities = [
+            (TicketPriority.normal.value, 0.85),
+            (TicketPriority.elderly.value, 0.08),
+            (TicketPriority.disabled.value, 0.03),
+            (TicketPriority.vip.value, 0.02),
+            (TicketPriority.high.value, 0.02),
+        ]
+        return workload
+
+    @classmethod
+    def from_history(cls, db: Session, days: int = 28) -> "Workload":
+        """Fit arrival rates, service times and priority mix from ``queue_tickets``"""
+        workload = cls()
+        weeks = days / 7
+        for row in db.execute(_ARRIVALS, {"days": days}):
+            rates = workload.rates.setdefault(row.department_id, [0.0] * HOURS_PER_WEEK)
+            rates[row.weekday * 24 + row.hour] += row.tickets / weeks
+
+        service_times = text(str(_SERVICE_TIMES).replace(
+            "WHERE qt.created_at", f"WHERE {_COMPLETED_FILTER} AND qt.created_at"
+        ))
+        for row in db.execute(service_times, {"days": days}):
+            profile = ServiceProfile(
+                service_id=row.service_id,
+                department_id=row.department_id,
+                weight=row.tickets,
+                mean_minutes=1.0,
+                estimated_duration=row.estimated_duration,
+            )
+            profile.log_mean = float(row.log_mean)
+            profile.log_sd = float(row.log_sd or 0.0)
+            workload.services[row.department_id].append(profile)
+
+        mix = [(row.priority, float(row.tickets)) for row in db.execute(_PRIORITY_MIX, {"days": days})]
+        if mix:
+            workload.priorities = mix
+
+        # Departments that only ever had arrivals without completions cannot be served
+        for dept in list(workload.rates):
+            if not workload.services.get(dept):
+                del workload.rates[dept]
+        return workload
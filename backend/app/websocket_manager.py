@@ -1,46 +1,146 @@
 from fastapi import WebSocket
-from typing import Dict, List
-import json
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set, Union
 import asyncio
+import time
+
+from .core.config import settings
+from .realtime.broker import Broker
+from .realtime.coalescer import Coalescer
+from .realtime.connection import Connection
+from .realtime.envelope import JSON, Envelope
+from .realtime.heartbeat import HeartbeatWheel
+from .realtime.metrics import Metrics
+from .realtime.registry import Registry
+from .realtime.replay import ReplayLog, department_stream, ticket_stream
+from .realtime.rooms import DASHBOARD_ROLES, department_room, role_room, ticket_room
+
+# Roles a /ws client may announce when following a department
+DEPARTMENT_ROLES = DASHBOARD_ROLES + ("display", "customer")
 
 class WebSocketManager:
     def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
-        self.queue_subscribers: Dict[str, List[str]] = {}  # ticket_id -> [client_ids]
-        self.client_tickets: Dict[str, str] = {}  # client_id -> ticket_id
+        self.clients = Registry()  # /ws clients by client id, in ticket and department rooms
+        self.schedule = Registry()  # schedule sockets by user id, in department/role rooms
+        self.active_connections: Dict[str, Connection] = self.clients.connections
+        self.rooms = self.clients.rooms
+        self.schedule_connections: Dict[int, Connection] = self.schedule.connections
+        self.schedule_rooms = self.schedule.rooms
+        self.broker: Broker = Broker(self._deliver)  # in-process until start() installs another one
+        self._handlers: Dict[str, Callable[[dict], Awaitable[None]]] = {}
+        # Sequence numbers and replay buffers of ticket / department streams
+        self.replay = ReplayLog(settings.WEBSOCKET_REPLAY_BUFFER_SIZE, settings.WEBSOCKET_RESUME_GRACE_SECONDS)
+        # Keepalive pings and idle eviction for every socket, driven by one task
+        self.heartbeat = HeartbeatWheel(
+            settings.WEBSOCKET_HEARTBEAT_INTERVAL,
+            settings.WEBSOCKET_IDLE_TIMEOUT_SECONDS,
+            settings.WEBSOCKET_HEARTBEAT_TICK_SECONDS
+        )
+        # Dashboard queue updates per (department_id, local), at most one per window
+        self.queue_updates = Coalescer(settings.WEBSOCKET_COALESCE_WINDOW_MS / 1000, self._flush_queue_updates)
+        # Sends, failures and latencies, see metrics_snapshot()
+        self.metrics = Metrics(settings.WEBSOCKET_METRICS_WINDOW)
+        
+    # Cross-worker delivery: every broadcast below is published as an event
+    # and each worker's _deliver() sends it to the sockets it holds
+    
+    async def start(self, broker: Broker):
+        """Install the broker shared with the other workers (at startup)"""
+        await self.broker.stop()
+        self.broker = broker
+        await broker.start(self._deliver)
+        self.heartbeat.start()
+    
+    async def stop(self):
+        self.queue_updates.close()
+        await self.heartbeat.stop()
+        await self.broker.stop()
+    
+    def on(self, op: str, handler: Callable[[dict], Awaitable[None]]):
+        """Run ``handler(event)`` on every worker for events published with ``op``"""
+        self._handlers[op] = handler
+    
+    async def publish(self, op: str, **data):
+        await self.broker.publish({"op": op, **data})
+    
+    async def _deliver(self, event: dict):
+        # Each message is wrapped once here and encoded once per wire format
+        op = event.get("op")
+        if op == "client":
+            self._enqueue(event["message"], event["client_id"])
+        elif op == "ticket":
+            self._deliver_to_queue(event["message"], event["ticket_id"])
+        elif op == "rooms":
+            stream = event.get("stream")
+            self._deliver_to_rooms(event["message"], [tuple(room) for room in event["rooms"]],
+                                   tuple(stream) if stream else None)
+        elif op == "all":
+            started = time.perf_counter()
+            envelope = Envelope.of(event["message"])
+            recipients = list(self.active_connections.values())
+            for connection in recipients:
+                connection.enqueue(envelope)
+            self.metrics.observe_fanout("all", time.perf_counter() - started, len(recipients))
+        elif op == "schedule":
+            rooms = event.get("rooms")
+            self._deliver_schedule(
+                event["message"],
+                [tuple(room) for room in rooms] if rooms is not None else None,
+                event.get("user_ids") or ()
+            )
+        elif op in self._handlers:
+            await self._handlers[op](event)
+        
+    def _open(self, key, websocket: WebSocket, on_dead, encoding: str = JSON) -> Connection:
+        connection = Connection(
+            key,
+            websocket,
+            limit=settings.WEBSOCKET_SEND_QUEUE_SIZE,
+            send_timeout=settings.WEBSOCKET_SEND_TIMEOUT_SECONDS,
+            on_dead=on_dead,
+            encoding=encoding,
+            metrics=self.metrics
+        )
+        connection.start()
+        self.heartbeat.add(connection)
+        return connection
+        
+    async def _queue_connection_dead(self, connection: Connection):
+        # Only if the client has not reconnected with a new socket meanwhile
+        await self.disconnect(connection.key, connection)
         
-    async def connect(self, websocket: WebSocket, client_id: str):
-        """Add a new websocket connection to the manager"""
+    async def connect(self, websocket: WebSocket, client_id: str, encoding: str = JSON) -> Optional[Connection]:
+        """Add a new websocket connection to the manager (``encoding`` from the handshake)
+        
+        Returns the connection (None on failure); the handler passes it to
+        :meth:`touch` and :meth:`disconnect` so that, once the client has
+        reconnected with the same id, the old handler cannot act on the new socket.
+        """
         try:
-            self.active_connections[client_id] = websocket
+            connection = self._open(client_id, websocket, self._queue_connection_dead, encoding)
+            previous = self.clients.add(connection)
+            if previous is not None:
+                previous.stop()
             print(f"Added client {client_id} to active connections")
-            print(f"Current active connections: {list(self.active_connections.keys())}")
-            return True
+            print(f"Current active connections: {len(self.active_connections)}")
+            return connection
         except Exception as e:
             print(f"Error connecting client {client_id}: {str(e)}")
-            return False
+            return None
         
-    async def disconnect(self, client_id: str):
-        """Remove a websocket connection from the manager"""
+    async def disconnect(self, client_id: str, connection: Optional[Connection] = None):
+        """Remove a websocket connection from the manager (only if it is still ``connection``, when given)"""
         try:
-            if client_id in self.active_connections:
-                # Get the websocket before removing it
-                websocket = self.active_connections[client_id]
-                
-                # Remove from active connections first
-                del self.active_connections[client_id]
+            # Remove from active connections first and stop its writer
+            connection = self.clients.remove(client_id, connection)
+            if connection is not None:
+                websocket = connection.websocket
+                connection.stop()
                 print(f"Removed client {client_id} from active connections")
                 
-                # Remove from queue subscriptions
-                if client_id in self.client_tickets:
-                    ticket_id = self.client_tickets[client_id]
-                    if ticket_id in self.queue_subscribers:
-                        if client_id in self.queue_subscribers[ticket_id]:
-                            self.queue_subscribers[ticket_id].remove(client_id)
-                        if not self.queue_subscribers[ticket_id]:
-                            del self.queue_subscribers[ticket_id]
-                    del self.client_tickets[client_id]
-                    print(f"Removed client {client_id} from queue {ticket_id}")
+                # Leave tickets and departments; their streams stay resumable for a while
+                await self.leave_queue(client_id)
+                await self.leave_department(client_id)
+                self.rooms.leave_all(client_id)
                 
                 # Try to close the websocket connection only if it's still open
                 try:
@@ -55,63 +155,182 @@ class WebSocketManager:
                     # Ignore errors when closing - connection may already be closed
                     print(f"WebSocket already closed for client {client_id}: {str(e)}")
                     
-                print(f"Current active connections: {list(self.active_connections.keys())}")
+                print(f"Current active connections: {len(self.active_connections)}")
                 return True
             return False
         except Exception as e:
             print(f"Error disconnecting client {client_id}: {str(e)}")
             return False
     
-    async def send_personal_message(self, message: str, client_id: str):
-        if client_id in self.active_connections:
-            websocket = self.active_connections[client_id]
-            try:
-                await websocket.send_text(message)
-            except:
-                await self.disconnect(client_id)
+    def touch(self, client_id: str, connection: Optional[Connection] = None) -> bool:
+        """Record that a /ws client sent something (keeps it from being evicted)
+        
+        False, and nothing recorded, when ``connection`` was replaced by a reconnect.
+        """
+        current = self.active_connections.get(client_id)
+        if current is None or (connection is not None and current is not connection):
+            return False
+        current.touch()
+        return True
     
-    async def broadcast_to_queue(self, message: str, ticket_id: str):
-        if ticket_id in self.queue_subscribers:
-            for client_id in self.queue_subscribers[ticket_id][:]:  # Copy to avoid modification during iteration
-                await self.send_personal_message(message, client_id)
+    def metrics_snapshot(self) -> dict:
+        """Connection counts, queue depths, failures and latencies of this worker
+
+        Gauges are computed here (O(connections + rooms)), so call it from a
+        metrics scrape, not per message.
+        """
+        followers: Dict[str, int] = {}
+        tickets = 0
+        for room in self.rooms:
+            if room[0] == "ticket":
+                tickets += 1
+            elif room[0] == "department":
+                followers[room[2]] = followers.get(room[2], 0) + len(self.rooms.members(room))
+
+        backlogs = [connection.backlog for connection in self.active_connections.values()]
+        backlogs += [connection.backlog for connection in self.schedule_connections.values()]
+        lagging = sum(1 for connection in self.active_connections.values() if connection.lagging)
+        lagging += sum(1 for connection in self.schedule_connections.values() if connection.lagging)
+        return {
+            "connections": {
+                "clients": len(self.clients),
+                "schedule": len(self.schedule),
+                "department_followers": followers,  # by role: staff/manager/admin dashboards, displays, customers
+                "followed_tickets": tickets,
+            },
+            "queues": {
+                "queued": sum(backlogs),
+                "max_backlog": max(backlogs, default=0),
+                "lagging": lagging,
+                "limit": settings.WEBSOCKET_SEND_QUEUE_SIZE,
+            },
+            "heartbeat": {"pinged": self.heartbeat.pinged, "evicted": self.heartbeat.evicted},
+            "coalescing": self.queue_updates.pending,
+            "replay_streams": len(self.replay),
+            "broker": type(self.broker).__name__,
+            **self.metrics.snapshot(),
+        }
+
+    def _enqueue(self, message: Union[Envelope, str, dict], client_id: str) -> bool:
+        # Never waits: the connection's writer task does the actual send
+        connection = self.active_connections.get(client_id)
+        if connection is None:
+            return False
+        return connection.enqueue(message)
+    
+    def _deliver_to_queue(self, message, ticket_id: str):
+        started = time.perf_counter()
+        # Numbered and buffered even without subscribers while resumable
+        message = self.replay.record(ticket_stream(ticket_id), message)
+        recipients = list(self.rooms.members(ticket_room(ticket_id)))  # Copy to avoid modification during iteration
+        for client_id in recipients:
+            self._enqueue(message, client_id)
+        self.metrics.observe_fanout("ticket", time.perf_counter() - started, len(recipients))
+    
+    def _deliver_to_rooms(self, message, rooms, stream=None):
+        started = time.perf_counter()
+        message = self.replay.record(stream, message) if stream is not None else Envelope.of(message)
+        recipients = self.rooms.members_of(rooms)
+        for client_id in recipients:
+            self._enqueue(message, client_id)
+        self.metrics.observe_fanout("rooms", time.perf_counter() - started, len(recipients))
+    
+    async def send_personal_message(self, message: Union[str, dict], client_id: str):
+        # The client may be connected to another worker
+        if not self._enqueue(message, client_id):
+            await self.publish("client", client_id=client_id, message=message)
+    
+    async def broadcast_to_queue(self, message: Union[str, dict], ticket_id: str, local: bool = False):
+        """Send to a ticket's subscribers; ``local`` skips the other workers"""
+        if local:
+            self._deliver_to_queue(message, ticket_id)
+        else:
+            await self.publish("ticket", ticket_id=ticket_id, message=message)
+    
+    async def broadcast_to_all(self, message: Union[str, dict]):
+        await self.publish("all", message=message)
+    
+    async def broadcast_to_rooms(self, message: Union[str, dict], rooms, local: bool = False, stream=None):
+        """Send to every client in any of ``rooms`` (each client once)
+        
+        ``stream`` numbers the message in that resumable stream.
+        """
+        if local:
+            self._deliver_to_rooms(message, rooms, stream)
+        else:
+            await self.publish("rooms", rooms=[list(room) for room in rooms], message=message,
+                               stream=list(stream) if stream else None)
+    
+    async def join_department(self, client_id: str, department_id: int, role: str = "staff"):
+        """Follow a department's queue events as ``role``"""
+        if client_id not in self.active_connections or role not in DEPARTMENT_ROLES:
+            return False
+        self.rooms.join(client_id, department_room(int(department_id), role))
+        if role in DASHBOARD_ROLES:
+            self.replay.open(department_stream(department_id))
+        return True
+    
+    async def leave_department(self, client_id: str, department_id: Optional[int] = None):
+        """Stop following one department, or every department"""
+        for room in list(self.rooms.rooms_of(client_id)):
+            if room[0] == "department" and (department_id is None or room[1] == int(department_id)):
+                self.rooms.leave(client_id, room)
+                if not self._has_dashboards(room[1]):
+                    self.replay.retain(department_stream(room[1]))
+    
+    def _has_dashboards(self, department_id: int) -> bool:
+        return any(department_room(department_id, role) in self.rooms for role in DASHBOARD_ROLES)
     
-    async def broadcast_to_all(self, message: str):
-        for client_id in list(self.active_connections.keys()):
-            await self.send_personal_message(message, client_id)
+    def has_dashboard_listeners(self, department_id: int) -> bool:
+        """Dashboards follow the department, or may resume following it"""
+        return self._has_dashboards(department_id) or self.replay.is_retained(department_stream(department_id))
     
     async def join_queue(self, client_id: str, ticket_id: str):
-        if ticket_id not in self.queue_subscribers:
-            self.queue_subscribers[ticket_id] = []
-        
-        if client_id not in self.queue_subscribers[ticket_id]:
-            self.queue_subscribers[ticket_id].append(client_id)
-            
-        self.client_tickets[client_id] = ticket_id
-        
-        # Send initial queue status
-        await self.send_queue_update(ticket_id)
-    
-    async def leave_queue(self, client_id: str):
-        if client_id in self.client_tickets:
-            ticket_id = self.client_tickets[client_id]
-            if ticket_id in self.queue_subscribers:
-                self.queue_subscribers[ticket_id].remove(client_id)
-                if not self.queue_subscribers[ticket_id]:
-                    del self.queue_subscribers[ticket_id]
-            del self.client_tickets[client_id]
-    
-    async def send_queue_update(self, ticket_id: str):
-        # This would be called when queue status changes
-        # You'll implement the actual queue status logic here
+        """Follow a ticket's events (a client may follow several tickets)"""
+        if client_id not in self.clients:
+            return False
+        self.rooms.join(client_id, ticket_room(ticket_id))  # clients send ids as numbers or strings
+        self.replay.open(ticket_stream(ticket_id))
+        return True
+    
+    async def leave_queue(self, client_id: str, ticket_id: Optional[str] = None):
+        """Stop following one ticket, or every ticket"""
+        for room in list(self.rooms.rooms_of(client_id)):
+            if room[0] == "ticket" and (ticket_id is None or room == ticket_room(ticket_id)):
+                self.rooms.leave(client_id, room)
+                if room not in self.rooms:
+                    self.replay.retain(ticket_stream(room[1]))
+    
+    def followed_tickets(self) -> Set[str]:
+        """Tickets with subscribers, or whose stream is kept for resuming clients"""
+        tickets = {room[1] for room in self.rooms if room[0] == "ticket"}
+        tickets.update(key[1] for key in self.replay.retained() if key[0] == "ticket")
+        return tickets
+    
+    def resume(self, client_id: str, stream, resume_from=None, epoch=None) -> dict:
+        """Replay what a rejoining client missed on ``stream``
+        
+        Returns ``{"epoch", "seq", "resumed"}`` for the join reply; when
+        ``resumed`` is False the client needs a snapshot instead.
+        """
+        state = self.replay.open(stream)
+        missed = self.replay.since(stream, resume_from, epoch) if resume_from is not None else None
+        for message in missed or ():
+            self._enqueue(message, client_id)
+        return {**state, "resumed": missed is not None}
+    
+    async def send_queue_update(self, ticket_id: str, data: dict = None, local: bool = False):
+        # Called by the position broadcaster when the ticket's position changes
         update_message = {
             "type": "queue_update",
             "ticket_id": ticket_id,
+            **(data or {}),
             "timestamp": asyncio.get_event_loop().time()
         }
         
-        await self.broadcast_to_queue(json.dumps(update_message), ticket_id)
+        await self.broadcast_to_queue(update_message, ticket_id, local)
     
-    async def send_ticket_called(self, ticket_id: str, counter_name: str):
+    async def send_ticket_called(self, ticket_id: str, counter_name: str, local: bool = False):
         message = {
             "type": "ticket_called",
             "ticket_id": ticket_id,
@@ -119,9 +338,18 @@ class WebSocketManager:
             "timestamp": asyncio.get_event_loop().time()
         }
         
-        await self.broadcast_to_queue(json.dumps(message), ticket_id)
+        await self.broadcast_to_queue(message, ticket_id, local)
     
-    async def send_queue_status(self, ticket_id: str, status_data: dict):
+    async def send_ticket_completed(self, ticket_id: str, local: bool = False):
+        message = {
+            "type": "ticket_completed",
+            "ticket_id": ticket_id,
+            "timestamp": asyncio.get_event_loop().time()
+        }
+        
+        await self.broadcast_to_queue(message, ticket_id, local)
+    
+    async def send_queue_status(self, ticket_id: str, status_data: dict, local: bool = False):
         message = {
             "type": "queue_status",
             "ticket_id": ticket_id,
@@ -129,69 +357,170 @@ class WebSocketManager:
             "timestamp": asyncio.get_event_loop().time()
         }
         
-        await self.broadcast_to_queue(json.dumps(message), ticket_id)
+        await self.broadcast_to_queue(message, ticket_id, local)
+    
+    async def broadcast_queue_update(
+        self,
+        department_id: int,
+        action: str = "new_ticket",
+        local: bool = False,
+        ticket: Optional[dict] = None
+    ):
+        """Broadcast queue update to the staff dashboards following the department
+        
+        Updates of a department are coalesced: the first goes out at once, the
+        ones arriving within the next WEBSOCKET_COALESCE_WINDOW_MS are merged
+        into a single message. ``ticket`` (``{"id", "status"}``) is the ticket
+        that moved, if any.
+        """
+        await self.queue_updates.add((department_id, local), (action, ticket))
     
-    async def broadcast_queue_update(self, department_id: int):
-        """Broadcast queue update to all staff dashboard connections"""
+    async def _flush_queue_updates(self, key, events: list):
+        department_id, local = key
+        tickets: Dict[int, dict] = {}
+        for _, ticket in events:
+            if ticket is not None:
+                # Latest status per ticket, in the order of their last change
+                tickets.pop(ticket["id"], None)
+                tickets[ticket["id"]] = ticket
         message = {
             "type": "queue_update",
             "department_id": department_id,
-            "action": "new_ticket",
+            "action": events[-1][0],
+            "events": len(events),
+            "tickets": list(tickets.values()),
             "timestamp": asyncio.get_event_loop().time()
         }
         
-        # Broadcast to all connected clients (staff dashboard)
-        for client_id, websocket in self.active_connections.items():
-            try:
-                await websocket.send_text(json.dumps(message))
-                print(f"Sent queue update to client {client_id}")
-            except Exception as e:
-                print(f"Error sending queue update to {client_id}: {str(e)}")
+        rooms = [department_room(department_id, role) for role in DASHBOARD_ROLES]
+        await self.broadcast_to_rooms(message, rooms, local, department_stream(department_id))
 
     # Schedule-related methods
-    schedule_connections: Dict[int, WebSocket] = {}  # user_id -> websocket
+    
+    async def _schedule_connection_dead(self, connection: Connection):
+        if self.schedule.remove(connection.key, connection) is not None:
+            self.schedule_rooms.leave_all(connection.key)
+            print(f"Schedule WebSocket dropped for user {connection.key}")
     
     async def schedule_connect(self, websocket: WebSocket, user_id: int, user_role: str, department_id: int = None):
         """Connect a schedule WebSocket"""
         await websocket.accept()
-        self.schedule_connections[user_id] = websocket
+        previous = self.schedule.add(self._open(user_id, websocket, self._schedule_connection_dead))
+        if previous is not None:
+            previous.stop()
+        self.schedule_rooms.leave_all(user_id)
+        self.schedule_rooms.join(user_id, role_room(user_role))
+        if department_id is not None:
+            self.schedule_rooms.join(user_id, department_room(department_id, user_role))
         print(f"Schedule WebSocket connected for user {user_id} (role: {user_role})")
     
     def schedule_disconnect(self, websocket: WebSocket):
         """Disconnect a schedule WebSocket"""
-        user_id_to_remove = None
-        for user_id, ws in self.schedule_connections.items():
-            if ws == websocket:
-                user_id_to_remove = user_id
-                break
-        if user_id_to_remove:
-            del self.schedule_connections[user_id_to_remove]
-            print(f"Schedule WebSocket disconnected for user {user_id_to_remove}")
+        connection = self.schedule.by_socket(websocket)
+        if connection is not None and self.schedule.remove(connection.key, connection) is not None:
+            connection.stop()
+            self.schedule_rooms.leave_all(connection.key)
+            print(f"Schedule WebSocket disconnected for user {connection.key}")
+    
+    def touch_schedule(self, user_id: int):
+        """Record that a schedule client sent something"""
+        connection = self.schedule.get(user_id)
+        if connection is not None:
+            connection.touch()
     
     async def send_schedule_message(self, websocket: WebSocket, message: dict):
         """Send a message to a specific schedule WebSocket"""
-        try:
-            await websocket.send_text(json.dumps(message))
-        except Exception as e:
-            print(f"Error sending schedule message: {e}")
+        connection = self.schedule.by_socket(websocket)
+        if connection is not None:
+            connection.enqueue(message)
+    
+    async def _publish_schedule(self, message: dict, rooms: Optional[Iterable] = None, user_ids: Iterable[int] = ()):
+        # rooms=None: every schedule socket
+        await self.publish(
+            "schedule",
+            rooms=[list(room) for room in rooms] if rooms is not None else None,
+            user_ids=list(user_ids),
+            message=message
+        )
+    
+    @staticmethod
+    def _department_schedule_rooms(department_id: Optional[int]) -> Optional[list]:
+        # Staff, managers and admins of the department, plus every admin
+        if department_id is None:
+            return None
+        return [department_room(department_id, role) for role in DASHBOARD_ROLES] + [role_room("admin")]
+    
+    @staticmethod
+    def _manager_rooms(department_id: Optional[int]) -> list:
+        # Managers of the department (every manager if None), plus every admin
+        if department_id is None:
+            return [role_room("manager"), role_room("admin")]
+        return [department_room(department_id, "manager"), role_room("admin")]
     
     async def notify_schedule_updated(self, schedule_data: dict, department_id: int = None):
-        """Notify all connected schedule clients about an update"""
+        """Notify schedule clients of the department (all of them if None) and admins"""
         message = {
             "type": "schedule_updated",
             "data": schedule_data,
             "timestamp": asyncio.get_event_loop().time()
         }
         
-        for user_id, websocket in list(self.schedule_connections.items()):
-            try:
-                await websocket.send_text(json.dumps(message))
-                print(f"Sent schedule update to user {user_id}")
-            except Exception as e:
-                print(f"Error sending schedule update to user {user_id}: {e}")
-                # Remove dead connections
-                if user_id in self.schedule_connections:
-                    del self.schedule_connections[user_id]
+        await self._publish_schedule(message, self._department_schedule_rooms(department_id))
+    
+    async def broadcast_schedule_update(self, update: dict, department_id: int = None):
+        """Send a schedule change that carries its own ``type`` to the same audience"""
+        message = {
+            **update,
+            "timestamp": asyncio.get_event_loop().time()
+        }
+        
+        await self._publish_schedule(message, self._department_schedule_rooms(department_id))
+    
+    async def notify_leave_request_submitted(self, leave_request_data: dict, department_id: int = None):
+        """Notify the department's managers and admins about a new leave request"""
+        message = {
+            "type": "leave_request_submitted",
+            "data": leave_request_data,
+            "timestamp": asyncio.get_event_loop().time()
+        }
+        
+        await self._publish_schedule(message, self._manager_rooms(department_id))
+    
+    async def notify_leave_request_reviewed(self, leave_request_data: dict, staff_id: int):
+        """Notify a staff member about the decision on their leave request"""
+        message = {
+            "type": "leave_request_reviewed",
+            "data": leave_request_data,
+            "timestamp": asyncio.get_event_loop().time()
+        }
+        
+        await self._publish_schedule(message, [], [staff_id])
+    
+    async def notify_checkin_request(self, checkin_data: dict, department_id: int = None):
+        """Notify the department's managers and admins about a check-in request"""
+        message = {
+            "type": "checkin_request_submitted",
+            "data": checkin_data,
+            "timestamp": asyncio.get_event_loop().time()
+        }
+        
+        await self._publish_schedule(message, self._manager_rooms(department_id))
+    
+    def _deliver_schedule(self, message, rooms: Optional[list], user_ids: Iterable[int] = ()):
+        started = time.perf_counter()
+        message = Envelope.of(message)
+        if rooms is None:
+            recipients = list(self.schedule_connections.values())
+        else:
+            keys = self.schedule_rooms.members_of(rooms)
+            keys.update(user_ids)
+            recipients = [self.schedule.get(key) for key in keys]
+        
+        # Dead connections remove themselves when their writer fails
+        for connection in recipients:
+            if connection is not None:
+                connection.enqueue(message)
+        self.metrics.observe_fanout("schedule", time.perf_counter() - started, len(recipients))
 
 # Create a global instance
 websocket_manager = WebSocketManager()
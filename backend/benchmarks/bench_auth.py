@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark the authentication overhead of one request.
+
+Times what ``Depends(get_db)`` + ``Depends(get_current_user_sync)`` cost a
+handler - open a session, decode the bearer token, get the ``User``, close
+the session - with the principal cache off and on, and counts the SQL
+statements executed per request. Then times ``get_current_principal`` with
+a claims token (``JWT_CLAIMS_TOKENS``), which needs no session at all.
+
+    python benchmarks/bench_auth.py --email staff.01@qstream.vn   # configured database
+    python benchmarks/bench_auth.py --sqlite                        # throwaway SQLite file
+
+``--sqlite`` creates a users table with one user in a temporary file, so it
+runs without Postgres (but understates the round trip a query costs).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import create_engine, event
+
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+from app.core.principal_cache import principal_cache
+from app.core.principal_cache import load_user
+from app.core.security import create_access_token, get_current_principal, get_current_user_sync
+from app.models import Department, User
+
+SQLITE_EMAIL = "bench@example.com"
+
+
+def use_sqlite():
+    path = os.path.join(tempfile.mkdtemp(), "auth.db")
+    sqlite = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Department.__table__.create(bind=sqlite)
+    User.__table__.create(bind=sqlite)
+    SessionLocal.configure(bind=sqlite)
+    with SessionLocal() as db:
+        db.add(Department(id=1, name="Bench", code="BENCH"))
+        db.add(User(id=1, username="bench", email=SQLITE_EMAIL, role="staff", department_id=1, is_active=True))
+        db.commit()
+    return sqlite
+
+
+def run(label: str, credentials, requests: int, bind, claims: bool = False) -> None:
+    statements = 0
+
+    def count(*_):
+        nonlocal statements
+        statements += 1
+
+    event.listen(bind, "before_cursor_execute", count)
+    try:
+        started = time.perf_counter()
+        for _ in range(requests):
+            if claims:
+                principal = get_current_principal(credentials)
+                principal.id, principal.role, principal.department_id
+                continue
+            db = SessionLocal()
+            try:
+                user = get_current_user_sync(credentials, db)
+                user.id, user.role, user.department_id
+            finally:
+                db.close()
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(bind, "before_cursor_execute", count)
+    print(f"  {label:<14} {elapsed / requests * 1e6:8.1f} us per request, "
+          f"{statements / requests:.2f} SQL statements per request")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--email", help="existing user of the configured database")
+    parser.add_argument("--sqlite", action="store_true", help="use a throwaway SQLite database instead")
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    if not args.sqlite and not args.email:
+        parser.error("pass --email of an existing user, or --sqlite")
+
+    bind = use_sqlite() if args.sqlite else engine
+    email = SQLITE_EMAIL if args.sqlite else args.email
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=create_access_token(email))
+
+    # Warm up the pool and the token decoding
+    principal_cache.ttl = 0
+    run("warm-up", credentials, min(100, args.requests), bind)
+    print(f"{args.requests} authenticated requests as {email}:")
+    run("no cache", credentials, args.requests, bind)
+    principal_cache.ttl = settings.PRINCIPAL_CACHE_TTL_SECONDS or 30.0
+    principal_cache.clear()
+    run("cached", credentials, args.requests, bind)
+    print(f"  cache: {principal_cache.hits} hits, {principal_cache.misses} misses")
+
+    settings.JWT_CLAIMS_TOKENS = True
+    with SessionLocal() as db:
+        claims = HTTPAuthorizationCredentials(scheme="Bearer", credentials=create_access_token(
+            email, user=load_user(db, email)
+        ))
+    run("claims token", claims, args.requests, bind, claims=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Multi-client benchmark for the call-next claim.
+
+Seeds a department with waiting tickets, then lets 1, 2, 4, ... concurrent
+"staff" threads drain it through the SKIP LOCKED claim, printing claims per
+second for each level and checking that no ticket was claimed twice.
+
+    python benchmarks/bench_call_next.py --tickets 2000 --staff 1,2,4,8,16
+    python benchmarks/bench_call_next.py --legacy   # old read-then-update path
+
+``--legacy`` runs the previous "SELECT first waiting, then UPDATE" logic for
+comparison; it typically reports duplicate claims once staff > 1. The
+tickets live in a throwaway inactive department that is deleted afterwards.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app.core.database import SessionLocal
+from app.services.ticket_claim import claim_next_ticket
+
+BENCH_CODE = "CLAIMBENCH"
+
+
+def seed(count):
+    db = SessionLocal()
+    try:
+        cleanup(db)
+        department_id = db.execute(text("""
+            INSERT INTO departments (name, code, is_active)
+            VALUES ('Claim benchmark', :code, false)
+            RETURNING id
+        """), {"code": BENCH_CODE}).scalar()
+        service_id = db.execute(text("""
+            INSERT INTO services (name, department_id, estimated_duration, is_active)
+            VALUES ('Claim benchmark', :dept_id, 1, false)
+            RETURNING id
+        """), {"dept_id": department_id}).scalar()
+        db.execute(text("""
+            INSERT INTO queue_tickets (ticket_number, customer_name, service_id, department_id, status, created_at)
+            SELECT :code || n, 'Bench customer', :service_id, :dept_id, 'waiting',
+                   NOW() - make_interval(secs => :count - n)
+            FROM generate_series(1, :count) AS n
+        """), {"code": BENCH_CODE, "service_id": service_id, "dept_id": department_id, "count": count})
+        db.commit()
+        return department_id
+    finally:
+        db.close()
+
+
+def cleanup(db):
+    params = {"code": BENCH_CODE}
+    db.execute(text("""
+        DELETE FROM queue_tickets
+        WHERE department_id IN (SELECT id FROM departments WHERE code = :code)
+    """), params)
+    db.execute(text("""
+        DELETE FROM services
+        WHERE department_id IN (SELECT id FROM departments WHERE code = :code)
+    """), params)
+    db.execute(text("DELETE FROM departments WHERE code = :code"), params)
+    db.commit()
+
+
+def legacy_claim(db, department_id):
+    row = db.execute(text("""
+        SELECT id FROM queue_tickets
+        WHERE department_id = :dept_id AND status = 'waiting'
+        ORDER BY created_at LIMIT 1
+    """), {"dept_id": department_id}).fetchone()
+    if row is None:
+        db.rollback()
+        return None
+    db.execute(text("UPDATE queue_tickets SET status = 'called', called_at = NOW() WHERE id = :id"), {"id": row.id})
+    db.commit()
+    return row
+
+
+def staff_worker(department_id, legacy, claimed):
+    db = SessionLocal()
+    try:
+        while True:
+            if legacy:
+                row = legacy_claim(db, department_id)
+            else:
+                row = claim_next_ticket(db, department_id, None)
+            if row is None:
+                return
+            claimed.append(row.id)
+    finally:
+        db.close()
+
+
+def run_level(staff_count, tickets, legacy):
+    department_id = seed(tickets)
+    claimed = []
+    threads = [
+        threading.Thread(target=staff_worker, args=(department_id, legacy, claimed))
+        for _ in range(staff_count)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    db = SessionLocal()
+    try:
+        cleanup(db)
+    finally:
+        db.close()
+
+    duplicates = len(claimed) - len(set(claimed))
+    print(f"{staff_count:>6} staff  {len(claimed):>7} claims  {len(claimed) / elapsed:>9.0f}/s  duplicates={duplicates}")
+    return duplicates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tickets", type=int, default=2000)
+    parser.add_argument("--staff", default="1,2,4,8,16")
+    parser.add_argument("--legacy", action="store_true")
+    args = parser.parse_args()
+
+    print("legacy read-then-update" if args.legacy else "SKIP LOCKED claim")
+    duplicates = 0
+    for level in [int(value) for value in args.staff.split(",")]:
+        duplicates += run_level(level, args.tickets, args.legacy)
+
+    if duplicates and not args.legacy:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
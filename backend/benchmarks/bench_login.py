@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark password checks during a login wave.
+
+Fires ``--logins`` concurrent password checks at the configured bcrypt cost
+and reports logins per second plus the worst event-loop stall seen by a
+10 ms ticker - what every WebSocket on the worker feels meanwhile:
+
+- inline: ``bcrypt.checkpw`` called from an ``async def`` handler
+- executor: ``await password_hasher.verify_async`` on a pool of
+  ``--workers`` threads (each value of the comma-separated list)
+
+Finally checks that a hash made with another cost is upgraded on login.
+
+    python benchmarks/bench_login.py --logins 50 --workers 1,2,4
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bcrypt
+
+from app.core.config import settings
+from app.core.passwords import PasswordHasher
+
+PASSWORD = "Staff@123"
+
+
+async def ticker(stalls: list, stop: asyncio.Event):
+    """Record how late a 10 ms sleep wakes up"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(0.01)
+        stalls.append(loop.time() - started - 0.01)
+
+
+async def wave(label: str, check, logins: int):
+    stalls: list = []
+    stop = asyncio.Event()
+    watcher = asyncio.ensure_future(ticker(stalls, stop))
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(check() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await watcher
+    assert all(results), "a valid password was rejected"
+    print(f"  {label:<14} {logins / elapsed:7.1f} logins/s, worst event-loop stall {max(stalls) * 1000:8.1f} ms")
+
+
+async def run(args):
+    hashed = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(args.rounds)).decode()
+    print(f"{args.logins} concurrent logins, bcrypt cost {args.rounds}, {os.cpu_count()} CPUs:")
+
+    async def inline():
+        return bcrypt.checkpw(PASSWORD.encode(), hashed.encode())
+
+    await wave("inline", inline, args.logins)
+    for workers in (int(value) for value in args.workers.split(",")):
+        hasher = PasswordHasher(args.rounds, workers)
+        await wave(f"executor x{workers}", lambda: hasher.verify_async(PASSWORD, hashed), args.logins)
+
+    hasher = PasswordHasher(args.rounds, 1)
+    old = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(args.rounds - 2)).decode()
+    valid, upgraded = await hasher.verify_and_update_async(PASSWORD, old)
+    ok = valid and upgraded is not None and not hasher.needs_rehash(upgraded)
+    print(f"  rehash {'ok' if ok else 'FAIL'}: cost {args.rounds - 2} hash upgraded to "
+          f"{upgraded.split('$')[2] if upgraded else '-'} on login")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=settings.PASSWORD_BCRYPT_ROUNDS)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated executor sizes")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
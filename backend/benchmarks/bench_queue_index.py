@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark "people ahead" lookups: SQL COUNT vs the Redis queue index.
+
+Seeds a throwaway department with waiting tickets, then times the same
+random status lookups through the old ``COUNT(*)`` query and through
+``queue_index.people_ahead`` (ZRANK), checks both agree, and checks the
+index rebuilds itself after its Redis keys are deleted.
+
+    python benchmarks/bench_queue_index.py --tickets 2000 --lookups 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app.core.database import SessionLocal
+from app.services.queue_index import queue_index
+
+from bench_call_next import seed, cleanup
+
+INDEX_KEYS = (queue_index._waiting_key, queue_index._ready_key, queue_index._journal_key)
+
+_LEGACY_COUNT = text("""
+    SELECT COUNT(*) FROM queue_tickets other, queue_tickets me
+    WHERE me.id = :ticket_id
+      AND other.department_id = me.department_id
+      AND other.status = 'waiting'
+      AND other.created_at < me.created_at
+""")
+
+
+def timed(label, lookups, fn):
+    started = time.perf_counter()
+    results = [fn(ticket_id) for ticket_id in lookups]
+    elapsed = time.perf_counter() - started
+    print(f"{label:<14} {len(lookups) / elapsed:>9.0f} lookups/s  ({elapsed * 1000 / len(lookups):.3f} ms each)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tickets", type=int, default=2000)
+    parser.add_argument("--lookups", type=int, default=5000)
+    args = parser.parse_args()
+
+    department_id = seed(args.tickets)
+    db = SessionLocal()
+    try:
+        ids = [row.id for row in db.execute(
+            text("SELECT id FROM queue_tickets WHERE department_id = :dept_id"),
+            {"dept_id": department_id}
+        )]
+        lookups = [random.choice(ids) for _ in range(args.lookups)]
+
+        queue_index.rebuild(db, department_id)
+        legacy = timed("SQL COUNT", lookups, lambda t: db.execute(_LEGACY_COUNT, {"ticket_id": t}).scalar())
+        indexed = timed("Redis ZRANK", lookups, lambda t: queue_index.people_ahead(db, t, department_id))
+
+        # Seeded tickets share one priority, so both orders must agree
+        mismatches = sum(1 for a, b in zip(legacy, indexed) if a != b)
+        print(f"mismatches:    {mismatches}")
+
+        queue_index.client.delete(*(key(department_id) for key in INDEX_KEYS))
+        rebuilt = queue_index.people_ahead(db, lookups[0], department_id) == legacy[0]
+        print(f"rebuild after flush: {'ok' if rebuilt else 'FAILED'}")
+
+        queue_index.client.delete(*(key(department_id) for key in INDEX_KEYS))
+        cleanup(db)
+    finally:
+        db.close()
+
+    if mismatches or not rebuilt:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
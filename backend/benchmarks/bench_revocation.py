@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Check and time the token revocation list.
+
+Starts two ``RevocationList`` instances ("workers") on one Redis. It checks
+that a logout on one worker is refused by the other after pub/sub delivers
+it, and again after a rebuild from Redis, and that ``revoke_user_async``
+stores a user's token version in Redis. It also checks that expired ids
+leave the filter on rebuild. It then fills the filter to ``--revoked`` ids
+and times the per-request check of valid tokens against asking Redis every
+time, counting the false positives that still needed a lookup.
+
+    python benchmarks/bench_revocation.py --fake             # fakeredis, no server needed
+    python benchmarks/bench_revocation.py --revoked 100000 --checks 200000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import redis
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+from app.core.principal import token_versions
+from app.core.revocation import REVOKED_KEY, TOKEN_VERSIONS_KEY, RevocationList
+
+
+def clients(args):
+    if args.fake:
+        import fakeredis
+        server = fakeredis.FakeServer()
+        return lambda: (fakeredis.FakeRedis(server=server), fakeredis.aioredis.FakeRedis(server=server))
+    return lambda: (redis.Redis.from_url(args.redis_url), aioredis.from_url(args.redis_url))
+
+
+async def settle(condition, timeout: float = 2.0) -> bool:
+    deadline = time.perf_counter() + timeout
+    while not condition() and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    return condition()
+
+
+async def run(args):
+    make = clients(args)
+    channel = f"bench:revocations:{uuid.uuid4().hex[:8]}"
+    workers = []
+    for _ in range(2):
+        client, async_client = make()
+        workers.append(RevocationList(channel=channel, client=client, async_client=async_client))
+    first, second = workers
+    first.client.delete(REVOKED_KEY)
+    for worker in workers:
+        await worker.start()
+    await asyncio.sleep(0.2)
+    print(f"Revocation list on {'fakeredis' if args.fake else args.redis_url}, channel {channel}")
+
+    ok = True
+    def report(label, passed):
+        nonlocal ok
+        ok = ok and passed
+        print(f"  {'ok  ' if passed else 'FAIL'} {label}")
+
+    jti = uuid.uuid4().hex
+    report("unrevoked token accepted", not second.is_revoked(jti))
+    first.revoke(jti, time.time() + 60)
+    report("logout seen by the other worker over pub/sub",
+           await settle(lambda: second.might_be_revoked(jti)) and second.is_revoked(jti))
+    user_id = int(time.time() * 1000) % 1000000000
+    await first.revoke_user_async(user_id, 3)
+    report("user version raised from an async handler stored for every worker",
+           first.client.hget(TOKEN_VERSIONS_KEY, user_id) == b"3" and not token_versions.is_current(user_id, 2))
+    late = uuid.uuid4().hex
+    first.client.zadd(REVOKED_KEY, {late: time.time() + 60})  # as if the message was missed
+    expired = uuid.uuid4().hex
+    first.revoke(expired, time.time() - 1)
+    second.refresh()
+    report("missed revocation picked up by rebuild", second.is_revoked(late))
+    report("expired id dropped by rebuild", not second.might_be_revoked(expired))
+
+    for worker in workers:
+        await worker.stop()
+
+    # Fill the filter and time the request path
+    revoked = [uuid.uuid4().hex for _ in range(args.revoked)]
+    expires_at = time.time() + 600
+    pipe = first.client.pipeline(transaction=False)
+    for start in range(0, len(revoked), 10000):
+        pipe.zadd(REVOKED_KEY, {value: expires_at for value in revoked[start:start + 10000]})
+    pipe.execute()
+    started = time.perf_counter()
+    second.refresh()
+    rebuild = time.perf_counter() - started
+    bloom = second._filter
+    print(f"\n{args.revoked} revoked ids, filter of {bloom.bits // 8 // 1024} KiB, {bloom.hashes} hashes, "
+          f"rebuilt in {rebuild * 1000:.0f} ms")
+    report("every revoked id refused", all(second.is_revoked(value) for value in revoked[:1000]))
+
+    valid = [uuid.uuid4().hex for _ in range(args.checks)]
+    second.filter_hits = second.false_positives = 0
+    started = time.perf_counter()
+    refused = sum(second.is_revoked(value) for value in valid)
+    filtered = time.perf_counter() - started
+    lookups = valid[:min(len(valid), 20000)]
+    started = time.perf_counter()
+    for value in lookups:
+        second.client.zscore(REVOKED_KEY, value)
+    direct = (time.perf_counter() - started) / len(lookups) * len(valid)
+    report("no valid token refused", refused == 0)
+    print(f"  filter + Redis on hit  {filtered / len(valid) * 1e6:7.2f} us/request "
+          f"({second.false_positives} false positives, {second.false_positives / len(valid):.4%})")
+    print(f"  ZSCORE every request   {direct / len(valid) * 1e6:7.2f} us/request")
+    first.client.delete(REVOKED_KEY)
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--fake", action="store_true", help="use fakeredis instead of a Redis server")
+    parser.add_argument("--redis-url", default=settings.REDIS_URL)
+    parser.add_argument("--revoked", type=int, default=settings.REVOCATION_FILTER_CAPACITY)
+    parser.add_argument("--checks", type=int, default=100000)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
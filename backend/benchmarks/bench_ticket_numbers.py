@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for the ticket number allocator.
+
+Starts N worker threads that each allocate ticket numbers in their own
+transaction against DATABASE_URL, then checks that no number was handed out
+twice and prints allocations per second.
+
+    python benchmarks/bench_ticket_numbers.py --workers 16 --per-worker 200
+
+A throwaway prefix is used so real ticket counters are not touched; its
+counter row is deleted at the end.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app.core.database import SessionLocal, create_tables
+from app.services.ticket_numbers import allocate_number, format_ticket_number
+
+
+def run_worker(prefix, count, issued, latencies, errors):
+    db = SessionLocal()
+    try:
+        for _ in range(count):
+            started = time.perf_counter()
+            try:
+                value = allocate_number(db, prefix)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                errors.append(str(e))
+                continue
+            latencies.append(time.perf_counter() - started)
+            issued.append(format_ticket_number(prefix, value))
+    finally:
+        db.close()
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--per-worker", type=int, default=200)
+    parser.add_argument("--prefix", default="BENCH")
+    args = parser.parse_args()
+
+    create_tables()
+
+    issued, latencies, errors = [], [], []
+    threads = [
+        threading.Thread(
+            target=run_worker,
+            args=(args.prefix, args.per_worker, issued, latencies, errors),
+        )
+        for _ in range(args.workers)
+    ]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    db = SessionLocal()
+    try:
+        db.execute(text("DELETE FROM ticket_counters WHERE prefix = :prefix"), {"prefix": args.prefix})
+        db.commit()
+    finally:
+        db.close()
+
+    duplicates = len(issued) - len(set(issued))
+    print(f"workers:      {args.workers}")
+    print(f"allocations:  {len(issued)} in {elapsed:.2f}s ({len(issued) / elapsed:.0f}/s)")
+    print(f"latency p50:  {percentile(latencies, 50) * 1000:.2f} ms")
+    print(f"latency p99:  {percentile(latencies, 99) * 1000:.2f} ms")
+    print(f"errors:       {len(errors)}")
+    print(f"duplicates:   {duplicates}")
+
+    if duplicates or errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark dashboard queue_update coalescing during a rush.
+
+Connects ``--dashboards`` fake staff sockets to one department and fires
+``--rate`` ticket events per second at ``broadcast_queue_update`` for
+``--seconds``, each moving a random ticket through waiting -> called ->
+completed. Reports messages per dashboard per second and checks that the
+last status every dashboard saw for each ticket is the ticket's real final
+status. Compare windows with ``--window-ms`` (0 disables coalescing).
+
+    python benchmarks/bench_ws_coalesce.py --rate 200 --window-ms 150
+    python benchmarks/bench_ws_coalesce.py --rate 200 --window-ms 0
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.websocket_manager import WebSocketManager
+
+STATUSES = ("waiting", "called", "completed")
+
+
+class FakeSocket:
+    def __init__(self):
+        self.messages = []
+
+    async def send_text(self, message: str):
+        await asyncio.sleep(0)
+        self.messages.append(json.loads(message))
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def run(args):
+    settings.WEBSOCKET_COALESCE_WINDOW_MS = args.window_ms
+    manager = WebSocketManager()
+    sockets = []
+    for index in range(args.dashboards):
+        socket = FakeSocket()
+        await manager.connect(socket, f"dashboard-{index}")
+        await manager.join_department(f"dashboard-{index}", 1, "staff")
+        sockets.append(socket)
+
+    rng = random.Random(7)
+    progress = {}  # ticket id -> index into STATUSES
+    total = int(args.rate * args.seconds)
+    started = time.perf_counter()
+    for number in range(total):
+        ticket_id = rng.randrange(args.tickets)
+        step = min(progress.get(ticket_id, -1) + 1, len(STATUSES) - 1)
+        progress[ticket_id] = step
+        await manager.broadcast_queue_update(1, STATUSES[step], local=True,
+                                             ticket={"id": ticket_id, "status": STATUSES[step]})
+        await asyncio.sleep(max(0.0, started + (number + 1) / args.rate - time.perf_counter()))
+    await asyncio.sleep(args.window_ms / 1000 + 0.2)  # last window flushes
+    elapsed = time.perf_counter() - started
+
+    final = {ticket_id: STATUSES[step] for ticket_id, step in progress.items()}
+    consistent = 0
+    for socket in sockets:
+        seen = {}
+        for message in socket.messages:
+            for ticket in message.get("tickets", []):
+                seen[ticket["id"]] = ticket["status"]
+        consistent += seen == final
+
+    per_client = sum(len(socket.messages) for socket in sockets) / len(sockets)
+    print(f"{total} events over {elapsed:.1f}s to {len(sockets)} dashboards, window {args.window_ms} ms")
+    print(f"  messages per dashboard: {per_client:.0f} ({per_client / elapsed:.1f}/s)")
+    print(f"  dashboards whose final ticket statuses match: {consistent}/{len(sockets)}")
+    manager.queue_updates.close()
+    for connection in list(manager.active_connections.values()):
+        connection.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dashboards", type=int, default=50)
+    parser.add_argument("--rate", type=float, default=200, help="events per second")
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--tickets", type=int, default=100)
+    parser.add_argument("--window-ms", type=int, default=settings.WEBSOCKET_COALESCE_WINDOW_MS)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark broadcast encoding: per-client json.dumps vs one shared envelope.
+
+Builds a department snapshot-sized message and "sends" it to N clients,
+half JSON and half MessagePack, three ways: the old json.dumps inside the
+per-client loop, one stdlib-JSON envelope, and the default envelope
+(orjson when installed). Prints encode time per broadcast and the frame
+size of each format.
+
+    python benchmarks/bench_ws_encoding.py --clients 5000 --tickets 50
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.realtime import envelope as envelope_module
+from app.realtime.envelope import JSON, MSGPACK, MSGPACK_AVAILABLE, ORJSON_AVAILABLE, Envelope
+
+
+def sample_message(tickets: int) -> dict:
+    return {
+        "type": "queue_update",
+        "department_id": 3,
+        "action": "called",
+        "waiting": [
+            {"id": 1000 + i, "ticket_number": f"A{i:03d}", "priority": "normal", "position": i + 1,
+             "estimated_wait": i * 4, "estimated_wait_range": [i * 3, i * 5]}
+            for i in range(tickets)
+        ],
+        "timestamp": 1718000000.123,
+    }
+
+
+def timed(label: str, rounds: int, fn):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    per_broadcast = (time.perf_counter() - started) / rounds
+    print(f"  {label:<34} {per_broadcast * 1000:8.3f} ms per broadcast")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--tickets", type=int, default=50, help="tickets in the message")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    message = sample_message(args.tickets)
+    encodings = [MSGPACK if MSGPACK_AVAILABLE and i % 2 else JSON for i in range(args.clients)]
+    print(f"{args.clients} clients, {args.tickets}-ticket message "
+          f"(orjson {'on' if ORJSON_AVAILABLE else 'off'}, msgpack {'on' if MSGPACK_AVAILABLE else 'off'})")
+
+    def legacy():
+        for _ in encodings:
+            json.dumps(message)
+
+    def envelope_stdlib():
+        saved = envelope_module.ORJSON_AVAILABLE
+        envelope_module.ORJSON_AVAILABLE = False
+        try:
+            shared = Envelope(message)
+            for encoding in encodings:
+                shared.encode(encoding)
+        finally:
+            envelope_module.ORJSON_AVAILABLE = saved
+
+    def envelope_default():
+        shared = Envelope(message)
+        for encoding in encodings:
+            shared.encode(encoding)
+
+    timed("json.dumps per client (old)", args.rounds, legacy)
+    timed("shared envelope, stdlib json", args.rounds, envelope_stdlib)
+    timed("shared envelope, default encoder", args.rounds, envelope_default)
+
+    shared = Envelope(message)
+    print(f"  frame size: JSON {len(shared.encode(JSON).encode())} bytes", end="")
+    if MSGPACK_AVAILABLE:
+        print(f", MessagePack {len(shared.encode(MSGPACK))} bytes")
+    else:
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark WebSocket broadcast fan-out with slow and dead clients.
+
+Connects thousands of fake sockets to a fresh ``WebSocketManager``: most
+answer ``send_text`` immediately, some take ``--slow-ms`` per message and a
+few never answer. Broadcasts a burst of messages and reports how long the
+broadcast calls took, how long until every healthy client had all of them,
+and what happened to the slow and dead ones. ``--legacy`` runs the old
+one-await-per-client loop for comparison (with a send timeout so dead
+clients cannot hang it forever).
+
+    python benchmarks/bench_ws_fanout.py --clients 5000 --slow 50 --dead 5
+    python benchmarks/bench_ws_fanout.py --messages 600 --slow-ms 200   # overflow -> resync
+    python benchmarks/bench_ws_fanout.py --clients 2000 --messages 20 --legacy
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.websocket_manager import WebSocketManager
+
+
+class FakeSocket:
+    """Just enough of a Starlette WebSocket for the manager"""
+
+    def __init__(self, delay: float = 0.0, dead: bool = False):
+        self.delay = delay
+        self.dead = dead
+        self.received = 0
+
+    async def send_text(self, message: str):
+        if self.dead:
+            await asyncio.sleep(3600)
+        # Even a fast client yields to the loop, like a real transport write
+        await asyncio.sleep(self.delay)
+        self.received += 1
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def run(args):
+    settings.WEBSOCKET_SEND_TIMEOUT_SECONDS = args.timeout
+    manager = WebSocketManager()
+    healthy, slow, dead = [], [], []
+    for index in range(args.clients):
+        if index < args.dead:
+            socket = FakeSocket(dead=True)
+            dead.append(socket)
+        elif index < args.dead + args.slow:
+            socket = FakeSocket(delay=args.slow_ms / 1000)
+            slow.append(socket)
+        else:
+            socket = FakeSocket()
+            healthy.append(socket)
+        socket.client_id = f"client-{index}"
+        await manager.connect(socket, socket.client_id)
+
+    started = time.perf_counter()
+    broadcast_time = 0.0
+    for number in range(args.messages):
+        message = f'{{"type": "queue_update", "seq": {number}}}'
+        before = time.perf_counter()
+        if args.legacy:
+            for client_id, connection in list(manager.active_connections.items()):
+                try:
+                    await asyncio.wait_for(connection.websocket.send_text(message), args.timeout)
+                except Exception:
+                    pass
+        else:
+            await manager.broadcast_to_all(message)
+        broadcast_time += time.perf_counter() - before
+
+    while any(socket.received < args.messages for socket in healthy):
+        await asyncio.sleep(0.001)
+    delivered = time.perf_counter() - started
+
+    print(f"{args.clients} clients ({len(slow)} slow at {args.slow_ms}ms, {len(dead)} dead), "
+          f"{args.messages} broadcasts{' [legacy]' if args.legacy else ''}")
+    print(f"  time inside broadcast calls: {broadcast_time * 1000:9.1f} ms "
+          f"({broadcast_time / args.messages * 1e6:.0f} us per broadcast)")
+    print(f"  all healthy clients caught up: {delivered * 1000:7.1f} ms")
+    if not args.legacy:
+        await asyncio.sleep(args.timeout + 0.5)
+        connections = manager.active_connections
+        downgraded = sum(1 for s in slow if s.client_id in connections and connections[s.client_id].overflows)
+        slow_dropped = sum(1 for s in slow if s.client_id not in connections)
+        print(f"  slow clients received: {min(s.received for s in slow) if slow else 0}"
+              f"-{max(s.received for s in slow) if slow else 0} messages, "
+              f"{downgraded} downgraded to resync, {slow_dropped} dropped")
+        print(f"  dead clients dropped: {sum(1 for s in dead if s.client_id not in connections)}/{len(dead)}, "
+              f"connections left: {len(connections)}")
+    for connection in list(manager.active_connections.values()):
+        connection.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--slow", type=int, default=50, help="clients taking --slow-ms per message")
+    parser.add_argument("--slow-ms", type=float, default=50)
+    parser.add_argument("--dead", type=int, default=5, help="clients that never finish a send")
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=2.0, help="send timeout in seconds")
+    parser.add_argument("--legacy", action="store_true", help="sequential await per client")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark the WebSocket heartbeat wheel at growing connection counts.
+
+For each count in ``--clients`` a fresh ``WebSocketManager`` gets that many
+fake sockets: most are "chatty" and are touched (as if they sent a frame)
+more often than the ping interval, ``--silent`` percent never send anything
+and must get pinged and then evicted. Time is compressed with small
+``--interval`` / ``--idle`` values. Reports the time spent in wheel ticks
+per connection-second, which should stay flat as connections grow, plus
+pings and evictions.
+
+    python benchmarks/bench_ws_heartbeat.py --clients 1000,10000,50000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.websocket_manager import WebSocketManager
+
+
+class FakeSocket:
+    def __init__(self):
+        self.pings = 0
+
+    async def send_text(self, message: str):
+        self.pings += '"server_ping"' in message
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def run_once(count: int, args) -> None:
+    settings.WEBSOCKET_HEARTBEAT_INTERVAL = args.interval
+    settings.WEBSOCKET_IDLE_TIMEOUT_SECONDS = args.idle
+    settings.WEBSOCKET_HEARTBEAT_TICK_SECONDS = args.tick
+    manager = WebSocketManager()
+    silent_count = count * args.silent // 100
+    chatty = []
+    for index in range(count):
+        client_id = f"client-{index}"
+        await manager.connect(FakeSocket(), client_id)
+        if index >= silent_count:
+            chatty.append(client_id)
+
+    # Connecting thousands of clients takes a while; start everyone's clock now
+    for connection in manager.active_connections.values():
+        connection.touch()
+
+    wheel = manager.heartbeat
+    spent = 0.0
+    advance = wheel.advance
+
+    def timed_advance():
+        nonlocal spent
+        started = time.perf_counter()
+        advance()
+        spent += time.perf_counter() - started
+
+    wheel.advance = timed_advance
+    wheel.start()
+
+    async def chatter():
+        # Every chatty client sends something twice per interval
+        while True:
+            for client_id in chatty:
+                manager.touch(client_id)
+            await asyncio.sleep(args.interval / 2)
+
+    talker = asyncio.ensure_future(chatter())
+    await asyncio.sleep(args.duration)
+    talker.cancel()
+    await wheel.stop()
+    await asyncio.sleep(0.05)  # evicted sockets finish closing
+
+    evicted_chatty = sum(1 for client_id in chatty if client_id not in manager.active_connections)
+    print(f"{count:>7} connections: {spent * 1000:8.1f} ms in ticks over {args.duration:.0f}s "
+          f"= {spent / (count * args.duration) * 1e9:6.0f} ns per connection-second; "
+          f"pings {wheel.pinged}, evicted {wheel.evicted}/{silent_count} silent, {evicted_chatty} chatty")
+    for connection in list(manager.active_connections.values()):
+        connection.stop()
+
+
+async def run(args):
+    for count in (int(value) for value in args.clients.split(",")):
+        await run_once(count, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", default="1000,10000,50000", help="comma-separated connection counts")
+    parser.add_argument("--silent", type=int, default=10, help="percent of clients that never send")
+    parser.add_argument("--interval", type=float, default=1.0, help="ping after this many silent seconds")
+    parser.add_argument("--idle", type=float, default=3.0, help="evict after this many silent seconds")
+    parser.add_argument("--tick", type=float, default=0.05)
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
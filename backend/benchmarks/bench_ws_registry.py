@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark the WebSocket connection registry: memory and subscribe cost.
+
+Connects N fake sockets to a fresh ``WebSocketManager``, each following
+``--tickets-per-client`` tickets and one department, and reports the memory
+allocated per connection (tracemalloc, including the connection record,
+its queue and writer task and its room memberships). Then times joining and
+leaving a ticket followed by everybody, and dropping schedule sockets by
+socket object, at each N: with sets and reverse indexes the per-operation
+time should not grow with N.
+
+    python benchmarks/bench_ws_registry.py --clients 1000,10000,50000
+"""
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.websocket_manager import WebSocketManager
+
+
+class FakeSocket:
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        pass
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def run_once(count: int, args):
+    manager = WebSocketManager()
+    sockets = [FakeSocket() for _ in range(count)]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for index, socket in enumerate(sockets):
+        client_id = f"client-{index}"
+        await manager.connect(socket, client_id)
+        for offset in range(args.tickets_per_client):
+            await manager.join_queue(client_id, str(index * args.tickets_per_client + offset))
+        await manager.join_department(client_id, index % 20, "staff")
+    await asyncio.sleep(0)  # writer tasks start
+    per_connection = (tracemalloc.get_traced_memory()[0] - before) / count
+    tracemalloc.stop()
+
+    # Everybody follows one hot ticket; then half of them leave it again
+    started = time.perf_counter()
+    for index in range(count):
+        await manager.join_queue(f"client-{index}", "hot")
+    joined = time.perf_counter() - started
+    started = time.perf_counter()
+    for index in range(0, count, 2):
+        await manager.leave_queue(f"client-{index}", "hot")
+    left = time.perf_counter() - started
+
+    schedule_sockets = [FakeSocket() for _ in range(count)]
+    for user_id, socket in enumerate(schedule_sockets):
+        await manager.schedule_connect(socket, user_id, "staff", user_id % 20)
+    started = time.perf_counter()
+    for socket in schedule_sockets:
+        manager.schedule_disconnect(socket)
+    dropped = time.perf_counter() - started
+
+    print(f"{count:>7} clients: {per_connection / 1024:6.2f} KiB per connection | "
+          f"join {joined / count * 1e6:5.2f} us, leave {left / (count / 2) * 1e6:5.2f} us, "
+          f"schedule drop {dropped / count * 1e6:5.2f} us per op")
+    for connection in list(manager.active_connections.values()):
+        connection.stop()
+    await asyncio.sleep(0)
+
+
+async def run(args):
+    for count in (int(value) for value in args.clients.split(",")):
+        await run_once(count, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", default="1000,10000,50000", help="comma-separated connection counts")
+    parser.add_argument("--tickets-per-client", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Check the blocking-database guard and time what a sync session on the loop costs.
+
+1. Guard: with ``guard_event_loop(engine, "raise")`` a sync session used in
+   an ``async def`` handler raises ``BlockingDatabaseCall``. The same
+   session in a sync ``def`` handler (threadpool), or inside
+   ``allow_blocking_db()``, does not. This goes through FastAPI's
+   TestClient, so it is what a test suite run with
+   ``DB_SYNC_ON_EVENT_LOOP=raise`` sees.
+2. Stall: ``--requests`` concurrent slow queries from async code, through
+   a sync session on the loop and through an ``AsyncSession``. Reports the
+   worst stall of a 10 ms ticker on the event loop.
+
+    python benchmarks/check_db_event_loop.py                 # configured Postgres (pg_sleep)
+    python benchmarks/check_db_event_loop.py --sqlite        # SQLite (needs aiosqlite), CPU-bound query
+
+The guard check always uses an in-memory SQLite database.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.config import settings
+from app.core.database import BlockingDatabaseCall, allow_blocking_db, async_database_url, guard_event_loop
+
+# About 50 ms of CPU in SQLite
+SQLITE_SLOW = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 300000) SELECT COUNT(*) FROM n"
+
+
+def check_guard() -> bool:
+    guarded = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    guard_event_loop(guarded, "raise")
+    Local = sessionmaker(bind=guarded)
+
+    def get_session():
+        with Local() as db:
+            yield db
+
+    app = FastAPI()
+
+    @app.get("/async")
+    async def async_handler(db: Session = Depends(get_session)):
+        return db.execute(text("SELECT 1")).scalar()
+
+    @app.get("/sync")
+    def sync_handler(db: Session = Depends(get_session)):
+        return db.execute(text("SELECT 1")).scalar()
+
+    @app.get("/allowed")
+    async def allowed_handler(db: Session = Depends(get_session)):
+        with allow_blocking_db():
+            return db.execute(text("SELECT 1")).scalar()
+
+    ok = True
+    with TestClient(app, raise_server_exceptions=True) as client:
+        try:
+            client.get("/async")
+            refused = False
+        except BlockingDatabaseCall:
+            refused = True
+        for label, passed in (
+            ("async def handler with a sync session raises", refused),
+            ("sync def handler with a sync session passes", client.get("/sync").json() == 1),
+            ("allow_blocking_db() passes", client.get("/allowed").json() == 1),
+        ):
+            ok = ok and passed
+            print(f"  {'ok  ' if passed else 'FAIL'} {label}")
+    return ok
+
+
+async def ticker(stalls: list, stop: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(0.01)
+        stalls.append(loop.time() - started - 0.01)
+
+
+async def measure(label: str, request, requests: int):
+    stalls: list = []
+    stop = asyncio.Event()
+    watcher = asyncio.ensure_future(ticker(stalls, stop))
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    await asyncio.gather(*(request() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await watcher
+    print(f"  {label:<22} {elapsed * 1000:7.0f} ms total, worst event-loop stall {max(stalls) * 1000:7.1f} ms")
+
+
+async def check_stall(args):
+    if args.sqlite:
+        sync_engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        async_engine = create_async_engine("sqlite+aiosqlite://")
+        statement, params = text(SQLITE_SLOW), {}
+    else:
+        sync_engine = create_engine(settings.DATABASE_URL)
+        async_engine = create_async_engine(async_database_url(settings.DATABASE_URL))
+        statement, params = text("SELECT pg_sleep(:seconds)"), {"seconds": args.query_ms / 1000}
+    SyncLocal = sessionmaker(bind=sync_engine)
+    AsyncLocal = async_sessionmaker(async_engine, class_=AsyncSession)
+
+    async def sync_on_loop():
+        with SyncLocal() as db:
+            db.execute(statement, params)
+
+    async def async_session():
+        async with AsyncLocal() as db:
+            await db.execute(statement, params)
+
+    print(f"\n{args.requests} concurrent slow queries ({'SQLite' if args.sqlite else 'Postgres pg_sleep'}):")
+    await measure("sync session on loop", sync_on_loop, args.requests)
+    await measure("AsyncSession", async_session, args.requests)
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sqlite", action="store_true", help="SQLite instead of the configured Postgres")
+    parser.add_argument("--requests", type=int, default=5)
+    parser.add_argument("--query-ms", type=int, default=50, help="pg_sleep per query (Postgres)")
+    args = parser.parse_args()
+    print("Blocking-database guard:")
+    ok = check_guard()
+    asyncio.run(check_stall(args))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Check that WebSocket events cross workers through the Redis broker.
+
+Starts two ``WebSocketManager`` instances ("workers") in one process, each
+with its own ``RedisBroker`` on the same channel, connects fake sockets to
+both and verifies that ticket, room, broadcast, personal and custom events
+published on one worker reach the clients of the other exactly once. Then
+times a burst of cross-worker ticket events.
+
+    python benchmarks/check_ws_broker.py                     # local Redis (REDIS_URL)
+    python benchmarks/check_ws_broker.py --fake              # fakeredis, no server needed
+    python benchmarks/check_ws_broker.py --messages 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import redis.asyncio as redis
+
+from app.core.config import settings
+from app.realtime.broker import RedisBroker
+from app.realtime.rooms import department_room
+from app.websocket_manager import WebSocketManager
+
+
+class FakeSocket:
+    def __init__(self):
+        self.messages = []
+        self.arrived = asyncio.Event()
+
+    async def send_text(self, message: str):
+        self.messages.append(json.loads(message))
+        self.arrived.set()
+
+    async def close(self, code: int = 1000):
+        pass
+
+    def types(self):
+        return [message.get("type") for message in self.messages]
+
+
+def redis_clients(args):
+    if args.fake:
+        import fakeredis
+        server = fakeredis.FakeServer()
+        return [fakeredis.aioredis.FakeRedis(server=server) for _ in range(2)]
+    return [redis.from_url(args.redis_url) for _ in range(2)]
+
+
+async def wait_for(socket: FakeSocket, count: int, timeout: float = 2.0):
+    deadline = time.perf_counter() + timeout
+    while len(socket.messages) < count and time.perf_counter() < deadline:
+        socket.arrived.clear()
+        try:
+            await asyncio.wait_for(socket.arrived.wait(), deadline - time.perf_counter())
+        except asyncio.TimeoutError:
+            break
+    await asyncio.sleep(0.05)  # would-be duplicates arrive too
+
+
+def check(label: str, ok: bool):
+    print(f"  {'ok  ' if ok else 'FAIL'} {label}")
+    return ok
+
+
+async def run(args):
+    channel = f"ws:check:{uuid.uuid4().hex[:8]}"
+    worker_a, worker_b = WebSocketManager(), WebSocketManager()
+    for worker, client in zip((worker_a, worker_b), redis_clients(args)):
+        await worker.start(RedisBroker(channel=channel, client=client))
+
+    customer, dashboard, other = FakeSocket(), FakeSocket(), FakeSocket()
+    await worker_b.connect(customer, "customer")
+    await worker_b.join_queue("customer", "42")
+    await worker_b.connect(dashboard, "dashboard")
+    await worker_b.join_department("dashboard", 7, "staff")
+    await worker_a.connect(other, "other")
+
+    custom_events = []
+
+    async def on_custom(event):
+        custom_events.append(event)
+
+    worker_b.on("custom", on_custom)
+
+    results = []
+    print(f"Broker channel {channel} ({'fakeredis' if args.fake else args.redis_url})")
+
+    await worker_a.send_ticket_called("42", "Counter 3")
+    await wait_for(customer, 1)
+    results.append(check("ticket event reaches subscriber on the other worker once",
+                         customer.types() == ["ticket_called"]))
+
+    await worker_a.broadcast_queue_update(7, "called")
+    await wait_for(dashboard, 1)
+    results.append(check("department room event crosses workers",
+                         dashboard.types() == ["queue_update"] and customer.types() == ["ticket_called"]))
+
+    await worker_a.broadcast_queue_update(8)
+    await worker_a.broadcast_to_rooms(json.dumps({"type": "probe"}), [department_room(9, "staff")])
+    await asyncio.sleep(0.1)
+    results.append(check("other departments' events are not delivered", len(dashboard.messages) == 1))
+
+    await worker_a.broadcast_to_all(json.dumps({"type": "announcement"}))
+    await wait_for(customer, 2)
+    await wait_for(other, 1)
+    results.append(check("broadcast_to_all reaches both workers once",
+                         customer.types()[-1] == "announcement" and other.types() == ["announcement"]))
+
+    await worker_a.send_personal_message(json.dumps({"type": "direct"}), "dashboard")
+    await wait_for(dashboard, 2)
+    results.append(check("personal message finds a client on the other worker", dashboard.types()[-1] == "direct"))
+
+    await worker_a.send_queue_update("42", {"position": 1}, local=True)
+    await asyncio.sleep(0.1)
+    results.append(check("local=True stays on the publishing worker", customer.types()[-1] == "announcement"))
+
+    await worker_a.publish("custom", value=1)
+    await asyncio.sleep(0.1)
+    results.append(check("custom events run the handler on the other worker", custom_events == [{"op": "custom", "value": 1}]))
+
+    # Throughput / latency of cross-worker ticket events
+    before = len(customer.messages)
+    started = time.perf_counter()
+    for number in range(args.messages):
+        await worker_a.send_queue_update("42", {"position": number})
+    await wait_for(customer, before + args.messages, timeout=30)
+    elapsed = time.perf_counter() - started
+    received = len(customer.messages) - before
+    results.append(check(f"{received}/{args.messages} burst events delivered in order",
+                         [m.get("position") for m in customer.messages[before:]] == list(range(args.messages))))
+    print(f"  {args.messages} cross-worker events in {elapsed * 1000:.0f} ms "
+          f"({args.messages / elapsed:.0f}/s)")
+
+    for worker in (worker_a, worker_b):
+        for connection in list(worker.active_connections.values()):
+            connection.stop()
+        await worker.stop()
+    return all(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--redis-url", default=settings.REDIS_URL)
+    parser.add_argument("--fake", action="store_true", help="use fakeredis instead of a Redis server")
+    parser.add_argument("--messages", type=int, default=1000)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
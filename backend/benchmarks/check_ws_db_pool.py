@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Check that idle WebSocket connections do not hold database connections.
+
+Binds ``SessionLocal`` to a throwaway SQLite database behind a QueuePool of
+``--pool-size`` connections (no overflow, short checkout timeout), then
+authenticates ``--sockets`` fake schedule sockets - several times the pool
+size - with :func:`app.realtime.auth.authenticate` and keeps them "open".
+Passes when none of them holds a pooled connection and an ordinary request
+can still get a session. For contrast it then holds ``get_db()`` sessions
+the way the old ``Depends(get_db)`` endpoints did, which runs the pool dry.
+
+    python benchmarks/check_ws_db_pool.py --sockets 50 --pool-size 5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import QueuePool
+
+from app.core.database import SessionLocal, get_db
+from app.core.security import create_access_token
+from app.models import User
+from app.realtime.auth import authenticate
+
+
+class FakeSocket:
+    def __init__(self, token: str):
+        self.query_params = {"token": token}
+
+
+def check(label: str, ok: bool) -> bool:
+    print(f"  [{'ok' if ok else 'FAIL'}] {label}")
+    return ok
+
+
+def can_get_session() -> bool:
+    try:
+        with SessionLocal() as db:
+            db.execute(text("SELECT 1"))
+        return True
+    except PoolTimeout:
+        return False
+
+
+async def run(args) -> bool:
+    path = os.path.join(tempfile.mkdtemp(), "pool.db")
+    engine = create_engine(
+        f"sqlite:///{path}",
+        poolclass=QueuePool,
+        pool_size=args.pool_size,
+        max_overflow=0,
+        pool_timeout=args.timeout,
+        connect_args={"check_same_thread": False},
+    )
+    User.__table__.create(bind=engine)
+    SessionLocal.configure(bind=engine)
+
+    with SessionLocal() as db:
+        db.add_all(
+            User(id=index, username=f"user{index}", email=f"user{index}@example.com", role="staff",
+                 department_id=index % 3 + 1, is_active=True)
+            for index in range(1, args.sockets + 1)
+        )
+        db.commit()
+
+    sockets = [(index, FakeSocket(create_access_token(f"user{index}@example.com")))
+               for index in range(1, args.sockets + 1)]
+    principals = await asyncio.gather(*(authenticate(socket, user_id) for user_id, socket in sockets))
+
+    print(f"{args.sockets} sockets authenticated against a pool of {args.pool_size}:")
+    passed = all([
+        check("every socket got its principal", all(principal is not None for principal in principals)),
+        check("principals carry role and department",
+              all(principal.role == "staff" and principal.department_id for principal in principals)),
+        check(f"pooled connections checked out while sockets idle: {engine.pool.checkedout()}",
+              engine.pool.checkedout() == 0),
+        check("a request can still get a session", can_get_session()),
+        check("token for another user is refused", await authenticate(sockets[0][1], sockets[1][0]) is None),
+        check("missing token is refused", await authenticate(FakeSocket(""), 1) is None),
+    ])
+
+    # The old endpoints: one get_db() session per socket, held until disconnect
+    held = []
+    for _ in range(args.pool_size):
+        session = get_db()
+        next(session).execute(text("SELECT 1"))
+        held.append(session)
+    print(f"With {len(held)} sockets holding get_db() sessions (old behaviour):")
+    check(f"pooled connections checked out: {engine.pool.checkedout()}", engine.pool.checkedout() == args.pool_size)
+    check("a request times out waiting for the pool", not can_get_session())
+    for session in held:
+        session.close()
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sockets", type=int, default=50)
+    parser.add_argument("--pool-size", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=0.5, help="pool checkout timeout in seconds")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Check resumable WebSocket streams and time a reconnect storm.
+
+Runs a ``WebSocketManager`` against fake sockets: a phone follows a ticket,
+drops, misses some events and rejoins with ``resume_from``; it must get
+exactly the missed events, in order. Falling further behind than the replay
+buffer, or resuming with a stale epoch, must ask for a snapshot instead.
+The handler of a replaced socket must not tear down the resumed one.
+Dashboards resuming a department stream are checked the same way. Finally
+``--clients`` phones drop and resume at once, to time the storm.
+
+    python benchmarks/check_ws_resume.py
+    python benchmarks/check_ws_resume.py --clients 20000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.realtime.replay import department_stream, ticket_stream
+from app.websocket_manager import WebSocketManager
+
+
+class FakeSocket:
+    def __init__(self):
+        self.messages = []
+
+    async def send_text(self, message: str):
+        self.messages.append(json.loads(message))
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+def check(label: str, ok: bool):
+    print(f"  {'ok  ' if ok else 'FAIL'} {label}")
+    return ok
+
+
+async def settle():
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+async def rejoin(manager, client_id, ticket_id, state):
+    socket = FakeSocket()
+    await manager.connect(socket, client_id)
+    await manager.join_queue(client_id, ticket_id)
+    result = manager.resume(client_id, ticket_stream(ticket_id), state.get("seq"), state.get("epoch"))
+    await settle()
+    return socket, result
+
+
+async def run(args):
+    settings.WEBSOCKET_COALESCE_WINDOW_MS = 0
+    manager = WebSocketManager()
+    size = manager.replay.size
+    results = []
+    print(f"Replay buffer {size} events per stream, grace {manager.replay.grace:.0f}s")
+
+    phone = FakeSocket()
+    await manager.connect(phone, "phone")
+    await manager.join_queue("phone", "42")
+    state = manager.resume("phone", ticket_stream("42"))
+    for position in (5, 4, 3):
+        await manager.send_queue_update("42", {"position": position}, local=True)
+    await settle()
+    seqs = [message["seq"] for message in phone.messages]
+    results.append(check("live events are numbered 1, 2, 3", seqs == [1, 2, 3]))
+
+    state["seq"] = seqs[-1]
+    await manager.disconnect("phone")
+    results.append(check("ticket stays followed after its subscriber dropped", "42" in manager.followed_tickets()))
+    await manager.send_queue_update("42", {"position": 2}, local=True)
+    await manager.send_ticket_called("42", "Counter 1", local=True)
+
+    phone, result = await rejoin(manager, "phone", "42", state)
+    results.append(check("resume replays exactly the missed events, in order",
+                         result["resumed"] and [m["seq"] for m in phone.messages] == [4, 5]
+                         and phone.messages[-1]["type"] == "ticket_called"))
+    results.append(check("nothing missed: resumes with no replay",
+                         (await rejoin(manager, "phone", "42", {**state, "seq": 5}))[1]["resumed"]))
+
+    state["seq"] = 5
+    await manager.disconnect("phone")
+    for position in range(size + 1):
+        await manager.send_queue_update("42", {"position": position}, local=True)
+    phone, result = await rejoin(manager, "phone", "42", state)
+    results.append(check("too far behind: snapshot instead of replay", not result["resumed"] and not phone.messages))
+    _, result = await rejoin(manager, "phone", "42", {"seq": 1, "epoch": "stale.1"})
+    results.append(check("stale epoch: snapshot", not result["resumed"]))
+
+    dashboard = FakeSocket()
+    await manager.connect(dashboard, "dashboard")
+    await manager.join_department("dashboard", 3, "staff")
+    dept = manager.resume("dashboard", department_stream(3))
+    await manager.broadcast_queue_update(3, "called", local=True, ticket={"id": 1, "status": "called"})
+    await settle()
+    dept["seq"] = dashboard.messages[-1]["seq"]
+    await manager.disconnect("dashboard")
+    results.append(check("department keeps producing updates for resuming dashboards",
+                         manager.has_dashboard_listeners(3)))
+    await manager.broadcast_queue_update(3, "completed", local=True, ticket={"id": 1, "status": "completed"})
+    dashboard = FakeSocket()
+    await manager.connect(dashboard, "dashboard")
+    await manager.join_department("dashboard", 3, "staff")
+    result = manager.resume("dashboard", department_stream(3), dept["seq"], dept["epoch"])
+    await settle()
+    results.append(check("dashboard resume replays the missed queue_update",
+                         result["resumed"] and [m["action"] for m in dashboard.messages] == ["completed"]))
+
+    # The old handler notices its socket died only after the client resumed
+    # on a new one: its cleanup must leave the new connection alone
+    old = await manager.connect(FakeSocket(), "tablet")
+    await manager.join_queue("tablet", "77")
+    new = await manager.connect(FakeSocket(), "tablet")
+    await manager.join_queue("tablet", "77")
+    stale_touch = manager.touch("tablet", old)
+    await manager.disconnect("tablet", old)
+    results.append(check("stale handler cleanup keeps the resumed socket and its rooms",
+                         not stale_touch and manager.active_connections.get("tablet") is new
+                         and "77" in manager.followed_tickets()))
+    await manager.disconnect("tablet", new)
+
+    # Reconnect storm: every phone drops, a few events happen, all resume
+    phones = {}
+    for index in range(args.clients):
+        client_id, ticket_id = f"storm-{index}", str(1000 + index % args.tickets)
+        await manager.connect(FakeSocket(), client_id)
+        await manager.join_queue(client_id, ticket_id)
+        phones[client_id] = (ticket_id, manager.resume(client_id, ticket_stream(ticket_id)))
+    for client_id in phones:
+        await manager.disconnect(client_id)
+    for ticket in range(args.tickets):
+        await manager.send_queue_update(str(1000 + ticket), {"position": 1}, local=True)
+    started = time.perf_counter()
+    resumed = 0
+    for client_id, (ticket_id, state) in phones.items():
+        await manager.connect(FakeSocket(), client_id)
+        await manager.join_queue(client_id, ticket_id)
+        resumed += manager.resume(client_id, ticket_stream(ticket_id), state["seq"], state["epoch"])["resumed"]
+    elapsed = time.perf_counter() - started
+    results.append(check(f"{resumed}/{args.clients} storm clients resumed without a snapshot",
+                         resumed == args.clients))
+    print(f"  {args.clients} rejoins in {elapsed * 1000:.0f} ms ({args.clients / elapsed:.0f}/s), "
+          f"{len(manager.replay)} streams buffered")
+
+    for connection in list(manager.active_connections.values()):
+        connection.stop()
+    return all(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--tickets", type=int, default=500, help="distinct tickets followed in the storm")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
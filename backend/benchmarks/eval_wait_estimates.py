@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Replay history to compare wait estimates against actual waits.
+
+Reads completed tickets of the last N days, replays arrivals, calls and
+completions in time order, and at every arrival compares the actual wait
+(created -> called) with the static estimate (people ahead x
+estimated_duration) and with the learned estimator as it stood at that
+moment. Prints mean / median / p90 absolute error in minutes for both.
+
+    python benchmarks/eval_wait_estimates.py --days 14
+"""
+import argparse
+import os
+import sys
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.wait_estimator import DEFAULT_SERVICE_MINUTES, ServiceTimeEstimator
+
+_HISTORY = text("""
+    SELECT qt.id, qt.department_id, qt.service_id, qt.staff_id,
+           qt.created_at, qt.called_at, qt.completed_at, s.estimated_duration
+    FROM queue_tickets qt
+    LEFT JOIN services s ON s.id = qt.service_id
+    WHERE qt.status = 'completed'
+      AND qt.called_at IS NOT NULL AND qt.completed_at IS NOT NULL
+      AND qt.created_at >= NOW() - make_interval(days => :days)
+""")
+
+ARRIVE, CALL, COMPLETE = 0, 1, 2
+
+
+def summarize(label, errors):
+    if not errors:
+        print(f"{label:<10} no samples")
+        return
+    ordered = sorted(errors)
+    mean = sum(ordered) / len(ordered)
+    median = ordered[len(ordered) // 2]
+    p90 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))]
+    print(f"{label:<10} mean {mean:6.1f}  median {median:6.1f}  p90 {p90:6.1f}  (minutes, n={len(ordered)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--alpha", type=float, default=settings.WAIT_ESTIMATOR_ALPHA)
+    parser.add_argument("--active-minutes", type=float, default=settings.WAIT_ESTIMATOR_ACTIVE_MINUTES)
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        tickets = db.execute(_HISTORY, {"days": args.days}).fetchall()
+
+    events = []
+    for ticket in tickets:
+        events.append((ticket.created_at, ARRIVE, ticket))
+        events.append((ticket.called_at, CALL, ticket))
+        events.append((ticket.completed_at, COMPLETE, ticket))
+    events.sort(key=lambda event: (event[0], event[1]))
+
+    estimator = ServiceTimeEstimator(args.alpha, args.active_minutes)
+    waiting = defaultdict(set)
+    static_errors, learned_errors = [], []
+
+    for moment, kind, ticket in events:
+        now = moment.timestamp()
+        if kind == ARRIVE:
+            people_ahead = len(waiting[ticket.department_id])
+            actual = (ticket.called_at - ticket.created_at).total_seconds() / 60
+            static = people_ahead * (ticket.estimated_duration or DEFAULT_SERVICE_MINUTES)
+            learned = estimator.estimate(
+                ticket.department_id, people_ahead, ticket.service_id, ticket.estimated_duration, now=now
+            ).minutes
+            static_errors.append(abs(static - actual))
+            learned_errors.append(abs(learned - actual))
+            waiting[ticket.department_id].add(ticket.id)
+        elif kind == CALL:
+            waiting[ticket.department_id].discard(ticket.id)
+            estimator.staff_active(ticket.department_id, ticket.staff_id, now=now)
+        else:
+            estimator.observe(ticket.department_id, ticket.service_id, ticket.staff_id,
+                              ticket.called_at, ticket.completed_at)
+            estimator.staff_active(ticket.department_id, ticket.staff_id, now=now)
+
+    print(f"{len(tickets)} completed tickets over {args.days} days")
+    summarize("static", static_errors)
+    summarize("learned", learned_errors)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+WebSocket load test against a running backend.
+
+Opens ``--customers`` simulated WaitingPage sockets (each registers a ticket
+through ``POST /api/v1/tickets/register`` and follows it with
+``join_queue``) and ``--dashboards`` staff dashboard sockets
+(``join_department`` as ``staff``), all on ``/ws/{client_id}`` and
+answering ``server_ping`` like the frontend does. Then drives ticket traffic
+in the department at ``--rate`` operations per second for ``--duration``
+seconds: registrations and, when staff credentials are given, call-next /
+complete through the staff API, which moves everybody's position.
+
+Delivery latency is measured from the start of the HTTP request that
+changed the queue to the arrival of the message reflecting it:
+
+- dashboard: each ``queue_update`` carries the number of queue events it
+  merges, which are matched in order to the operations sent
+- customer: ``ticket_called`` and position ``queue_update`` messages,
+  against the latest call-next / complete
+
+Operations are sent one at a time so this attribution holds; run it against
+a dev server with no other traffic in the department. Reports p50/p90/p99/max
+per kind, then the server's own view from ``GET /metrics/websocket`` when
+manager or admin credentials are given (``--metrics-email``).
+
+    python benchmarks/load_ws.py --department-id 1 --customers 500 --dashboards 20 \\
+        --staff-email staff@example.com --staff-password secret --rate 10 --duration 60
+
+Thousands of sockets need a matching ``ulimit -n`` on both ends.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List, Optional
+
+import httpx
+import websockets
+
+
+def percentiles(samples: List[float]) -> str:
+    if not samples:
+        return "no samples"
+    ordered = sorted(samples)
+    last = len(ordered) - 1
+    return (f"n={len(ordered):>6}  p50 {ordered[last * 50 // 100] * 1000:7.1f} ms  "
+            f"p90 {ordered[last * 90 // 100] * 1000:7.1f} ms  "
+            f"p99 {ordered[last * 99 // 100] * 1000:7.1f} ms  max {ordered[last] * 1000:7.1f} ms")
+
+
+class Driver:
+    """Sends queue operations one at a time and remembers when each started"""
+
+    def __init__(self, http: httpx.AsyncClient, args, service_id: int, staff_token: Optional[str]):
+        self.http = http
+        self.args = args
+        self.service_id = service_id
+        self.staff_headers = {"Authorization": f"Bearer {staff_token}"} if staff_token else None
+        self.operations: List[Optional[float]] = []  # start time per queue event expected, None = failed
+        self.last_move: Optional[float] = None  # start of the latest call-next / complete
+        self.called: Optional[int] = None  # ticket the simulated staff member is serving
+        self.waiting = 0
+        self.failures = 0
+        self.counts: Dict[str, int] = {"register": 0, "call_next": 0, "complete": 0}
+
+    async def register(self, name: str) -> int:
+        response = await self.http.post("/api/v1/tickets/register", json={
+            "customer_name": name,
+            "service_id": self.service_id,
+            "department_id": self.args.department_id,
+        })
+        response.raise_for_status()
+        self.waiting += 1
+        return response.json()["ticket"]["id"]
+
+    async def step(self):
+        """One operation: a registration, or the staff member's next move"""
+        move = self.staff_headers is not None and (self.called is not None or self.waiting > 0) \
+            and random.random() >= self.args.register_share
+        index = len(self.operations)
+        started = time.perf_counter()
+        self.operations.append(started)
+        try:
+            if not move:
+                await self.register(f"Load test {index}")
+                self.counts["register"] += 1
+            elif self.called is None:
+                self.last_move = started
+                response = await self.http.post("/api/v1/staff/queue/call-next", headers=self.staff_headers)
+                response.raise_for_status()
+                self.called = response.json()["id"]
+                self.waiting -= 1
+                self.counts["call_next"] += 1
+            else:
+                self.last_move = started
+                response = await self.http.put(f"/api/v1/staff/tickets/{self.called}/complete",
+                                               headers=self.staff_headers, json={})
+                response.raise_for_status()
+                self.called = None
+                self.counts["complete"] += 1
+        except (httpx.HTTPError, KeyError, ValueError) as e:
+            self.operations[index] = None
+            self.failures += 1
+            print(f"operation {index} failed: {e!r}")
+
+    async def run(self):
+        interval = 1.0 / self.args.rate
+        deadline = time.perf_counter() + self.args.duration
+        next_at = time.perf_counter()
+        while next_at < deadline:
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+            next_at += interval
+            await self.step()
+
+
+class Client:
+    """One simulated socket: answers pings and records delivery latencies"""
+
+    def __init__(self, client_id: str, driver: Driver, args):
+        self.client_id = client_id
+        self.driver = driver
+        self.args = args
+        self.latencies: List[float] = []
+        self.received = 0
+        self.closed: Optional[str] = None
+        self._socket = None
+        self._joined = asyncio.Event()
+
+    def join_message(self) -> dict:
+        raise NotImplementedError
+
+    def on_message(self, message: dict, received: float):
+        raise NotImplementedError
+
+    async def run(self, connect_slots: asyncio.Semaphore):
+        url = f"{self.args.ws_url}/ws/{self.client_id}"
+        try:
+            async with connect_slots:
+                self._socket = await websockets.connect(url, subprotocols=["qms.json"], open_timeout=30)
+                await self._socket.send(json.dumps(self.join_message()))
+            async for frame in self._socket:
+                received = time.perf_counter()
+                self.received += 1
+                message = json.loads(frame)
+                kind = message.get("type")
+                if kind == "server_ping":
+                    await self._socket.send(json.dumps({"type": "pong"}))
+                elif kind in ("joined", "joined_department"):
+                    self._joined.set()
+                else:
+                    self.on_message(message, received)
+        except Exception as e:
+            self.closed = repr(e)
+        finally:
+            self._joined.set()
+
+    async def joined(self):
+        await self._joined.wait()
+
+    async def close(self):
+        if self._socket is not None:
+            await self._socket.close()
+
+
+class Customer(Client):
+    """WaitingPage: follows its own ticket"""
+
+    def __init__(self, client_id: str, ticket_id: int, driver: Driver, args):
+        super().__init__(client_id, driver, args)
+        self.ticket_id = str(ticket_id)
+        self.counted_move: Optional[float] = None
+
+    def join_message(self) -> dict:
+        return {"type": "join_queue", "ticket_id": self.ticket_id}
+
+    def on_message(self, message: dict, received: float):
+        if str(message.get("ticket_id")) != self.ticket_id:
+            return
+        move = self.driver.last_move
+        # Positions only change when a ticket leaves the queue; count each move once
+        if message.get("type") in ("queue_update", "ticket_called", "ticket_completed", "queue_status") \
+                and move is not None and move != self.counted_move:
+            self.counted_move = move
+            self.latencies.append(received - move)
+
+
+class Dashboard(Client):
+    """Staff dashboard: follows the department's queue"""
+
+    def __init__(self, client_id: str, driver: Driver, args):
+        super().__init__(client_id, driver, args)
+        self.cursor = 0
+        self.start_cursor: Optional[int] = None
+
+    def join_message(self) -> dict:
+        return {"type": "join_department", "department_id": self.args.department_id, "role": "staff"}
+
+    def on_message(self, message: dict, received: float):
+        if message.get("type") != "queue_update" or message.get("department_id") != self.args.department_id:
+            return
+        if self.start_cursor is None:
+            return  # traffic not started yet
+        operations = self.driver.operations
+        events = message.get("events", 1)
+        while events > 0 and self.cursor < len(operations):
+            started = operations[self.cursor]
+            self.cursor += 1
+            if started is not None:
+                self.latencies.append(received - started)
+                events -= 1
+
+
+async def login(http: httpx.AsyncClient, email: str, password: str) -> str:
+    response = await http.post("/api/v1/auth/login", json={"email": email, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def pick_service(http: httpx.AsyncClient, department_id: int) -> int:
+    response = await http.get(f"/api/v1/departments/{department_id}")
+    response.raise_for_status()
+    services = [service for service in response.json().get("services", []) if service.get("is_active", True)]
+    if not services:
+        raise SystemExit(f"Department {department_id} has no active service; pass --service-id")
+    return services[0]["id"]
+
+
+async def run(args):
+    args.ws_url = args.ws_url or args.base_url.replace("http", "ws", 1)
+    limits = httpx.Limits(max_connections=args.connect_concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30, limits=limits) as http:
+        service_id = args.service_id or await pick_service(http, args.department_id)
+        staff_token = await login(http, args.staff_email, args.staff_password) if args.staff_email else None
+        driver = Driver(http, args, service_id, staff_token)
+        connect_slots = asyncio.Semaphore(args.connect_concurrency)
+        run_id = f"{int(time.time()) % 100000}"
+
+        print(f"Registering {args.customers} tickets and opening {args.customers} customer sockets...")
+        started = time.perf_counter()
+
+        async def new_customer(index: int) -> Customer:
+            async with connect_slots:
+                ticket_id = await driver.register(f"Load test customer {index}")
+            return Customer(f"load-{run_id}-customer-{index}", ticket_id, driver, args)
+
+        customers = await asyncio.gather(*(new_customer(index) for index in range(args.customers)))
+        dashboards = [Dashboard(f"load-{run_id}-dashboard-{index}", driver, args) for index in range(args.dashboards)]
+        clients: List[Client] = [*customers, *dashboards]
+        tasks = [asyncio.ensure_future(client.run(connect_slots)) for client in clients]
+        await asyncio.gather(*(client.joined() for client in clients))
+        failed = [client for client in clients if client.closed]
+        print(f"{len(clients) - len(failed)}/{len(clients)} sockets joined in {time.perf_counter() - started:.1f}s")
+
+        await asyncio.sleep(1.0)  # let the customers' initial position pushes settle
+        for dashboard in dashboards:
+            dashboard.cursor = dashboard.start_cursor = len(driver.operations)
+        print(f"Driving {args.rate}/s queue operations for {args.duration:.0f}s...")
+        await driver.run()
+        await asyncio.sleep(args.drain)
+
+        snapshot = None
+        if args.metrics_email:
+            metrics_token = await login(http, args.metrics_email, args.metrics_password)
+            snapshot = (await http.get(
+                "/metrics/websocket", headers={"Authorization": f"Bearer {metrics_token}"}
+            )).json()
+        for client in clients:
+            await client.close()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    dropped = [client for client in clients if client.closed]
+    traffic_start = dashboards[0].start_cursor if dashboards else len(driver.operations)
+    expected = sum(1 for operation in driver.operations[traffic_start:] if operation is not None)
+    print()
+    print(f"operations: {driver.counts}, failed {driver.failures}")
+    print(f"messages received: {sum(client.received for client in clients)}, "
+          f"sockets dropped: {len(dropped)}")
+    print(f"dashboard latency: {percentiles([value for dashboard in dashboards for value in dashboard.latencies])}")
+    missing = sum(max(0, expected - len(dashboard.latencies)) for dashboard in dashboards)
+    if missing:
+        print(f"  {missing} queue events never reached a dashboard")
+    print(f"customer latency:  {percentiles([value for customer in customers for value in customer.latencies])}")
+    if snapshot is None:
+        return
+    print()
+    print("server /metrics/websocket:")
+    print(json.dumps({key: snapshot.get(key) for key in (
+        "connections", "queues", "sent", "send_failures", "overflows", "slow_drops", "fanout", "delivery"
+    )}, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--ws-url", help="defaults to --base-url with ws:// / wss://")
+    parser.add_argument("--department-id", type=int, required=True)
+    parser.add_argument("--service-id", type=int, help="defaults to the department's first active service")
+    parser.add_argument("--customers", type=int, default=200, help="WaitingPage sockets (one ticket each)")
+    parser.add_argument("--dashboards", type=int, default=10, help="staff dashboard sockets")
+    parser.add_argument("--staff-email", help="staff account of the department, enables call-next/complete")
+    parser.add_argument("--staff-password")
+    parser.add_argument("--metrics-email", help="manager/admin account, enables the server metrics report")
+    parser.add_argument("--metrics-password")
+    parser.add_argument("--rate", type=float, default=5.0, help="queue operations per second")
+    parser.add_argument("--register-share", type=float, default=0.5,
+                        help="share of operations that are registrations when staff moves are enabled")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--drain", type=float, default=2.0, help="seconds to wait for late messages")
+    parser.add_argument("--connect-concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@
 -- QUEUE MANAGEMENT SYSTEM - MINIMAL DATABASE SCHEMA
 -- =====================================================
 -- Version: 5.0 (Production-Ready Minimal)
--- Tables: 9 (reduced from 27)
+-- Tables: 10 (reduced from 27)
 -- Purpose: Only essential tables for actual UI features
 
 -- =====================================================
@@ -10,7 +10,7 @@
 -- =====================================================
 
 DROP TABLE IF EXISTS 
-    staff_schedules, shifts, ticket_complaints, staff_performance,
+    ticket_counters, staff_schedules, shifts, ticket_complaints, staff_performance,
     queue_tickets, counters, services, users, departments
 CASCADE;
 
@@ -53,6 +53,7 @@ CREATE TABLE users (
     role user_role DEFAULT 'staff',
     department_id INTEGER REFERENCES departments(id),
     is_active BOOLEAN DEFAULT TRUE,
+    token_version INTEGER NOT NULL DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -113,6 +114,13 @@ CREATE TABLE queue_tickets (
     reviewed_at TIMESTAMP WITH TIME ZONE
 );
 
+-- Ticket number counters (one row per prefix A/B/C/D/X, O(1) allocation)
+CREATE TABLE ticket_counters (
+    prefix VARCHAR(8) PRIMARY KEY,
+    last_value INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- =====================================================
 -- PERFORMANCE & COMPLAINTS
 -- =====================================================
@@ -183,6 +191,7 @@ CREATE TABLE staff_schedules (
 CREATE INDEX idx_queue_tickets_status ON queue_tickets(status);
 CREATE INDEX idx_queue_tickets_department ON queue_tickets(department_id);
 CREATE INDEX idx_queue_tickets_created ON queue_tickets(created_at);
+CREATE INDEX idx_queue_tickets_waiting ON queue_tickets(department_id, created_at) WHERE status = 'waiting';
 CREATE INDEX idx_users_department ON users(department_id);
 CREATE INDEX idx_users_role ON users(role);
 CREATE INDEX idx_services_department ON services(department_id);
@@ -200,9 +209,10 @@ BEGIN
     RAISE NOTICE '=====================================================';
     RAISE NOTICE 'MINIMAL DATABASE SCHEMA CREATED!';
     RAISE NOTICE '=====================================================';
-    RAISE NOTICE 'Tables: 9 (reduced from 27)';
+    RAISE NOTICE 'Tables: 10 (reduced from 27)';
     RAISE NOTICE '  - departments, users, services, counters';
-    RAISE NOTICE '  - queue_tickets, staff_performance, ticket_complaints';
+    RAISE NOTICE '  - queue_tickets, ticket_counters';
+    RAISE NOTICE '  - staff_performance, ticket_complaints';
     RAISE NOTICE '  - shifts, staff_schedules';
     RAISE NOTICE '';
     RAISE NOTICE 'Removed: activity_logs, daily_login_logs, ai_conversations,';
@@ -2,6 +2,8 @@ import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { motion, AnimatePresence } from 'framer-motion';
 
+const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000/api/v1';
+
 const PublicDisplay = () => {
   const navigate = useNavigate();
   const qrRef = useRef(null);
@@ -9,6 +11,7 @@ const PublicDisplay = () => {
   const [floatingElements, setFloatingElements] = useState([]);
   const [isQrHovered, setIsQrHovered] = useState(false);
   const [qrImageUrl, setQrImageUrl] = useState(null);
+  const [boards, setBoards] = useState({});
   
   const serviceRegistrationUrl = `${window.location.origin}/service-registration`;
 
@@ -51,6 +54,24 @@ const PublicDisplay = () => {
     generateQrUrl();
   }, []); // Empty dependency array - only run once
 
+  // "Now serving" feed (SSE); EventSource reconnects and resumes via Last-Event-ID
+  useEffect(() => {
+    const source = new EventSource(`${API_BASE_URL}/display/stream`);
+    source.addEventListener('snapshot', (event) => {
+      try {
+        const snapshot = JSON.parse(event.data);
+        setBoards(prev => ({ ...prev, [snapshot.department_id]: snapshot }));
+      } catch (e) {
+        console.error('Invalid display snapshot:', e);
+      }
+    });
+    return () => source.close();
+  }, []);
+
+  const activeBoards = Object.values(boards).filter(
+    board => board.serving.length > 0 || board.next_up.length > 0
+  );
+
   const handleDirectAccess = () => {
     navigate('/service-registration');
   };
@@ -269,6 +290,33 @@ const PublicDisplay = () => {
         </motion.div>
       </div>
 
+      {/* Now serving board */}
+      {activeBoards.length > 0 && (
+        <div className="relative z-10 max-w-6xl mx-auto px-6 pb-10 grid gap-4 md:grid-cols-2 lg:grid-cols-3">
+          {activeBoards.map(board => (
+            <div
+              key={board.department_id}
+              className="bg-white/85 backdrop-blur-lg rounded-2xl p-5 border border-emerald-200/50 shadow-lg text-left"
+            >
+              <h3 className="text-lg font-bold text-emerald-800 mb-3">
+                {board.department_name || `Khu vực ${board.department_id}`}
+              </h3>
+              {board.serving.map(item => (
+                <div key={item.ticket_number} className="flex justify-between items-center py-1">
+                  <span className="text-2xl font-mono font-bold text-emerald-700">{item.ticket_number}</span>
+                  <span className="text-emerald-700">{item.counter || 'Quầy phục vụ'}</span>
+                </div>
+              ))}
+              {board.next_up.length > 0 && (
+                <p className="mt-3 text-sm text-emerald-600">
+                  Tiếp theo: <span className="font-mono font-semibold">{board.next_up.join(', ')}</span>
+                </p>
+              )}
+            </div>
+          ))}
+        </div>
+      )}
+
       {/* Direct Access Button */}
       <motion.div
         initial={{ opacity: 0, y: 30 }}
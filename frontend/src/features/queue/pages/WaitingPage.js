@@ -22,7 +22,7 @@ const CustomerWaitingPage = () => {
   const [isRedirecting, setIsRedirecting] = useState(false);
   
   // WebSocket for real-time updates
-  const { lastMessage, isConnected } = useWebSocket();
+  const { lastMessage, isConnected, joinQueue } = useWebSocket();
 
   // Load ticket info
   useEffect(() => {
@@ -71,13 +71,18 @@ const CustomerWaitingPage = () => {
       }
     };
 
+    // Fetch once per (re)connection; position changes are then pushed over WebSocket
     if (ticketId) {
       fetchTicketInfo();
-      // Check status every 5 seconds for faster response to completion
-      const interval = setInterval(fetchTicketInfo, 5000);
-      return () => clearInterval(interval);
     }
-  }, [ticketId, navigate]);
+  }, [ticketId, navigate, isConnected]);
+
+  // Subscribe to position updates for this ticket
+  useEffect(() => {
+    if (isConnected && ticketId) {
+      joinQueue(ticketId);
+    }
+  }, [isConnected, ticketId]); // eslint-disable-line react-hooks/exhaustive-deps
 
   // Immediate redirect when status changes to completed
   useEffect(() => {
@@ -176,41 +181,45 @@ const CustomerWaitingPage = () => {
 
   // Handle WebSocket messages
   useEffect(() => {
-    if (lastMessage && lastMessage.data) {
+    if (lastMessage) {
       try {
-        // Check if data is valid before parsing
-        if (typeof lastMessage.data === 'string' && lastMessage.data !== 'undefined') {
-          const message = JSON.parse(lastMessage.data);
-          
-          if (message.type === 'queue_update' && message.ticket_id === ticketId) {
-            setQueueInfo(prev => ({
-              ...prev,
-              position: message.position,
-              peopleAhead: Math.max(0, message.position - 1),
-              estimatedWait: message.estimated_wait
-            }));
-            
-            setIsNearTurn(message.position <= 2);
-          }
-          
-          if (message.type === 'ticket_called' && message.ticket_id === ticketId) {
-            // Show notification and navigate to called screen
-            showCalledNotification();
-          }
+        // WebSocketProvider already parsed the message
+        const message = lastMessage;
+        const isThisTicket = String(message.ticket_id) === String(ticketId);
+        
+        if (message.type === 'queue_update' && isThisTicket && message.position !== undefined) {
+          setQueueInfo(prev => ({
+            ...prev,
+            position: message.position,
+            peopleAhead: message.people_ahead,
+            estimatedWait: message.estimated_wait
+          }));
           
-          // Handle ticket completion
-          if (message.type === 'ticket_completed' && message.ticket_id === ticketId) {
-            // Update ticket status and trigger redirect
-            setTicket(prev => ({ ...prev, status: 'completed' }));
-            setIsRedirecting(true);
-            setTimeout(() => {
-              navigate(`/review/${ticketId}`, { replace: true });
-            }, 1000);
-          }
+          setIsNearTurn(message.people_ahead <= 1);
+        }
+        
+        if (message.type === 'ticket_called' && isThisTicket) {
+          // Show notification and navigate to called screen
+          showCalledNotification();
+        }
+        
+        // Other status changes (e.g. marked as no-show by staff)
+        if (message.type === 'queue_status' && isThisTicket && message.data?.status) {
+          setTicket(prev => ({ ...prev, status: message.data.status }));
+        }
+
+        // Handle ticket completion
+        if (message.type === 'ticket_completed' && isThisTicket) {
+          // Update ticket status and trigger redirect
+          setTicket(prev => ({ ...prev, status: 'completed' }));
+          setIsRedirecting(true);
+          setTimeout(() => {
+            navigate(`/review/${ticketId}`, { replace: true });
+          }, 1000);
         }
         
       } catch (error) {
-        console.error('Error parsing WebSocket message:', error, 'Data:', lastMessage.data);
+        console.error('Error handling WebSocket message:', error, lastMessage);
       }
     }
   }, [lastMessage, ticketId, showCalledNotification]);
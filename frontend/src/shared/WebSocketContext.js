@@ -70,6 +70,10 @@ class ScheduleWebSocketService {
                         case 'pong':
                             // No action needed for pong messages
                             break;
+                        case 'server_ping':
+                            // Answer so the server does not evict us as idle
+                            this.send({ type: 'pong' });
+                            break;
                         default:
                             this.emit('message', data);
                             break;
@@ -177,6 +181,15 @@ export const WebSocketProvider = ({ children }) => {
     const isConnectingRef = useRef(false);
     const shouldReconnectRef = useRef(true);
     const pingIntervalRef = useRef(null);
+    // Joined tickets/departments: join message plus the epoch and last seq seen,
+    // so a reconnect can resume instead of refetching everything
+    const streamsRef = useRef({});
+
+    const streamKey = (message) => {
+        if (message.ticket_id !== undefined) return `ticket:${message.ticket_id}`;
+        if (message.department_id !== undefined) return `department:${message.department_id}`;
+        return null;
+    };
 
     const cleanup = useCallback(() => {
         // Clear reconnect timeout
@@ -237,6 +250,12 @@ export const WebSocketProvider = ({ children }) => {
                 setError(null);
                 console.log('WebSocket connected successfully');
 
+                // Rejoin everything we followed, asking only for what we missed
+                Object.values(streamsRef.current).forEach((stream) => {
+                    const resume = stream.epoch ? { resume_from: stream.seq, epoch: stream.epoch } : {};
+                    ws.current.send(JSON.stringify({ ...stream.join, ...resume }));
+                });
+
                 // Start sending ping messages to keep connection alive
                 pingIntervalRef.current = setInterval(() => {
                     if (ws.current && ws.current.readyState === WebSocket.OPEN) {
@@ -252,6 +271,24 @@ export const WebSocketProvider = ({ children }) => {
             ws.current.onmessage = (event) => {
                 try {
                     const message = JSON.parse(event.data);
+                    if (message.type === 'server_ping') {
+                        // Answer so the server does not evict us as idle
+                        ws.current.send(JSON.stringify({ type: 'pong' }));
+                        return;
+                    }
+                    const stream = streamsRef.current[streamKey(message)];
+                    if (stream && (message.type === 'joined' || message.type === 'joined_department') && message.epoch) {
+                        if (message.epoch !== stream.epoch) {
+                            stream.seq = 0;
+                        }
+                        stream.epoch = message.epoch;
+                        stream.seq = Math.max(stream.seq, message.seq);
+                    } else if (stream && message.seq !== undefined) {
+                        if (message.seq <= stream.seq) {
+                            return; // already seen (replayed twice around a resume)
+                        }
+                        stream.seq = message.seq;
+                    }
                     setLastMessage(message);
                     if (message.type !== 'pong') {
                         console.log('Received message:', message);
@@ -320,13 +357,29 @@ export const WebSocketProvider = ({ children }) => {
         }
     };
 
+    const joinStream = (join) => {
+        const key = streamKey(join);
+        if (!streamsRef.current[key]) {
+            streamsRef.current[key] = { join, epoch: null, seq: 0 };
+        }
+        sendMessage(join);
+    };
+
     const joinQueue = (ticketId) => {
-        sendMessage({
+        joinStream({
             type: 'join_queue',
             ticket_id: ticketId
         });
     };
 
+    const joinDepartment = (departmentId, role = 'staff') => {
+        joinStream({
+            type: 'join_department',
+            department_id: departmentId,
+            role
+        });
+    };
+
     const pingServer = () => {
         sendMessage({
             type: 'ping'
@@ -339,6 +392,7 @@ export const WebSocketProvider = ({ children }) => {
         error,
         sendMessage,
         joinQueue,
+        joinDepartment,
         pingServer
     };
 